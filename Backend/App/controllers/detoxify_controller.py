@@ -1,22 +1,68 @@
+import os
+
 from services.detoxify_service import DetoxifyService
+from services.executors import detoxify_executor
+from services.micro_batcher import MicroBatcher
 from schemas.responses import (
     ToxicityAnalysis,
     BatchAnalysisResponse,
     FilterResponse,
     BatchFilterResponse,
+    LongTextDetails,
     StatsResponse,
     HealthResponse
 )
-from typing import List
+from typing import Dict, List, Optional, Tuple
+
+# Regroupement des appels unitaires concurrents (/analyze, /filter)
+DETOXIFY_MAX_WAIT_MS = float(os.getenv("DETOXIFY_MAX_WAIT_MS", "5"))
+DETOXIFY_MAX_BATCH = int(os.getenv("DETOXIFY_MAX_BATCH", "32"))
+DETOXIFY_QUEUE_SIZE = int(os.getenv("DETOXIFY_QUEUE_SIZE", "1000"))
 
 
 class DetoxifyController:
     def __init__(self):
         self.service = DetoxifyService()
+        self.batcher = MicroBatcher(
+            self.service.predict_batch,
+            max_wait_ms=DETOXIFY_MAX_WAIT_MS,
+            max_batch_size=DETOXIFY_MAX_BATCH,
+            max_queue_size=DETOXIFY_QUEUE_SIZE,
+            executor=detoxify_executor,
+            name="detoxify"
+        )
 
-    def analyze_text(self, text: str, threshold: float = 0.5) -> ToxicityAnalysis:
+    def _score_long_texts(
+        self, texts: List[str], aggregation: str
+    ) -> Tuple[List[Dict[str, float]], List[LongTextDetails]]:
+        """Scores agrégés par fenêtres glissantes et détails (fenêtre la plus toxique)"""
+        results = self.service.predict_long_batch(texts, aggregation)
+        scores = [r.pop("scores") for r in results]
+        return scores, [LongTextDetails(**r) for r in results]
+
+    async def _score_one(self, text: str, long_text: bool, aggregation: str):
+        if long_text:
+            scores, details = await detoxify_executor.run(self._score_long_texts, [text], aggregation)
+            return scores[0], details[0]
+        return await self.batcher.submit(text), None
+
+    def analyze_text(self, text: str, threshold: float = 0.5, long_text: bool = False,
+                     aggregation: str = "max") -> ToxicityAnalysis:
         """Analyse un texte unique"""
+        if long_text:
+            scores, details = self._score_long_texts([text], aggregation)
+            return self._build_analysis(text, scores[0], threshold, details[0])
         scores = self.service.predict_toxicity(text)
+        return self._build_analysis(text, scores, threshold)
+
+    async def analyze_text_batched(self, text: str, threshold: float = 0.5, long_text: bool = False,
+                                   aggregation: str = "max") -> ToxicityAnalysis:
+        """Analyse un texte unique, regroupé avec les requêtes concurrentes"""
+        scores, details = await self._score_one(text, long_text, aggregation)
+        return self._build_analysis(text, scores, threshold, details)
+
+    def _build_analysis(self, text: str, scores: Dict[str, float], threshold: float,
+                        details: Optional[LongTextDetails] = None) -> ToxicityAnalysis:
         max_category, max_score = self.service.get_max_category(scores)
         is_toxic = self.service.is_toxic(scores, threshold)
 
@@ -28,15 +74,21 @@ class DetoxifyController:
             scores={k: float(v) for k, v in scores.items()},
             max_toxicity=float(max_score),
             category=max_category,
-            recommendation="BLOCK" if is_toxic else "ALLOW"
+            recommendation="BLOCK" if is_toxic else "ALLOW",
+            long_text=details
         )
 
-    def analyze_batch(self, texts: List[str], threshold: float = 0.5) -> BatchAnalysisResponse:
-        """Analyse plusieurs textes"""
-        results = []
-        for text in texts:
-            result = self.analyze_text(text, threshold)
-            results.append(result)
+    def analyze_batch(self, texts: List[str], threshold: float = 0.5, long_text: bool = False,
+                      aggregation: str = "max") -> BatchAnalysisResponse:
+        """Analyse plusieurs textes (inférence par lots)"""
+        if long_text:
+            all_scores, all_details = self._score_long_texts(texts, aggregation)
+        else:
+            all_scores, all_details = self.service.predict_batch(texts), [None] * len(texts)
+        results = [
+            self._build_analysis(text, scores, threshold, details)
+            for text, scores, details in zip(texts, all_scores, all_details)
+        ]
 
         toxic_count = sum(1 for r in results if r.is_toxic)
         safe_count = len(texts) - toxic_count
@@ -48,9 +100,23 @@ class DetoxifyController:
             results=results
         )
 
-    def filter_text(self, text: str, threshold: float = 0.5) -> FilterResponse:
+    def filter_text(self, text: str, threshold: float = 0.5, long_text: bool = False,
+                    aggregation: str = "max") -> FilterResponse:
         """Filtre un texte basé sur le seuil"""
+        if long_text:
+            scores, details = self._score_long_texts([text], aggregation)
+            return self._build_filter(text, scores[0], threshold, details[0])
         scores = self.service.predict_toxicity(text)
+        return self._build_filter(text, scores, threshold)
+
+    async def filter_text_batched(self, text: str, threshold: float = 0.5, long_text: bool = False,
+                                  aggregation: str = "max") -> FilterResponse:
+        """Filtre un texte unique, regroupé avec les requêtes concurrentes"""
+        scores, details = await self._score_one(text, long_text, aggregation)
+        return self._build_filter(text, scores, threshold, details)
+
+    def _build_filter(self, text: str, scores: Dict[str, float], threshold: float,
+                      details: Optional[LongTextDetails] = None) -> FilterResponse:
         is_toxic = self.service.is_toxic(scores, threshold)
         is_safe = not is_toxic
 
@@ -61,16 +127,22 @@ class DetoxifyController:
             is_safe=is_safe,
             filtered=is_toxic,
             scores={k: float(v) for k, v in scores.items()},
-            message=message
+            message=message,
+            long_text=details
         )
 
-    def filter_batch(self, texts: List[str], threshold: float = 0.5) -> BatchFilterResponse:
-        """Filtre plusieurs textes"""
+    def filter_batch(self, texts: List[str], threshold: float = 0.5, long_text: bool = False,
+                     aggregation: str = "max") -> BatchFilterResponse:
+        """Filtre plusieurs textes (inférence par lots)"""
         results = []
         safe_texts = []
 
-        for text in texts:
-            result = self.filter_text(text, threshold)
+        if long_text:
+            all_scores, all_details = self._score_long_texts(texts, aggregation)
+        else:
+            all_scores, all_details = self.service.predict_batch(texts), [None] * len(texts)
+        for text, scores, details in zip(texts, all_scores, all_details):
+            result = self._build_filter(text, scores, threshold, details)
             results.append(result)
             if result.is_safe:
                 safe_texts.append(text)
@@ -86,7 +158,7 @@ class DetoxifyController:
     def get_statistics(self) -> StatsResponse:
         """Retourne les statistiques"""
         stats = self.service.get_stats()
-        return StatsResponse(**stats)
+        return StatsResponse(**stats, batching=self.batcher.get_stats())
 
     def health_check(self) -> HealthResponse:
         """Vérifie la santé du service"""
@@ -1,20 +1,68 @@
-from fastapi import FastAPI, UploadFile, File
+from fastapi import FastAPI, UploadFile, File, Query, Depends, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel
-import pandas as pd
-import io
-import spacy
-from presidio_analyzer import AnalyzerEngine
-from presidio_analyzer.nlp_engine import NlpEngineProvider # Important pour le français
-from presidio_anonymizer import AnonymizerEngine
-from presidio_anonymizer.entities import OperatorConfig
+from contextlib import asynccontextmanager
+import asyncio
+import threading
+import time
+from typing import List, Optional
+import os
 
-from routes import hallucination_router , router
+from routes import hallucination_router , router, require_model
+from services.anonymization_service import (
+    anonymiser_texte_detail,
+    anonymiser_dataframe,
+    lire_csv_par_blocs,
+    generer_csv_anonymise,
+    lire_bloc,
+    resoudre_entites,
+    cache as anonymization_cache,
+    pool as anonymization_pool,
+    stats_tiers as anonymization_tiers
+)
+from services.anonymization_profiles import (
+    DEFAULT_PROFILE,
+    PROFILS,
+    get_moteur,
+    profils_charges,
+    resoudre_profil
+)
+from services.executors import ExecutorBusy, anonymization_executor, detoxify_executor
+from services.http_client import http_client
+from services.logging_service import arreter_logs, champs_erreur, configurer_logs, get_logger, nouvelle_requete
+from services.metrics import exporter as exporter_metriques
+from services.model_registry import registry
+from services.profiler import ProfilingBusy, autorise as profilage_autorise, en_folded, en_resume, profiler
+
+registry.register("anonymizer", lambda: get_moteur(DEFAULT_PROFILE))
+
+logger = get_logger("api")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Logs écrits par un thread dédié (file) : jamais d'écriture bloquante dans la boucle asyncio
+    configurer_logs()
+    # Les modèles se chargent en arrière-plan : l'API répond tout de suite
+    # (/ et /ready), les routes concernées renvoient 503 tant qu'ils ne sont pas prêts
+    warm_up = asyncio.create_task(registry.warm_up())
+    # Les workers chargent le modèle une seule fois et survivent aux requêtes
+    anonymization_pool.start()
+    # Un seul client HTTP (pool de connexions keep-alive) pour les appels sortants
+    http_client.start()
+    yield
+    warm_up.cancel()
+    await http_client.close()
+    anonymization_pool.shutdown()
+    anonymization_executor.shutdown()
+    detoxify_executor.shutdown()
+    arreter_logs()
 
 app = FastAPI(
     title="Detoxify API",
     description="API de nettoyage de données pour Safe AI",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 app.add_middleware(
@@ -28,130 +76,220 @@ app.add_middleware(
 app.include_router(hallucination_router)
 app.include_router(router)
 
-# --- 1. CONFIGURATION DU MOTEUR NLP (FRANÇAIS) ---
-try:
-    import fr_core_news_lg
-    print("✅ Modèle Spacy Français détecté.")
-    
-    # On configure Presidio pour utiliser le modèle Français
-    configuration = {
-        "nlp_engine_name": "spacy",
-        "models": [{"lang_code": "fr", "model_name": "fr_core_news_lg"}]
-    }
-    
-    provider = NlpEngineProvider(nlp_configuration=configuration)
-    nlp_engine_with_french = provider.create_engine()
-    
-    # On force la langue 'fr'
-    analyzer = AnalyzerEngine(nlp_engine=nlp_engine_with_french, supported_languages=["fr"])
-    print("✅ Presidio configuré en FRANÇAIS (Emojis activés).")
-
-except ImportError:
-    print("⚠️ ERREUR : Modèle 'fr_core_news_lg' introuvable.")
-    print("👉 Fais: python -m spacy download fr_core_news_lg")
-    analyzer = AnalyzerEngine() # Fallback anglais
-
-anonymizer = AnonymizerEngine()
+@app.middleware("http")
+async def journal_requetes(request: Request, call_next):
+    """ID de requête (X-Request-ID repris ou généré) propagé aux logs, et une ligne d'accès par requête"""
+    request_id = nouvelle_requete(request.headers.get("x-request-id"))
+    debut = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers["X-Request-ID"] = request_id
+        return response
+    finally:
+        logger.info(f"{request.method} {request.url.path} {status}", extra={
+            "method": request.method,
+            "path": request.url.path,
+            "status": status,
+            "duration_ms": round((time.perf_counter() - debut) * 1000, 2)
+        })
 
 class TextRequest(BaseModel):
     text: str
+    profile: Optional[str] = None         # fast | balanced | accurate
+    entities: Optional[List[str]] = None  # sous-ensemble des entités à détecter
 
-# --- 2. FONCTION D'ANONYMISATION (VERSION EMOJIS) ---
-def anonymiser_texte(texte_brut):
-    """
-    Prend un texte et renvoie UNIQUEMENT le texte nettoyé (String).
-    """
-    if not isinstance(texte_brut, str) or len(texte_brut) < 2:
-        return texte_brut
-
-    # Analyse en Français
-    resultats_analyse = analyzer.analyze(
-        text=texte_brut, 
-        language='fr',
-        entities=[
-            "PERSON", "PHONE_NUMBER", "EMAIL_ADDRESS", "URL", 
-            "CREDIT_CARD", "IBAN", "LOCATION", "NRP"
-        ]
+def _reponse_saturee(e: ExecutorBusy) -> JSONResponse:
+    """Refus rapide quand l'exécuteur est plein, plutôt qu'une file d'attente sans fin"""
+    return JSONResponse(
+        status_code=503,
+        content={"error": str(e)},
+        headers={"Retry-After": str(e.retry_after)}
     )
 
-    # Configuration des Emojis
-    operators_config = {
-        "PERSON": OperatorConfig("replace", {"new_value": " [👤 NOM] "}),
-        "PHONE_NUMBER": OperatorConfig("replace", {"new_value": " [📞 TÉL] "}),
-        "EMAIL_ADDRESS": OperatorConfig("replace", {"new_value": " [📧 EMAIL] "}),
-        "URL": OperatorConfig("replace", {"new_value": " [🔗 LIEN] "}),
-        "CREDIT_CARD": OperatorConfig("replace", {"new_value": " [💳 CB] "}),
-        "IBAN": OperatorConfig("replace", {"new_value": " [🏦 IBAN] "}),
-        "LOCATION": OperatorConfig("replace", {"new_value": " [📍 LIEU] "}),
-        "NRP": OperatorConfig("replace", {"new_value": " [⚖️ SENSIBLE] "}),
-        "DEFAULT": OperatorConfig("replace", {"new_value": " [🔒 DONNÉE] "}),
-    }
+def _apercu_fichier(lecteur, batch_size, n_process, profil, entites) -> dict:
+    """Aperçu : seules les 10 premières lignes sont anonymisées, le reste est juste compté"""
+    total_rows = 0
+    df_preview = None
+    with lecteur:
+        while True:
+            bloc = lire_bloc(lecteur)
+            if bloc is None:
+                break
+            if df_preview is None:
+                df_preview = bloc.head(10)
+            total_rows += len(bloc)
 
-    resultat_anonymise = anonymizer.anonymize(
-        text=texte_brut,
-        analyzer_results=resultats_analyse,
-        operators=operators_config
+    preview_original = df_preview.fillna("").to_dict(orient='records')
+    tiers = {}
+    df_cleaned = anonymiser_dataframe(
+        df_preview, batch_size, n_process, comptes=tiers, profil=profil, entites=entites
     )
+    preview_cleaned = df_cleaned.fillna("").to_dict(orient='records')
 
-    # IMPORTANT : On ne renvoie QUE le texte pour simplifier le CSV et le Front
-    # Le Front React calcule les stats tout seul en comptant les emojis.
-    return resultat_anonymise.text
+    return {
+        "total_rows": total_rows,
+        "columns": list(df_preview.columns),
+        "preview_original": preview_original,
+        "preview_cleaned": preview_cleaned,
+        "tiers": tiers
+    }
 
-# --- 3. ENDPOINTS ---
+async def _flux_anonymise(generateur, lecteur):
+    """
+    Produit chaque bloc CSV dans l'exécuteur d'anonymisation, hors de la boucle
+    asyncio. Le générateur et le lecteur sont fermés à la fin, y compris quand
+    le client se déconnecte en cours de route.
+    """
+    # Le bloc en cours peut encore tourner dans un thread quand le flux est
+    # interrompu : la fermeture attend qu'il se termine
+    verrou = threading.Lock()
+
+    def suivant():
+        with verrou:
+            return next(generateur, None)
+
+    def fermer():
+        with verrou:
+            generateur.close()
+            lecteur.close()
+
+    try:
+        while True:
+            # Le flux a déjà été accepté : on attend son tour au lieu d'être refusé
+            bloc = await anonymization_executor.run(suivant, reject=False)
+            if bloc is None:
+                return
+            yield bloc
+    finally:
+        # Sans attendre (le flux peut être en cours d'annulation) : fermeture dans un thread
+        asyncio.get_running_loop().run_in_executor(None, fermer)
+
+# --- ENDPOINTS ---
 
 @app.get("/")
 def root():
     return {"status": "Online", "message": "SafeAI API is running 🚀"}
 
-@app.post("/clean-text")
+@app.get("/ready")
+def ready():
+    """Indique quels modèles sont chargés (200 si tous le sont, sinon 503)"""
+    return JSONResponse(
+        status_code=200 if registry.all_ready() else 503,
+        content={"ready": registry.all_ready(), "models": registry.get_status()}
+    )
+
+@app.get("/metrics")
+def metrics():
+    """Métriques Prometheus : durées par étape et compteurs des services"""
+    contenu, media_type = exporter_metriques()
+    if contenu is None:
+        return JSONResponse(status_code=503, content={"error": "prometheus_client non installé (pip install prometheus-client)"})
+    return Response(content=contenu, media_type=media_type)
+
+@app.get("/debug/profile")
+async def debug_profile(
+    seconds: float = Query(10, gt=0),
+    interval_ms: float = Query(10, gt=0),
+    format: str = Query("folded", pattern="^(folded|json)$"),
+    idle: bool = False,
+    x_profiling_token: Optional[str] = Header(None)
+):
+    """
+    Profil CPU échantillonné de ce worker pendant `seconds` (PROFILING_ENABLED).
+    - format=folded : piles repliées pour flamegraph.pl / speedscope
+    - format=json   : fonctions les plus présentes (self / total)
+    - idle=true     : garde aussi les threads en attente
+    """
+    if not profilage_autorise(x_profiling_token):
+        return JSONResponse(status_code=404, content={"error": "Not Found"})
+    try:
+        # Capture dans un thread : la boucle asyncio continue de servir (et d'être profilée)
+        resultat = await asyncio.to_thread(profiler.profile, seconds, interval_ms, idle)
+    except ProfilingBusy as e:
+        return JSONResponse(status_code=409, content={"error": str(e)})
+    if format == "json":
+        return en_resume(resultat)
+    return PlainTextResponse(en_folded(resultat))
+
+@app.post("/clean-text", dependencies=[Depends(require_model("anonymizer"))])
 async def clean_text_endpoint(input_data: TextRequest):
     try:
-        # On récupère juste le texte nettoyé
-        cleaned_text = anonymiser_texte(input_data.text)
+        # On récupère juste le texte nettoyé (inférence hors de la boucle asyncio)
+        cleaned_text, tier = await anonymization_executor.run(
+            anonymiser_texte_detail,
+            input_data.text,
+            profil=input_data.profile,
+            entites=input_data.entities
+        )
         
         return {
             "original": input_data.text,
-            "cleaned": cleaned_text 
+            "cleaned": cleaned_text,
+            "tier": tier
             # Plus besoin de renvoyer 'stats' ici, le Front React s'en charge
         }
+    except ExecutorBusy as e:
+        return _reponse_saturee(e)
     except Exception as e:
         return {"error": str(e)}
 
-@app.post("/clean-file")
-async def clean_file_endpoint(file: UploadFile = File(...)):
+@app.post("/clean-file", dependencies=[Depends(require_model("anonymizer"))])
+async def clean_file_endpoint(
+    file: UploadFile = File(...),
+    stream: bool = False,
+    batch_size: Optional[int] = Query(None, ge=1),
+    n_process: Optional[int] = Query(None, ge=1),
+    profile: Optional[str] = None,
+    entities: Optional[List[str]] = Query(None)
+):
+    """
+    Anonymise un CSV lu par blocs (mémoire bornée).
+    - stream=false : aperçu JSON des 10 premières lignes (comportement du Front)
+    - stream=true  : renvoie le CSV complet anonymisé en streaming
+    - batch_size / n_process : réglages de l'analyse par lots (nlp.pipe)
+    - profile / entities : profil spaCy et entités à détecter
+    Le nombre de cellules traitées par niveau (noop / pattern / ner) est
+    renvoyé dans l'aperçu, et cumulé dans /anonymization/stats.
+    """
     try:
-        contents = await file.read()
-        try:
-            string_content = contents.decode('utf-8')
-        except UnicodeDecodeError:
-            string_content = contents.decode('latin-1')
-
-        df = pd.read_csv(io.StringIO(string_content)) 
-        preview_original = df.head(10).fillna("").to_dict(orient='records')
-
-        # Fonction wrapper pour appliquer sur chaque cellule
-        def clean_cell(cell_value):
-            if isinstance(cell_value, str):
-                return anonymiser_texte(cell_value)
-            return cell_value
-
-        # Appliquer sur tout le tableau
-        df_cleaned = df.applymap(clean_cell)
-        
-        preview_cleaned = df_cleaned.head(10).fillna("").to_dict(orient='records')
+        profil = resoudre_profil(profile)
+        entites = resoudre_entites(entities)
+        lecteur = await anonymization_executor.run(lire_csv_par_blocs, file.file)
 
-        return {
-            "filename": file.filename,
-            "total_rows": len(df),
-            "columns": list(df.columns),
-            "preview_original": preview_original,
-            "preview_cleaned": preview_cleaned
-        }
+        if stream:
+            nom_fichier = os.path.basename(file.filename or "export.csv")
+            nom_fichier = nom_fichier.encode("ascii", "ignore").decode() or "export.csv"
+            return StreamingResponse(
+                _flux_anonymise(generer_csv_anonymise(lecteur, batch_size, n_process, profil, entites), lecteur),
+                media_type="text/csv",
+                headers={"Content-Disposition": f'attachment; filename="cleaned_{nom_fichier}"'}
+            )
+
+        apercu = await anonymization_executor.run(
+            _apercu_fichier, lecteur, batch_size, n_process, profil, entites
+        )
+        return {"filename": file.filename, **apercu}
+    except ExecutorBusy as e:
+        return _reponse_saturee(e)
     except Exception as e:
-        print(f"Erreur: {str(e)}")
+        logger.error("Erreur /clean-file", extra=champs_erreur(e))
         return {"error": str(e)}
 
-# --- 4. LANCEMENT ---
+@app.get("/anonymization/stats")
+def anonymization_stats():
+    """Statistiques du cache, du pool et de l'exécuteur d'anonymisation"""
+    return {
+        "profiles": list(PROFILS),
+        "profiles_loaded": profils_charges(),
+        "cache": anonymization_cache.get_stats(),
+        "pool": anonymization_pool.get_stats(),
+        "executor": anonymization_executor.get_stats(),
+        "tiers": anonymization_tiers
+    }
+
+# --- LANCEMENT ---
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
@@ -1,11 +1,31 @@
 # Backend/App/routes.py
 
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+import importlib.util
+import json
+import os
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from typing import List
+
+from services.executors import ExecutorBusy, detoxify_executor
+from services.logging_service import champs_erreur, get_logger
+from services.micro_batcher import QueueFullError
+from services.model_registry import ModelNotReady, registry
+
+# Délai conseillé (secondes) aux clients quand un modèle n'est pas encore chargé
+MODEL_RETRY_AFTER = int(os.getenv("MODEL_RETRY_AFTER", "5"))
+
+logger = get_logger("api")
 
 # Import conditionnel pour Detoxify (si disponible)
 try:
+    # find_spec évite d'importer torch au démarrage : le modèle est chargé en arrière-plan
+    if importlib.util.find_spec("detoxify") is None:
+        raise ImportError("detoxify")
     from controllers.detoxify_controller import DetoxifyController
+    from services.detoxify_service import TexteTropLong
     from schemas.requests import TextAnalysisRequest, BatchAnalysisRequest
     from schemas.responses import (
         ToxicityAnalysis,
@@ -18,10 +38,26 @@ try:
     DETOXIFY_AVAILABLE = True
 except ImportError:
     DETOXIFY_AVAILABLE = False
-    print("⚠️ Module Detoxify non disponible (normal si pas installé)")
+    logger.warning("⚠️ Module Detoxify non disponible (normal si pas installé)")
 
 # Import du service Hallucination (TOUJOURS disponible)
-from services.hallucination_service import analyze_hallucination, detector
+from services.hallucination_service import HALLUCINATION_BATCH_MAX_ITEMS, analyze_hallucination, detector
+
+def require_model(name: str):
+    """Dépendance FastAPI : renvoie le modèle chargé, ou 503 + Retry-After s'il ne l'est pas encore"""
+    def dependency():
+        try:
+            return registry.get(name)
+        except ModelNotReady as e:
+            raise HTTPException(
+                status_code=503,
+                detail=str(e),
+                headers={"Retry-After": str(MODEL_RETRY_AFTER)}
+            )
+    return dependency
+
+# Le détecteur n'embarque pas de modèle local : il est prêt dès son chargement
+registry.register("hallucination", lambda: detector)
 
 # ============================================
 # ROUTER 1: HALLUCINATION DETECTION
@@ -41,6 +77,22 @@ class HallucinationRequest(BaseModel):
             }
         }
 
+class HallucinationBatchRequest(BaseModel):
+    """Modèle pour l'analyse de plusieurs textes en une requête"""
+    prompts: List[str] = Field(..., min_length=1, max_length=HALLUCINATION_BATCH_MAX_ITEMS)
+    pack_short_claims: bool = Field(default=False, description="Regroupe les textes courts dans un même appel au modèle")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "prompts": [
+                    "La pénicilline a été découverte par Alexander Fleming en 1899.",
+                    "La tour Eiffel se trouve à Paris."
+                ],
+                "pack_short_claims": True
+            }
+        }
+
 class HallucinationHealthResponse(BaseModel):
     """Réponse du health check hallucination"""
     status: str
@@ -49,7 +101,7 @@ class HallucinationHealthResponse(BaseModel):
 
 # --- ENDPOINTS HALLUCINATION ---
 
-@hallucination_router.post("/detect-hallucination")
+@hallucination_router.post("/detect-hallucination", dependencies=[Depends(require_model("hallucination"))])
 async def detect_hallucination_endpoint(request: HallucinationRequest):
     """
     🔍 Détecte les hallucinations dans un prompt
@@ -73,12 +125,76 @@ async def detect_hallucination_endpoint(request: HallucinationRequest):
     except HTTPException:
         raise
     except Exception as e:
-        print(f"❌ Erreur endpoint hallucination: {str(e)}")
+        logger.error("❌ Erreur endpoint hallucination", extra=champs_erreur(e))
         raise HTTPException(
             status_code=500, 
             detail=f"Erreur lors de l'analyse: {str(e)}"
         )
 
+@hallucination_router.post("/detect-hallucination/batch", dependencies=[Depends(require_model("hallucination"))])
+async def detect_hallucination_batch_endpoint(request: HallucinationBatchRequest):
+    """
+    🔍 Détecte les hallucinations dans plusieurs textes (vérifiés en parallèle)
+    
+    Returns:
+        Un résultat par texte, dans l'ordre : `status` "ok" avec `ai_analysis`, ou "error"
+    """
+    # Les textes trop courts sont refusés individuellement, sans bloquer les autres
+    valides = [i for i, prompt in enumerate(request.prompts) if prompt and len(prompt.strip()) >= 10]
+    analyses = await detector.detect_hallucination_batch(
+        [request.prompts[i] for i in valides],
+        pack=request.pack_short_claims
+    )
+
+    results = [
+        {
+            "index": i,
+            "status": "error",
+            "original_prompt": prompt,
+            "error": "Le prompt doit contenir au moins 10 caractères"
+        }
+        for i, prompt in enumerate(request.prompts)
+    ]
+    for i, analysis in zip(valides, analyses):
+        results[i] = {**analysis, "index": i}
+
+    failed = sum(1 for r in results if r["status"] == "error")
+    return {
+        "total": len(results),
+        "succeeded": len(results) - failed,
+        "failed": failed,
+        "results": results
+    }
+
+def _evenement_sse(event: str, data: dict) -> str:
+    """Formate un événement Server-Sent Events"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@hallucination_router.post("/detect-hallucination/stream", dependencies=[Depends(require_model("hallucination"))])
+async def detect_hallucination_stream_endpoint(request: HallucinationRequest):
+    """
+    🔍 Détecte les hallucinations phrase par phrase, en flux (Server-Sent Events)
+    
+    Événements : `claims` (découpage), un `claim` par verdict dès qu'il est prêt
+    (format de `/detect-hallucination` + positions `start`/`end`), puis `summary`.
+    """
+    if not request.prompt or len(request.prompt.strip()) < 10:
+        raise HTTPException(
+            status_code=400, 
+            detail="Le prompt doit contenir au moins 10 caractères"
+        )
+
+    async def flux():
+        async for evenement in detector.stream_claims(request.prompt):
+            yield _evenement_sse(evenement["event"], evenement["data"])
+
+    return StreamingResponse(
+        flux(),
+        media_type="text/event-stream",
+        # Pas de mise en tampon par un proxy (nginx) : chaque verdict part immédiatement
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @hallucination_router.get("/hallucination/stats")
 async def get_hallucination_statistics():
     """
@@ -122,42 +238,71 @@ async def hallucination_health_check():
 
 if DETOXIFY_AVAILABLE:
     router = APIRouter(prefix="/api/v1", tags=["Detoxify"])
-    controller = DetoxifyController()
+    registry.register("detoxify", DetoxifyController)
+    get_controller = require_model("detoxify")
 
     @router.post("/analyze", response_model=ToxicityAnalysis)
-    async def analyze_text(request: TextAnalysisRequest):
+    async def analyze_text(request: TextAnalysisRequest, controller: DetoxifyController = Depends(get_controller)):
         """Analyse un texte pour détecter la toxicité"""
         try:
-            return controller.analyze_text(request.text, request.threshold)
+            return await controller.analyze_text_batched(
+                request.text, request.threshold, request.long_text, request.aggregation
+            )
+        except QueueFullError as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+        except ExecutorBusy as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+        except TexteTropLong as e:
+            raise HTTPException(status_code=413, detail=str(e))
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Erreur d'analyse: {str(e)}")
 
     @router.post("/analyze/batch", response_model=BatchAnalysisResponse)
-    async def analyze_batch(request: BatchAnalysisRequest):
+    async def analyze_batch(request: BatchAnalysisRequest, controller: DetoxifyController = Depends(get_controller)):
         """Analyse plusieurs textes en batch"""
         try:
-            return controller.analyze_batch(request.texts, request.threshold)
+            return await detoxify_executor.run(
+                controller.analyze_batch, request.texts, request.threshold, request.long_text, request.aggregation
+            )
+        except ExecutorBusy as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+        except TexteTropLong as e:
+            raise HTTPException(status_code=413, detail=str(e))
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Erreur d'analyse batch: {str(e)}")
 
     @router.post("/filter", response_model=FilterResponse)
-    async def filter_text(request: TextAnalysisRequest):
+    async def filter_text(request: TextAnalysisRequest, controller: DetoxifyController = Depends(get_controller)):
         """Filtre un texte si toxique, sinon le retourne"""
         try:
-            return controller.filter_text(request.text, request.threshold)
+            return await controller.filter_text_batched(
+                request.text, request.threshold, request.long_text, request.aggregation
+            )
+        except QueueFullError as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+        except ExecutorBusy as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+        except TexteTropLong as e:
+            raise HTTPException(status_code=413, detail=str(e))
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Erreur de filtrage: {str(e)}")
 
     @router.post("/filter/batch", response_model=BatchFilterResponse)
-    async def filter_batch(request: BatchAnalysisRequest):
+    async def filter_batch(request: BatchAnalysisRequest, controller: DetoxifyController = Depends(get_controller)):
         """Filtre une liste de textes"""
         try:
-            return controller.filter_batch(request.texts, request.threshold)
+            return await detoxify_executor.run(
+                controller.filter_batch, request.texts, request.threshold, request.long_text, request.aggregation
+            )
+        except ExecutorBusy as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+        except TexteTropLong as e:
+            raise HTTPException(status_code=413, detail=str(e))
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Erreur de filtrage batch: {str(e)}")
 
     @router.get("/stats", response_model=StatsResponse)
-    async def get_stats():
+    async def get_stats(controller: DetoxifyController = Depends(get_controller)):
         """Obtient les statistiques d'utilisation"""
         try:
             return controller.get_statistics()
@@ -165,7 +310,7 @@ if DETOXIFY_AVAILABLE:
             raise HTTPException(status_code=500, detail=f"Erreur de récupération des stats: {str(e)}")
 
     @router.get("/health", response_model=DetoxifyHealthResponse)
-    async def health_check():
+    async def health_check(controller: DetoxifyController = Depends(get_controller)):
         """Vérifie que le service fonctionne"""
         try:
             return controller.health_check()
@@ -1,10 +1,14 @@
 from pydantic import BaseModel, Field
-from typing import List
+from typing import List, Literal
 
 class TextAnalysisRequest(BaseModel):
     text: str = Field(..., description="Le texte à analyser", min_length=1)
     threshold: float = Field(default=0.5, ge=0.0, le=1.0, description="Seuil de toxicité (0-1)")
+    long_text: bool = Field(default=False, description="Score par fenêtres glissantes, sans troncature des textes longs")
+    aggregation: Literal["max", "mean"] = Field(default="max", description="Agrégation des scores des fenêtres (mode texte long)")
 
 class BatchAnalysisRequest(BaseModel):
     texts: List[str] = Field(..., description="Liste de textes à analyser", min_items=1)
-    threshold: float = Field(default=0.5, ge=0.0, le=1.0, description="Seuil de toxicité (0-1)")
\ No newline at end of file
+    threshold: float = Field(default=0.5, ge=0.0, le=1.0, description="Seuil de toxicité (0-1)")
+    long_text: bool = Field(default=False, description="Score par fenêtres glissantes, sans troncature des textes longs")
+    aggregation: Literal["max", "mean"] = Field(default="max", description="Agrégation des scores des fenêtres (mode texte long)")
\ No newline at end of file
@@ -1,5 +1,17 @@
 from pydantic import BaseModel
-from typing import List, Dict
+from typing import List, Dict, Any, Optional
+
+class SpanScore(BaseModel):
+    start: int
+    end: int
+    text: str
+    category: str
+    score: float
+
+class LongTextDetails(BaseModel):
+    windows: int
+    aggregation: str
+    top_span: SpanScore
 
 class ToxicityAnalysis(BaseModel):
     text: str
@@ -8,6 +20,7 @@ class ToxicityAnalysis(BaseModel):
     max_toxicity: float
     category: str
     recommendation: str
+    long_text: Optional[LongTextDetails] = None
 
 class BatchAnalysisResponse(BaseModel):
     total_analyzed: int
@@ -21,6 +34,7 @@ class FilterResponse(BaseModel):
     filtered: bool
     scores: Dict[str, float]
     message: str
+    long_text: Optional[LongTextDetails] = None
 
 class BatchFilterResponse(BaseModel):
     total_submitted: int
@@ -34,6 +48,9 @@ class StatsResponse(BaseModel):
     toxic_detected: int
     safe_texts: int
     toxicity_rate: float
+    engine: Optional[str] = None
+    batching: Optional[Dict[str, Any]] = None
+    cache: Optional[Dict[str, Any]] = None
 
 class HealthResponse(BaseModel):
     status: str
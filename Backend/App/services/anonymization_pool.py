@@ -0,0 +1,145 @@
+import math
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional
+
+from services.logging_service import get_logger
+from services.metrics import Compteurs, processus_termine
+
+logger = get_logger("anonymization")
+
+
+class AnonymizationPool:
+    """
+    Pool de processus qui vit aussi longtemps que l'application : chaque worker
+    charge le moteur NLP une seule fois (initializer), puis les lots de textes
+    lui sont distribués. Sans worker (workers=0), tout est exécuté dans le
+    processus courant.
+    """
+
+    def __init__(
+        self,
+        workers: int = 0,
+        initializer: Optional[Callable] = None,
+        min_partition: int = 64,
+        start_method: str = "spawn"
+    ):
+        self.workers = workers
+        self.initializer = initializer
+        self.min_partition = min_partition
+        self.start_method = start_method
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # Chaque worker y dépose son PID au démarrage (métriques à nettoyer à l'arrêt)
+        self._file_pids = None
+        # map_partitions est appelé depuis plusieurs threads : le redémarrage après
+        # un crash est protégé, et la génération évite de redémarrer deux fois
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.stats = Compteurs("anonymization_pool", ["pool_batches", "local_batches", "partitions", "fallbacks"])
+
+    @property
+    def enabled(self) -> bool:
+        return self._executor is not None
+
+    def start(self):
+        """Démarre les workers (idempotent) et lance leur chargement du modèle"""
+        with self._lock:
+            self._start()
+
+    def _start(self):
+        if self.workers <= 0 or self._executor is not None:
+            return
+
+        contexte = multiprocessing.get_context(self.start_method)
+        self._file_pids = contexte.SimpleQueue()
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=contexte,
+            initializer=_demarrer_worker,
+            initargs=(self._file_pids, self.initializer)
+        )
+        # Une tâche vide par worker force le démarrage de tous les processus
+        for _ in range(self.workers):
+            self._executor.submit(_ping)
+        logger.info(f"✅ Pool d'anonymisation démarré ({self.workers} workers)")
+
+    def shutdown(self):
+        with self._lock:
+            self._shutdown()
+
+    def _shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+            # Workers arrêtés : tous ont déposé leur PID, y compris ceux remplacés après un crash
+            pids = set()
+            while not self._file_pids.empty():
+                pids.add(self._file_pids.get())
+            self._file_pids.close()
+            self._file_pids = None
+            for pid in pids:
+                processus_termine(pid)
+
+    def map_partitions(self, fn: Callable[..., List], items: List, *args) -> List:
+        """
+        Découpe `items` en partitions contiguës, exécute `fn(partition, *args)`
+        sur les workers et recolle les résultats dans l'ordre d'origine.
+        """
+        if not items:
+            return []
+
+        with self._lock:
+            executor, generation = self._executor, self._generation
+        if executor is None or len(items) < self.min_partition * 2:
+            self.stats.incr("local_batches")
+            return fn(items, *args)
+
+        taille = max(self.min_partition, math.ceil(len(items) / self.workers))
+        partitions = [items[i:i + taille] for i in range(0, len(items), taille)]
+
+        try:
+            futures = [executor.submit(fn, partition, *args) for partition in partitions]
+            resultats = []
+            for future in futures:
+                resultats.extend(future.result())
+        except BrokenProcessPool:
+            # Un worker est mort (OOM...) : on repart sur un pool neuf et on
+            # termine ce lot dans le processus courant
+            self.stats.incr("fallbacks")
+            self._redemarrer(generation)
+            return fn(items, *args)
+
+        self.stats.incr("pool_batches")
+        self.stats.incr("partitions", len(partitions))
+        return resultats
+
+    def _redemarrer(self, generation: int):
+        """Remplace le pool cassé, une seule fois même si plusieurs threads l'ont vu tomber"""
+        with self._lock:
+            if generation != self._generation:
+                return
+            logger.warning("⚠️ Pool d'anonymisation cassé, repli en mode local")
+            self._generation += 1
+            self._shutdown()
+            self._start()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "workers": self.workers if self.enabled else 0,
+            "mode": "process-pool" if self.enabled else "in-process"
+        }
+
+
+def _demarrer_worker(file_pids, initializer: Optional[Callable]):
+    """Initializer réel des workers : déclare le PID au parent, puis lance `initializer`"""
+    file_pids.put(os.getpid())
+    if initializer is not None:
+        initializer()
+
+
+def _ping():
+    return True
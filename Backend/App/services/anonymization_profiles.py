@@ -0,0 +1,106 @@
+import importlib.util
+import os
+import threading
+from typing import Dict, List
+
+from presidio_analyzer import AnalyzerEngine, BatchAnalyzerEngine
+from presidio_analyzer.nlp_engine import NlpEngineProvider # Important pour le français
+from presidio_analyzer.predefined_recognizers import SpacyRecognizer
+
+from services.logging_service import get_logger
+
+# Profils de pipeline spaCy : seul le NER sert à Presidio, les autres
+# composants sont désactivés quand la vitesse prime sur la finesse
+PROFILS = {
+    "fast": {
+        "model_name": "fr_core_news_sm",
+        "disable": ["parser", "lemmatizer", "attribute_ruler", "morphologizer"]
+    },
+    "balanced": {
+        "model_name": "fr_core_news_md",
+        "disable": ["parser"]
+    },
+    "accurate": {
+        "model_name": "fr_core_news_lg",
+        "disable": []
+    },
+}
+
+DEFAULT_PROFILE = os.getenv("ANONYMIZATION_PROFILE", "accurate")
+
+logger = get_logger("anonymization")
+
+
+class MoteurAnonymisation:
+    """Analyseur Presidio construit une seule fois pour un profil donné"""
+
+    def __init__(self, nom: str):
+        config = PROFILS[nom]
+        model_name = config["model_name"]
+        self.nom = nom
+
+        # --- CONFIGURATION DU MOTEUR NLP (FRANÇAIS) ---
+        if importlib.util.find_spec(model_name) is not None:
+            logger.info(f"✅ Modèle Spacy Français détecté ({model_name}, profil '{nom}').")
+
+            # On configure Presidio pour utiliser le modèle Français
+            configuration = {
+                "nlp_engine_name": "spacy",
+                "models": [{"lang_code": "fr", "model_name": model_name}]
+            }
+
+            provider = NlpEngineProvider(nlp_configuration=configuration)
+            nlp_engine_with_french = provider.create_engine()
+
+            nlp = nlp_engine_with_french.nlp["fr"]
+            for composant in config["disable"]:
+                if composant in nlp.pipe_names:
+                    nlp.disable_pipe(composant)
+
+            # On force la langue 'fr'
+            self.analyzer = AnalyzerEngine(nlp_engine=nlp_engine_with_french, supported_languages=["fr"])
+            logger.info(f"✅ Presidio configuré en FRANÇAIS (pipeline: {', '.join(nlp.pipe_names)}).")
+        else:
+            logger.warning(f"⚠️ ERREUR : Modèle '{model_name}' introuvable. 👉 Fais: python -m spacy download {model_name}")
+            self.analyzer = AnalyzerEngine() # Fallback anglais
+
+        self.batch_analyzer = BatchAnalyzerEngine(analyzer_engine=self.analyzer)
+        self._reconnaisseurs_motifs: Dict[tuple, List] = {}
+
+    def reconnaisseurs_motifs(self, entites: List[str]) -> List:
+        """Reconnaisseurs Presidio à base de regex (sans le SpacyRecognizer)"""
+        cle = tuple(entites)
+        if cle not in self._reconnaisseurs_motifs:
+            self._reconnaisseurs_motifs[cle] = [
+                r for r in self.analyzer.registry.get_recognizers(language='fr', entities=list(entites))
+                if not isinstance(r, SpacyRecognizer)
+            ]
+        return self._reconnaisseurs_motifs[cle]
+
+
+_moteurs: Dict[str, MoteurAnonymisation] = {}
+_lock = threading.Lock()
+
+
+def resoudre_profil(nom: str = None) -> str:
+    nom = nom or DEFAULT_PROFILE
+    if nom not in PROFILS:
+        raise ValueError(f"Profil inconnu '{nom}'. Profils disponibles: {', '.join(PROFILS)}")
+    return nom
+
+
+def get_moteur(nom: str = None) -> MoteurAnonymisation:
+    """Retourne le moteur du profil, construit au premier appel puis réutilisé"""
+    nom = resoudre_profil(nom)
+    moteur = _moteurs.get(nom)
+    if moteur is None:
+        with _lock:
+            moteur = _moteurs.get(nom)
+            if moteur is None:
+                moteur = MoteurAnonymisation(nom)
+                _moteurs[nom] = moteur
+    return moteur
+
+
+def profils_charges() -> List[str]:
+    return list(_moteurs)
@@ -0,0 +1,372 @@
+import codecs
+import json
+import os
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+from presidio_analyzer import EntityRecognizer
+from presidio_anonymizer import AnonymizerEngine
+from presidio_anonymizer.entities import OperatorConfig
+
+from services.anonymization_pool import AnonymizationPool
+from services.anonymization_profiles import DEFAULT_PROFILE, get_moteur, resoudre_profil
+from services.cache_service import LRUCache, cle_contenu
+from services.metrics import STAGE_CSV_PARSE, STAGE_PRESIDIO_ANALYZE, STAGE_PRESIDIO_ANONYMIZE, Compteurs, mesurer
+from services.pii_prefilter import (
+    TIERS,
+    TIER_NOOP,
+    TIER_PATTERN,
+    TIER_NER,
+    classer_valeur,
+    plus_cher,
+    profiler_colonnes,
+    tier_effectif
+)
+
+# Nombre de lignes lues (et anonymisées) à la fois dans un CSV
+CSV_CHUNK_ROWS = int(os.getenv("CSV_CHUNK_ROWS", "5000"))
+# Taille des blocs lus pour détecter l'encodage sans charger le fichier
+ENCODING_SNIFF_BYTES = 64 * 1024
+# Analyse par lots (nlp.pipe) des colonnes d'un tableau
+NLP_BATCH_SIZE = int(os.getenv("NLP_BATCH_SIZE", "256"))
+NLP_N_PROCESS = int(os.getenv("NLP_N_PROCESS", "1"))
+# Cache des textes déjà anonymisés
+ANONYMIZATION_CACHE_MAX_ITEMS = int(os.getenv("ANONYMIZATION_CACHE_MAX_ITEMS", "100000"))
+ANONYMIZATION_CACHE_MAX_MB = int(os.getenv("ANONYMIZATION_CACHE_MAX_MB", "128"))
+# Nombre de processus workers pour /clean-file (0 = tout dans le processus courant)
+ANONYMIZATION_WORKERS = int(os.getenv("ANONYMIZATION_WORKERS", "0"))
+# Pré-filtre regex : les valeurs sans entité possible ne passent pas par spaCy
+PREFILTER_ENABLED = os.getenv("PREFILTER_ENABLED", "true").lower() == "true"
+
+ENTITES = [
+    "PERSON", "PHONE_NUMBER", "EMAIL_ADDRESS", "URL",
+    "CREDIT_CARD", "IBAN", "LOCATION", "NRP"
+]
+# Entités détectables sans modèle NLP (regex + validation)
+ENTITES_MOTIFS = ["EMAIL_ADDRESS", "PHONE_NUMBER", "IBAN", "CREDIT_CARD", "URL"]
+# Entités qui nécessitent le NER spaCy
+ENTITES_NER = ["PERSON", "LOCATION", "NRP"]
+
+# Configuration des Emojis
+OPERATORS_CONFIG = {
+    "PERSON": OperatorConfig("replace", {"new_value": " [👤 NOM] "}),
+    "PHONE_NUMBER": OperatorConfig("replace", {"new_value": " [📞 TÉL] "}),
+    "EMAIL_ADDRESS": OperatorConfig("replace", {"new_value": " [📧 EMAIL] "}),
+    "URL": OperatorConfig("replace", {"new_value": " [🔗 LIEN] "}),
+    "CREDIT_CARD": OperatorConfig("replace", {"new_value": " [💳 CB] "}),
+    "IBAN": OperatorConfig("replace", {"new_value": " [🏦 IBAN] "}),
+    "LOCATION": OperatorConfig("replace", {"new_value": " [📍 LIEU] "}),
+    "NRP": OperatorConfig("replace", {"new_value": " [⚖️ SENSIBLE] "}),
+    "DEFAULT": OperatorConfig("replace", {"new_value": " [🔒 DONNÉE] "}),
+}
+_OPERATORS_SIGNATURE = {k: [v.operator_name, v.params] for k, v in OPERATORS_CONFIG.items()}
+
+cache = LRUCache(
+    max_items=ANONYMIZATION_CACHE_MAX_ITEMS,
+    max_bytes=ANONYMIZATION_CACHE_MAX_MB * 1024 * 1024
+)
+
+# --- 1. CONFIGURATION DU MOTEUR NLP (FRANÇAIS) ---
+# Les moteurs sont construits à la demande (voir services/anonymization_profiles.py) :
+# le profil par défaut est préchargé en arrière-plan au démarrage de l'API
+
+anonymizer = AnonymizerEngine()
+
+# Nombre de valeurs traitées par chaque niveau depuis le démarrage
+stats_tiers = Compteurs("anonymization_tiers", TIERS)
+
+def _a_anonymiser(valeur) -> bool:
+    return isinstance(valeur, str) and len(valeur) >= 2
+
+def resoudre_entites(entites: Optional[List[str]] = None) -> List[str]:
+    """Valide la liste d'entités demandée (toutes par défaut), dans l'ordre de ENTITES"""
+    if not entites:
+        return ENTITES
+    inconnues = [e for e in entites if e not in ENTITES]
+    if inconnues:
+        raise ValueError(f"Entités inconnues: {', '.join(inconnues)}. Entités disponibles: {', '.join(ENTITES)}")
+    return [e for e in ENTITES if e in entites]
+
+def _signature(profil: str, entites: List[str]) -> str:
+    """
+    Empreinte de la configuration : un changement de profil, d'entités ou
+    d'opérateurs donne une autre clé de cache
+    """
+    return json.dumps(
+        {"profile": profil, "entities": entites, "operators": _OPERATORS_SIGNATURE},
+        sort_keys=True,
+        ensure_ascii=False
+    )
+
+def _tier_demande(tier: str, entites: List[str]) -> str:
+    """Rétrograde le niveau quand les entités qu'il cible n'ont pas été demandées"""
+    if tier == TIER_NER and not any(e in ENTITES_NER for e in entites):
+        tier = TIER_PATTERN
+    if tier == TIER_PATTERN and not any(e in ENTITES_MOTIFS for e in entites):
+        tier = TIER_NOOP
+    return tier
+
+def _anonymiser_motifs(texte_brut: str, profil: str, entites: List[str]) -> str:
+    """Niveau 'pattern' : seuls les reconnaisseurs regex tournent, pas de passage spaCy"""
+    entites_motifs = [e for e in entites if e in ENTITES_MOTIFS]
+    resultats_analyse = []
+    with mesurer(STAGE_PRESIDIO_ANALYZE):
+        for reconnaisseur in get_moteur(profil).reconnaisseurs_motifs(entites_motifs):
+            resultats_analyse.extend(reconnaisseur.analyze(texte_brut, entites_motifs, None))
+
+    with mesurer(STAGE_PRESIDIO_ANONYMIZE):
+        return anonymizer.anonymize(
+            text=texte_brut,
+            analyzer_results=EntityRecognizer.remove_duplicates(resultats_analyse),
+            operators=OPERATORS_CONFIG
+        ).text
+
+# --- 2. FONCTION D'ANONYMISATION (VERSION EMOJIS) ---
+def _anonymiser_sans_cache(texte_brut: str, profil: str, entites: List[str]) -> str:
+    # Analyse en Français : seuls les reconnaisseurs des entités demandées tournent
+    with mesurer(STAGE_PRESIDIO_ANALYZE):
+        resultats_analyse = get_moteur(profil).analyzer.analyze(
+            text=texte_brut,
+            language='fr',
+            entities=entites
+        )
+
+    with mesurer(STAGE_PRESIDIO_ANONYMIZE):
+        resultat_anonymise = anonymizer.anonymize(
+            text=texte_brut,
+            analyzer_results=resultats_analyse,
+            operators=OPERATORS_CONFIG
+        )
+
+    # IMPORTANT : On ne renvoie QUE le texte pour simplifier le CSV et le Front
+    # Le Front React calcule les stats tout seul en comptant les emojis.
+    return resultat_anonymise.text
+
+def anonymiser_texte_detail(
+    texte_brut,
+    profil: Optional[str] = None,
+    entites: Optional[List[str]] = None
+) -> Tuple[str, str]:
+    """
+    Anonymise un texte et renvoie (texte nettoyé, niveau de traitement utilisé).
+    Les textes déjà analysés par spaCy sont servis depuis le cache LRU.
+    """
+    profil = resoudre_profil(profil)
+    entites = resoudre_entites(entites)
+
+    tier = classer_valeur(texte_brut) if PREFILTER_ENABLED or not _a_anonymiser(texte_brut) else TIER_NER
+    tier = _tier_demande(tier, entites)
+    stats_tiers.incr(tier)
+
+    if tier == TIER_NOOP:
+        return texte_brut, tier
+    if tier == TIER_PATTERN:
+        return _anonymiser_motifs(texte_brut, profil, entites), tier
+
+    cle = cle_contenu(texte_brut, _signature(profil, entites))
+    texte_nettoye = cache.get(cle)
+    if texte_nettoye is None:
+        texte_nettoye = _anonymiser_sans_cache(texte_brut, profil, entites)
+        cache.set(cle, texte_nettoye)
+    return texte_nettoye, tier
+
+def anonymiser_texte(texte_brut, profil: Optional[str] = None, entites: Optional[List[str]] = None):
+    """
+    Prend un texte et renvoie UNIQUEMENT le texte nettoyé (String).
+    """
+    return anonymiser_texte_detail(texte_brut, profil, entites)[0]
+
+def anonymiser_textes(
+    textes: List[str],
+    batch_size: Optional[int] = None,
+    n_process: Optional[int] = None,
+    profil: Optional[str] = None,
+    entites: Optional[List[str]] = None
+) -> List[str]:
+    """
+    Version par lots de anonymiser_texte : les doublons et les textes déjà en
+    cache sont écartés, puis un seul passage spaCy (nlp.pipe) traite le reste.
+    """
+    profil = resoudre_profil(profil)
+    entites = resoudre_entites(entites)
+    signature = _signature(profil, entites)
+
+    uniques = dict.fromkeys(textes)
+    a_analyser = []
+    for texte in uniques:
+        uniques[texte] = cache.get(cle_contenu(texte, signature))
+        if uniques[texte] is None:
+            a_analyser.append(texte)
+
+    if a_analyser:
+        batch_size = batch_size or NLP_BATCH_SIZE
+        # Les workers du pool sont des processus démons : pas de sous-processus spaCy
+        n_process = 1 if pool.enabled else (n_process or NLP_N_PROCESS)
+        textes_nettoyes = pool.map_partitions(
+            _anonymiser_lot, a_analyser, batch_size, n_process, profil, entites
+        )
+
+        for texte, texte_nettoye in zip(a_analyser, textes_nettoyes):
+            uniques[texte] = texte_nettoye
+            cache.set(cle_contenu(texte, signature), texte_nettoye)
+
+    return [uniques[texte] for texte in textes]
+
+def _anonymiser_lot(
+    textes: List[str],
+    batch_size: int,
+    n_process: int,
+    profil: str,
+    entites: List[str]
+) -> List[str]:
+    """
+    Analyse par lots (nlp.pipe) puis anonymise, sans cache. Exécuté par les workers.
+    Les durées sont celles du lot entier.
+    """
+    with mesurer(STAGE_PRESIDIO_ANALYZE):
+        resultats = get_moteur(profil).batch_analyzer.analyze_iterator(
+            textes,
+            language='fr',
+            batch_size=batch_size,
+            n_process=n_process,
+            entities=entites
+        )
+
+    with mesurer(STAGE_PRESIDIO_ANONYMIZE):
+        return [
+            anonymizer.anonymize(
+                text=texte,
+                analyzer_results=resultats_analyse,
+                operators=OPERATORS_CONFIG
+            ).text
+            for texte, resultats_analyse in zip(textes, resultats)
+        ]
+
+def _initialiser_worker():
+    """Initializer des workers : chaque processus charge et chauffe le modèle une seule fois"""
+    get_moteur(DEFAULT_PROFILE).analyzer.analyze(text="Initialisation du worker", language='fr', entities=ENTITES)
+
+pool = AnonymizationPool(workers=ANONYMIZATION_WORKERS, initializer=_initialiser_worker)
+
+# --- 3. TRAITEMENT DES FICHIERS CSV PAR BLOCS ---
+def detecter_encodage(fichier: BinaryIO) -> str:
+    """
+    Détecte l'encodage d'un fichier binaire (UTF-8 sinon Latin-1) en le lisant
+    bloc par bloc avec un décodeur incrémental : la mémoire reste bornée.
+    """
+    fichier.seek(0)
+    debut = fichier.read(ENCODING_SNIFF_BYTES)
+    encodage = "utf-8-sig" if debut.startswith(codecs.BOM_UTF8) else "utf-8"
+
+    decodeur = codecs.getincrementaldecoder("utf-8")()
+    bloc = debut
+    try:
+        while bloc:
+            decodeur.decode(bloc, final=False)
+            bloc = fichier.read(ENCODING_SNIFF_BYTES)
+        decodeur.decode(b"", final=True)
+    except UnicodeDecodeError:
+        encodage = "latin-1"
+
+    fichier.seek(0)
+    return encodage
+
+def lire_csv_par_blocs(fichier: BinaryIO, chunksize: int = CSV_CHUNK_ROWS):
+    """
+    Retourne un itérateur pandas qui lit le CSV `chunksize` lignes à la fois.
+    La lecture (décodage, parsing) a lieu à chaque bloc : voir lire_bloc.
+    """
+    encodage = detecter_encodage(fichier)
+    return pd.read_csv(fichier, encoding=encodage, chunksize=chunksize)
+
+def lire_bloc(lecteur) -> Optional[pd.DataFrame]:
+    """Bloc suivant du lecteur CSV (None à la fin), durée de parsing mesurée"""
+    with mesurer(STAGE_CSV_PARSE):
+        return next(lecteur, None)
+
+def anonymiser_dataframe(
+    df: pd.DataFrame,
+    batch_size: Optional[int] = None,
+    n_process: Optional[int] = None,
+    comptes: Optional[Dict[str, int]] = None,
+    profil: Optional[str] = None,
+    entites: Optional[List[str]] = None
+) -> pd.DataFrame:
+    """
+    Anonymise toutes les cellules texte d'un DataFrame.
+    Les colonnes sont profilées sur un échantillon, chaque valeur unique reçoit
+    un niveau (noop / pattern / ner) et seules les valeurs 'ner' sont envoyées
+    ensemble, par lots, au moteur NLP. Si `comptes` est fourni, il est
+    incrémenté du nombre de cellules traitées par chaque niveau.
+    """
+    profil = resoudre_profil(profil)
+    entites = resoudre_entites(entites)
+
+    if PREFILTER_ENABLED:
+        profil_colonnes = profiler_colonnes(df)
+    else:
+        profil_colonnes = {position: TIER_NER for position in range(df.shape[1])}
+
+    colonnes_texte = [
+        position for position in range(df.shape[1])
+        if pd.api.types.is_string_dtype(df.iloc[:, position].dtype)
+    ]
+
+    # Une valeur présente dans plusieurs colonnes prend le niveau le plus complet
+    tiers_valeurs: Dict[str, str] = {}
+    for position in colonnes_texte:
+        for valeur in df.iloc[:, position].unique():
+            if not _a_anonymiser(valeur):
+                continue
+            tier = tier_effectif(valeur, profil_colonnes[position]) if PREFILTER_ENABLED else TIER_NER
+            tier = _tier_demande(tier, entites)
+            tiers_valeurs[valeur] = plus_cher(tiers_valeurs.get(valeur, TIER_NOOP), tier)
+
+    comptes_bloc = {tier: 0 for tier in TIERS}
+    comptes_bloc[TIER_NOOP] = len(df) * (df.shape[1] - len(colonnes_texte))
+    for position in colonnes_texte:
+        for valeur, nombre in df.iloc[:, position].value_counts(dropna=False).items():
+            comptes_bloc[tiers_valeurs.get(valeur, TIER_NOOP)] += int(nombre)
+    for tier, nombre in comptes_bloc.items():
+        stats_tiers.incr(tier, nombre)
+        if comptes is not None:
+            comptes[tier] = comptes.get(tier, 0) + nombre
+
+    correspondance = {
+        valeur: _anonymiser_motifs(valeur, profil, entites)
+        for valeur, tier in tiers_valeurs.items() if tier == TIER_PATTERN
+    }
+    valeurs_ner = [valeur for valeur, tier in tiers_valeurs.items() if tier == TIER_NER]
+    if valeurs_ner:
+        correspondance.update(zip(valeurs_ner, anonymiser_textes(valeurs_ner, batch_size, n_process, profil, entites)))
+
+    df_cleaned = df.copy()
+    if not correspondance:
+        return df_cleaned
+
+    for position in colonnes_texte:
+        serie = df_cleaned.iloc[:, position]
+        df_cleaned.iloc[:, position] = serie.map(lambda v: correspondance.get(v, v) if isinstance(v, str) else v)
+
+    return df_cleaned
+
+def generer_csv_anonymise(
+    lecteur,
+    batch_size: Optional[int] = None,
+    n_process: Optional[int] = None,
+    profil: Optional[str] = None,
+    entites: Optional[List[str]] = None
+) -> Iterator[str]:
+    """
+    Anonymise chaque bloc du lecteur et le renvoie en CSV dès qu'il est prêt.
+    L'en-tête n'est écrit qu'avec le premier bloc.
+    """
+    with lecteur:
+        index = 0
+        while True:
+            bloc = lire_bloc(lecteur)
+            if bloc is None:
+                return
+            df_cleaned = anonymiser_dataframe(bloc, batch_size, n_process, profil=profil, entites=entites)
+            yield df_cleaned.to_csv(index=False, header=(index == 0))
+            index += 1
@@ -0,0 +1,184 @@
+import hashlib
+import json
+import sqlite3
+import sys
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+def cle_contenu(*parties: str) -> str:
+    """Construit une clé de cache (SHA-256) à partir du contenu et de sa configuration"""
+    empreinte = hashlib.sha256()
+    for partie in parties:
+        empreinte.update(partie.encode("utf-8", "surrogatepass"))
+        empreinte.update(b"\x00")
+    return empreinte.hexdigest()
+
+
+def normaliser_texte(text: str) -> str:
+    """
+    Forme canonique d'un texte pour une clé de cache : Unicode NFC et espaces
+    fusionnés (les modèles découpent de toute façon sur les espaces).
+    """
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class LRUCache:
+    """
+    Cache LRU borné en nombre d'entrées et en mémoire (estimation via sys.getsizeof),
+    avec expiration optionnelle des entrées (ttl_seconds).
+    Thread-safe : les endpoints synchrones tournent dans le threadpool de FastAPI.
+    """
+
+    def __init__(
+        self,
+        max_items: int = 10000,
+        max_bytes: int = 64 * 1024 * 1024,
+        ttl_seconds: Optional[float] = None
+    ):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[str, Any]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._expires: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0
+        }
+
+    def _remove(self, key: str):
+        del self._data[key]
+        self._expires.pop(key, None)
+        self.current_bytes -= self._sizes.pop(key)
+
+    def get(self, key: str) -> Optional[Any]:
+        """Retourne la valeur en cache (et la marque comme récente), sinon None"""
+        with self._lock:
+            if key not in self._data:
+                self.stats["misses"] += 1
+                return None
+            if key in self._expires and self._expires[key] <= time.monotonic():
+                self._remove(key)
+                self.stats["expirations"] += 1
+                self.stats["misses"] += 1
+                return None
+            self._data.move_to_end(key)
+            self.stats["hits"] += 1
+            return self._data[key]
+
+    def set(self, key: str, value: Any):
+        """Ajoute une valeur puis évince les plus anciennes si une limite est dépassée"""
+        size = sys.getsizeof(key) + sys.getsizeof(value)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._data:
+                self.current_bytes -= self._sizes[key]
+            self._data[key] = value
+            self._data.move_to_end(key)
+            self._sizes[key] = size
+            self.current_bytes += size
+            if self.ttl_seconds is not None:
+                self._expires[key] = time.monotonic() + self.ttl_seconds
+
+            while len(self._data) > self.max_items or self.current_bytes > self.max_bytes:
+                self._remove(next(iter(self._data)))
+                self.stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._sizes.clear()
+            self._expires.clear()
+            self.current_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Statistiques du cache"""
+        total = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_rate": round((self.stats["hits"] / max(total, 1)) * 100, 2),
+            "entries": len(self._data),
+            "max_items": self.max_items,
+            "memory_bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds
+        }
+
+
+class SQLiteCache:
+    """
+    Cache persistant clé -> valeur JSON dans un fichier SQLite, avec TTL.
+    Sert de second niveau derrière un LRUCache pour survivre aux redémarrages.
+    """
+
+    # Purge des entrées expirées toutes les N écritures
+    PURGE_EVERY = 1000
+
+    def __init__(self, path: str, ttl_seconds: Optional[float] = None):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+        )
+        self._conn.commit()
+        self.stats = {
+            "hits": 0,
+            "misses": 0
+        }
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM cache WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (key, time.time())
+            ).fetchone()
+        if row is None:
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any):
+        expires_at = time.time() + self.ttl_seconds if self.ttl_seconds is not None else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), expires_at)
+            )
+            self._writes += 1
+            if self._writes % self.PURGE_EVERY == 0:
+                self._conn.execute("DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),))
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        total = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_rate": round((self.stats["hits"] / max(total, 1)) * 100, 2),
+            "entries": entries,
+            "path": self.path,
+            "ttl_seconds": self.ttl_seconds
+        }
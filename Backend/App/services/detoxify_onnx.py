@@ -0,0 +1,190 @@
+import inspect
+import json
+import os
+import time
+from typing import Dict, List, Union
+
+import numpy as np
+
+from services.logging_service import get_logger
+from services.metrics import STAGE_MODEL_FORWARD, mesurer
+
+logger = get_logger("detoxify")
+
+# Dossier des artefacts exportés (modèle ONNX, tokenizer, noms des classes)
+DETOXIFY_ONNX_DIR = os.getenv("DETOXIFY_ONNX_DIR", "models/detoxify-onnx")
+# Quantification dynamique int8 des poids (plus rapide et plus léger sur CPU)
+DETOXIFY_ONNX_QUANTIZE = os.getenv("DETOXIFY_ONNX_QUANTIZE", "true").lower() in ("1", "true", "yes")
+# Threads intra-op d'onnxruntime (0 = nombre de cœurs)
+DETOXIFY_ONNX_THREADS = int(os.getenv("DETOXIFY_ONNX_THREADS", "0"))
+# Écart max toléré entre les scores ONNX et PyTorch lors de la vérification
+DETOXIFY_ONNX_TOLERANCE = float(os.getenv("DETOXIFY_ONNX_TOLERANCE", "0.05"))
+
+# Textes de contrôle pour la vérification de parité après l'export
+TEXTES_PARITE = [
+    "Merci pour votre aide, bonne journée !",
+    "You are a wonderful person.",
+    "Shut up, you stupid idiot.",
+    "I will find you and hurt you.",
+    "Ce produit est nul, je suis déçu.",
+    "",
+]
+
+
+class EcartParite(Exception):
+    """Levée quand les scores ONNX s'écartent de PyTorch au-delà de la tolérance"""
+
+    def __init__(self, parite: Dict):
+        self.parite = parite
+        super().__init__(
+            f"Écart ONNX/PyTorch {parite['max_abs_diff']} au-delà de la tolérance {parite['tolerance']}"
+        )
+
+
+def _chemin_modele(dossier: str, quantize: bool) -> str:
+    return os.path.join(dossier, "model.int8.onnx" if quantize else "model.onnx")
+
+
+def exporter_onnx(variant: str = "original", dossier: str = DETOXIFY_ONNX_DIR) -> Dict:
+    """
+    Export unique du transformer Detoxify en ONNX (+ version int8 quantifiée),
+    avec le tokenizer et les noms des classes. Nécessite torch et onnx.
+    """
+    import torch
+    from detoxify import Detoxify
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    os.makedirs(dossier, exist_ok=True)
+    detox = Detoxify(variant, device="cpu")
+    detox.model.eval()
+
+    exemple = detox.tokenizer(["texte d'exemple", "un autre texte"], return_tensors="pt", padding=True)
+    # Entrées dans l'ordre de forward() pour que les noms correspondent aux tenseurs
+    noms_entrees = [p for p in inspect.signature(detox.model.forward).parameters if p in exemple]
+    axes = {nom: {0: "batch", 1: "sequence"} for nom in noms_entrees}
+    axes["logits"] = {0: "batch"}
+
+    debut = time.perf_counter()
+    with torch.no_grad():
+        torch.onnx.export(
+            detox.model,
+            tuple(exemple[nom] for nom in noms_entrees),
+            _chemin_modele(dossier, quantize=False),
+            input_names=noms_entrees,
+            output_names=["logits"],
+            dynamic_axes=axes,
+            opset_version=14
+        )
+    quantize_dynamic(
+        _chemin_modele(dossier, quantize=False),
+        _chemin_modele(dossier, quantize=True),
+        weight_type=QuantType.QInt8
+    )
+
+    detox.tokenizer.save_pretrained(dossier)
+    meta = {"variant": variant, "class_names": list(detox.class_names)}
+    with open(os.path.join(dossier, "detoxify.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+    logger.info(f"✅ Detoxify '{variant}' exporté en ONNX dans {dossier} ({time.perf_counter() - debut:.1f}s)")
+    return {"detoxify": detox, **meta}
+
+
+class OnnxDetoxify:
+    """
+    Équivalent de `Detoxify.predict` exécuté par onnxruntime : même entrée
+    (texte ou liste de textes), même format de sortie, sans charger torch.
+    """
+
+    def __init__(self, dossier: str = DETOXIFY_ONNX_DIR, quantize: bool = DETOXIFY_ONNX_QUANTIZE,
+                 threads: int = DETOXIFY_ONNX_THREADS):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        with open(os.path.join(dossier, "detoxify.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        self.variant = meta["variant"]
+        self.class_names = meta["class_names"]
+        self.quantize = quantize
+        self.tokenizer = AutoTokenizer.from_pretrained(dossier)
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads or os.cpu_count() or 1
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            _chemin_modele(dossier, quantize),
+            sess_options=options,
+            providers=["CPUExecutionProvider"]
+        )
+        self._entrees = [e.name for e in self.session.get_inputs()]
+
+    def predict(self, text: Union[str, List[str]]) -> Dict:
+        textes = [text] if isinstance(text, str) else list(text)
+        inputs = self.tokenizer(textes, return_tensors="np", truncation=True, padding=True)
+        with mesurer(STAGE_MODEL_FORWARD):
+            logits = self.session.run(None, {nom: inputs[nom].astype(np.int64) for nom in self._entrees})[0]
+        scores = 1 / (1 + np.exp(-logits))
+
+        if isinstance(text, str):
+            return {cla: float(scores[0][i]) for i, cla in enumerate(self.class_names)}
+        return {cla: scores[:, i].tolist() for i, cla in enumerate(self.class_names)}
+
+
+def verifier_parite(onnx_model, torch_model, textes: List[str] = None,
+                    tolerance: float = DETOXIFY_ONNX_TOLERANCE) -> Dict:
+    """Compare les scores ONNX et PyTorch ; `ok` est faux si un écart dépasse la tolérance"""
+    textes = textes or TEXTES_PARITE
+    attendus = torch_model.predict(textes)
+    obtenus = onnx_model.predict(textes)
+    ecarts = {
+        cla: max(abs(float(a) - float(o)) for a, o in zip(attendus[cla], obtenus[cla]))
+        for cla in attendus
+    }
+    ecart_max = max(ecarts.values())
+    return {
+        "ok": ecart_max <= tolerance,
+        "max_abs_diff": round(ecart_max, 6),
+        "tolerance": tolerance,
+        "per_category": {cla: round(e, 6) for cla, e in ecarts.items()}
+    }
+
+
+def charger_onnx(variant: str = "original", dossier: str = DETOXIFY_ONNX_DIR) -> OnnxDetoxify:
+    """
+    Charge le moteur ONNX ; au premier démarrage, exporte le modèle puis
+    vérifie la parité avec PyTorch. Le résultat est conservé dans parity.json :
+    un export hors tolérance lève EcartParite à chaque démarrage (jusqu'à ce
+    que le dossier soit supprimé pour refaire l'export). Sans parity.json
+    (processus arrêté avant son écriture, fichier supprimé), la parité est
+    vérifiée de nouveau : un export jamais contrôlé n'est pas servi.
+    """
+    chemin_parite = os.path.join(dossier, "parity.json")
+    reference = None
+    if not os.path.exists(os.path.join(dossier, "detoxify.json")):
+        reference = exporter_onnx(variant, dossier)["detoxify"]
+    modele = OnnxDetoxify(dossier)
+    if modele.variant != variant:
+        raise ValueError(f"Export ONNX de '{modele.variant}' trouvé dans {dossier}, '{variant}' attendu")
+
+    # Export tout neuf : un parity.json resté d'un export précédent ne le concerne pas
+    if reference is None and os.path.exists(chemin_parite):
+        with open(chemin_parite, encoding="utf-8") as f:
+            parite = json.load(f)
+    else:
+        if reference is None:
+            from detoxify import Detoxify
+            logger.warning(f"⚠️ Parité ONNX/PyTorch inconnue pour {dossier}, nouvelle vérification")
+            reference = Detoxify(variant)
+        parite = verifier_parite(modele, reference)
+        # Écriture atomique : un fichier tronqué ne doit pas passer pour un résultat
+        with open(chemin_parite + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(parite, f)
+        os.replace(chemin_parite + ".tmp", chemin_parite)
+        if parite["ok"]:
+            logger.info(f"✅ Parité ONNX/PyTorch vérifiée (écart max {parite['max_abs_diff']})")
+
+    if not parite.get("ok"):
+        raise EcartParite(parite)
+    return modele
@@ -1,19 +1,227 @@
-from detoxify import Detoxify
-from typing import List, Dict
+import os
+import re
+from typing import Any, List, Dict, Optional, Tuple
+
+from services.cache_service import LRUCache, SQLiteCache, cle_contenu, normaliser_texte
+from services.logging_service import get_logger
+from services.metrics import STAGE_MODEL_FORWARD, STAGE_TOKENIZATION, Compteurs, chronometrer
+
+# Nombre de textes envoyés au modèle en une seule passe (padding commun)
+DETOXIFY_BATCH_SIZE = int(os.getenv("DETOXIFY_BATCH_SIZE", "32"))
+
+# Cache des scores (indépendant du seuil, appliqué après la lecture)
+DETOXIFY_MODEL = "original"
+# Moteur d'inférence : "torch" (Detoxify d'origine) ou "onnx" (onnxruntime, int8 par défaut)
+DETOXIFY_ENGINE = os.getenv("DETOXIFY_ENGINE", "torch").lower()
+DETOXIFY_CACHE_MAX_ITEMS = int(os.getenv("DETOXIFY_CACHE_MAX_ITEMS", "50000"))
+DETOXIFY_CACHE_MAX_MB = int(os.getenv("DETOXIFY_CACHE_MAX_MB", "64"))
+DETOXIFY_CACHE_TTL = float(os.getenv("DETOXIFY_CACHE_TTL", "86400"))
+# Chemin d'un fichier SQLite pour conserver les scores entre deux redémarrages (vide = désactivé)
+DETOXIFY_CACHE_DB = os.getenv("DETOXIFY_CACHE_DB", "")
+
+# Mode texte long : fenêtres de tokens qui se chevauchent, scorées en un seul passage par lots
+DETOXIFY_WINDOW_TOKENS = int(os.getenv("DETOXIFY_WINDOW_TOKENS", "256"))
+DETOXIFY_WINDOW_OVERLAP = int(os.getenv("DETOXIFY_WINDOW_OVERLAP", "64"))
+# Au-delà, le texte est refusé (TexteTropLong) plutôt que scoré en partie
+DETOXIFY_MAX_WINDOWS = int(os.getenv("DETOXIFY_MAX_WINDOWS", "64"))
+
+AGGREGATIONS = ("max", "mean")
+
+logger = get_logger("detoxify")
+
+_MOT = re.compile(r"\S+")
+
+
+def decouper_fenetres(
+    text: str,
+    nb_tokens: Dict[str, int],
+    taille: int,
+    chevauchement: int
+) -> List[Tuple[int, int]]:
+    """
+    Découpe un texte en fenêtres de mots (positions de caractères début/fin)
+    d'au plus `taille` tokens, deux fenêtres voisines partageant jusqu'à
+    `chevauchement` tokens. `nb_tokens` donne le nombre de tokens de chaque mot.
+    """
+    mots = [(m.start(), m.end(), nb_tokens[m.group()]) for m in _MOT.finditer(text)]
+    if not mots:
+        return [(0, len(text))]
+
+    fenetres = []
+    debut = 0
+    while True:
+        fin, total = debut, 0
+        # Un mot plus long qu'une fenêtre forme sa propre fenêtre
+        while fin < len(mots) and (fin == debut or total + mots[fin][2] <= taille):
+            total += mots[fin][2]
+            fin += 1
+        fenetres.append((mots[debut][0], mots[fin - 1][1]))
+        if fin >= len(mots):
+            return fenetres
+
+        # La fenêtre suivante reprend les derniers mots (sans jamais reculer au début)
+        suivant, recul = fin, 0
+        while suivant - 1 > debut and recul + mots[suivant - 1][2] <= chevauchement:
+            suivant -= 1
+            recul += mots[suivant][2]
+        debut = suivant
+
+
+class TexteTropLong(Exception):
+    """Levée quand un texte dépasse DETOXIFY_MAX_WINDOWS fenêtres en mode texte long"""
+
+    def __init__(self, windows: int, max_windows: int):
+        self.windows = windows
+        self.max_windows = max_windows
+        super().__init__(f"Texte trop long : {windows} fenêtres, {max_windows} au maximum")
 
 
 class DetoxifyService:
     def __init__(self):
-        self.model = Detoxify('original')
-        self.stats = {
-            "total_requests": 0,
-            "toxic_detected": 0,
-            "safe_texts": 0
-        }
+        if DETOXIFY_ENGINE == "onnx":
+            from services.detoxify_onnx import EcartParite, charger_onnx
+            try:
+                self.model = charger_onnx(DETOXIFY_MODEL)
+                self.engine = "onnx-int8" if self.model.quantize else "onnx"
+            except EcartParite as e:
+                # Des scores faux seraient pires qu'une inférence plus lente
+                logger.warning(f"⚠️ {e} : repli sur PyTorch", extra={"parity": e.parite})
+                self._charger_torch()
+        elif DETOXIFY_ENGINE == "torch":
+            self._charger_torch()
+        else:
+            raise ValueError(f"Moteur Detoxify inconnu '{DETOXIFY_ENGINE}' (torch ou onnx)")
+        # Tokenizer mesuré pour les deux moteurs (le passage ONNX est mesuré dans OnnxDetoxify)
+        self.model.tokenizer = chronometrer(self.model.tokenizer, STAGE_TOKENIZATION)
+        self.stats = Compteurs("detoxify", ["total_requests", "toxic_detected", "safe_texts"])
+        self.cache = LRUCache(
+            max_items=DETOXIFY_CACHE_MAX_ITEMS,
+            max_bytes=DETOXIFY_CACHE_MAX_MB * 1024 * 1024,
+            ttl_seconds=DETOXIFY_CACHE_TTL
+        )
+        self.disk_cache = SQLiteCache(DETOXIFY_CACHE_DB, ttl_seconds=DETOXIFY_CACHE_TTL) if DETOXIFY_CACHE_DB else None
+
+    def _charger_torch(self):
+        # Import tardif : detoxify importe torch, ce qui ralentirait le démarrage de l'API
+        from detoxify import Detoxify
+        self.model = Detoxify(DETOXIFY_MODEL)
+        self.model.model = chronometrer(self.model.model, STAGE_MODEL_FORWARD)
+        self.engine = "torch"
+
+    def _cache_key(self, text: str) -> str:
+        # Le moteur fait partie de la clé : les scores int8 diffèrent légèrement
+        return cle_contenu(normaliser_texte(text), DETOXIFY_MODEL, self.engine)
+
+    def _cache_get(self, key: str) -> Optional[Dict[str, float]]:
+        """Cherche les scores en mémoire puis sur disque (remontés en mémoire)"""
+        scores = self.cache.get(key)
+        if scores is None and self.disk_cache is not None:
+            scores = self.disk_cache.get(key)
+            if scores is not None:
+                self.cache.set(key, scores)
+        return scores
+
+    def _cache_set(self, key: str, scores: Dict[str, float]):
+        self.cache.set(key, scores)
+        if self.disk_cache is not None:
+            self.disk_cache.set(key, scores)
 
     def predict_toxicity(self, text: str) -> Dict[str, float]:
-        """Prédit les scores de toxicité pour un texte"""
-        return self.model.predict(text)
+        """Prédit les scores de toxicité pour un texte (réutilise les scores en cache)"""
+        key = self._cache_key(text)
+        scores = self._cache_get(key)
+        if scores is None:
+            scores = {k: float(v) for k, v in self.model.predict(text).items()}
+            self._cache_set(key, scores)
+        return scores
+
+    def predict_batch(self, texts: List[str], batch_size: Optional[int] = None) -> List[Dict[str, float]]:
+        """
+        Prédit les scores de plusieurs textes par mini-lots (une passe du modèle par lot).
+        Seuls les textes absents du cache (et dédoublonnés) passent par le modèle ;
+        ils sont triés par longueur pour limiter le padding, puis les résultats
+        sont remis dans l'ordre d'origine.
+        """
+        batch_size = batch_size or DETOXIFY_BATCH_SIZE
+        keys = [self._cache_key(text) for text in texts]
+        connus: Dict[str, Dict[str, float]] = {}
+        a_predire: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key in connus or key in a_predire:
+                continue
+            scores = self._cache_get(key)
+            if scores is None:
+                a_predire[key] = text
+            else:
+                connus[key] = scores
+
+        manquants = sorted(a_predire, key=lambda k: len(a_predire[k]))
+        for debut in range(0, len(manquants), batch_size):
+            lot = manquants[debut:debut + batch_size]
+            scores = self.model.predict([a_predire[k] for k in lot])
+            for position, key in enumerate(lot):
+                connus[key] = {k: float(v[position]) for k, v in scores.items()}
+                self._cache_set(key, connus[key])
+
+        return [connus[key] for key in keys]
+
+    def _compter_tokens(self, texts: List[str]) -> Dict[str, int]:
+        """Nombre de tokens (sans tokens spéciaux) de chaque mot distinct des textes"""
+        mots = list({mot for text in texts for mot in _MOT.findall(text)})
+        if not mots:
+            return {}
+        ids = self.model.tokenizer(mots, add_special_tokens=False)["input_ids"]
+        return {mot: len(i) for mot, i in zip(mots, ids)}
+
+    def predict_long_batch(self, texts: List[str], aggregation: str = "max") -> List[Dict[str, Any]]:
+        """
+        Score des textes longs sans troncature : chaque texte est découpé en
+        fenêtres de tokens qui se chevauchent, toutes les fenêtres de tous les
+        textes passent ensemble dans predict_batch (par mini-lots), puis les scores
+        sont agrégés par catégorie (max ou moyenne) et la fenêtre la plus toxique
+        est indiquée. Un texte de plus de DETOXIFY_MAX_WINDOWS fenêtres lève
+        TexteTropLong avant tout calcul : jamais de verdict sur une partie du texte.
+        """
+        if aggregation not in AGGREGATIONS:
+            raise ValueError(f"Agrégation inconnue '{aggregation}' ({', '.join(AGGREGATIONS)})")
+
+        # Fenêtre bornée par la longueur max du modèle (2 tokens pour [CLS]/[SEP])
+        taille = max(1, min(DETOXIFY_WINDOW_TOKENS, self.model.tokenizer.model_max_length - 2))
+        chevauchement = min(DETOXIFY_WINDOW_OVERLAP, taille // 2)
+        nb_tokens = self._compter_tokens(texts)
+
+        decoupages = [decouper_fenetres(text, nb_tokens, taille, chevauchement) for text in texts]
+        plus_long = max((len(fenetres) for fenetres in decoupages), default=0)
+        if plus_long > DETOXIFY_MAX_WINDOWS:
+            raise TexteTropLong(plus_long, DETOXIFY_MAX_WINDOWS)
+
+        extraits = [text[debut:fin] for text, fenetres in zip(texts, decoupages) for debut, fin in fenetres]
+        tous_scores = iter(self.predict_batch(extraits))
+
+        results = []
+        for text, fenetres in zip(texts, decoupages):
+            scores_fenetres = [next(tous_scores) for _ in fenetres]
+            if aggregation == "max":
+                scores = {k: max(s[k] for s in scores_fenetres) for k in scores_fenetres[0]}
+            else:
+                scores = {k: sum(s[k] for s in scores_fenetres) / len(scores_fenetres) for k in scores_fenetres[0]}
+
+            pire = max(range(len(fenetres)), key=lambda i: max(scores_fenetres[i].values()))
+            category, score = self.get_max_category(scores_fenetres[pire])
+            debut, fin = fenetres[pire]
+            results.append({
+                "scores": scores,
+                "windows": len(fenetres),
+                "aggregation": aggregation,
+                "top_span": {
+                    "start": debut,
+                    "end": fin,
+                    "text": text[debut:fin],
+                    "category": category,
+                    "score": score
+                }
+            })
+        return results
 
     def is_toxic(self, scores: Dict[str, float], threshold: float = 0.5) -> bool:
         """Détermine si un texte est toxique basé sur le seuil"""
@@ -28,11 +236,11 @@ class DetoxifyService:
 
     def increment_stats(self, is_toxic: bool):
         """Incrémente les statistiques"""
-        self.stats["total_requests"] += 1
+        self.stats.incr("total_requests")
         if is_toxic:
-            self.stats["toxic_detected"] += 1
+            self.stats.incr("toxic_detected")
         else:
-            self.stats["safe_texts"] += 1
+            self.stats.incr("safe_texts")
 
     def get_stats(self) -> Dict:
         """Retourne les statistiques"""
@@ -40,7 +248,13 @@ class DetoxifyService:
         if self.stats["total_requests"] > 0:
             toxicity_rate = (self.stats["toxic_detected"] / self.stats["total_requests"]) * 100
 
+        cache = {"memory": self.cache.get_stats()}
+        if self.disk_cache is not None:
+            cache["disk"] = self.disk_cache.get_stats()
+
         return {
             **self.stats,
-            "toxicity_rate": round(toxicity_rate, 2)
+            "toxicity_rate": round(toxicity_rate, 2),
+            "engine": self.engine,
+            "cache": cache
         }
\ No newline at end of file
@@ -0,0 +1,102 @@
+import asyncio
+import contextvars
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from services.metrics import Compteurs
+
+
+class ExecutorBusy(Exception):
+    """Levée quand un exécuteur a atteint sa capacité (travaux en cours + en attente)"""
+
+    def __init__(self, name: str, retry_after: int):
+        self.name = name
+        self.retry_after = retry_after
+        super().__init__(f"Service '{name}' saturé, réessayez dans {retry_after}s")
+
+
+class BoundedExecutor:
+    """
+    Pool de threads dédié à un type d'inférence, avec une capacité bornée :
+    au-delà de `max_workers` travaux en cours et `max_queue` en attente, les
+    nouveaux appels sont refusés immédiatement (ExecutorBusy) au lieu de
+    s'accumuler et de faire exploser la latence.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: int, retry_after: int = 2):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-")
+        # Compteur manipulé uniquement depuis la boucle asyncio : pas besoin de verrou
+        self._in_flight = 0
+        self.stats = Compteurs(f"executor:{name}", ["completed", "rejected", "max_in_flight"])
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.max_queue
+
+    def check_capacity(self):
+        """Lève ExecutorBusy si un nouveau travail serait refusé"""
+        if self._in_flight >= self.capacity:
+            self.stats.incr("rejected")
+            raise ExecutorBusy(self.name, self.retry_after)
+
+    async def run(self, fn: Callable, *args, reject: bool = True, **kwargs) -> Any:
+        """
+        Exécute `fn` dans le pool sans bloquer la boucle asyncio.
+        Avec reject=False, l'appel attend son tour même si le pool est plein
+        (utile pour la suite d'un flux déjà accepté).
+        """
+        if reject:
+            self.check_capacity()
+
+        loop = asyncio.get_running_loop()
+        # Le contexte est copié : sans ça, les logs du thread perdent l'ID de requête
+        contexte = contextvars.copy_context()
+        future = self._executor.submit(functools.partial(contexte.run, fn, *args, **kwargs))
+        self._in_flight += 1
+        self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self._in_flight)
+        # Décompté quand le travail se termine vraiment, pas quand l'appelant
+        # abandonne (client déconnecté) : le thread, lui, continue de tourner
+        future.add_done_callback(lambda _: self._signaler_fin(loop))
+        return await asyncio.wrap_future(future)
+
+    def _signaler_fin(self, loop: asyncio.AbstractEventLoop):
+        """Appelé depuis le thread du travail : le compteur n'est modifié que dans la boucle"""
+        try:
+            loop.call_soon_threadsafe(self._terminer)
+        except RuntimeError:
+            # Boucle déjà fermée (arrêt de l'application)
+            pass
+
+    def _terminer(self):
+        self._in_flight -= 1
+        self.stats.incr("completed")
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "in_flight": self._in_flight,
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue
+        }
+
+
+# Exécuteurs partagés (un par moteur d'inférence)
+anonymization_executor = BoundedExecutor(
+    "anonymization",
+    max_workers=int(os.getenv("ANONYMIZATION_EXECUTOR_THREADS", "2")),
+    max_queue=int(os.getenv("ANONYMIZATION_EXECUTOR_QUEUE", "16"))
+)
+detoxify_executor = BoundedExecutor(
+    "detoxify",
+    max_workers=int(os.getenv("DETOXIFY_EXECUTOR_THREADS", "1")),
+    max_queue=int(os.getenv("DETOXIFY_EXECUTOR_QUEUE", "16"))
+)
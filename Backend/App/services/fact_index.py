@@ -0,0 +1,302 @@
+"""
+Index local de faits de référence (BM25 via SQLite FTS5), consulté avant
+l'appel au LLM pour confirmer les affirmations connues ou fournir du contexte.
+
+Corpus : fichier JSONL, un document par ligne
+    {"id": "fleming-1928", "title": "Pénicilline", "text": "...", "source": "https://..."}
+
+CLI (depuis Backend/App) :
+    python -m services.fact_index build corpus.jsonl     # reconstruit l'index
+    python -m services.fact_index add nouveaux.jsonl     # ajoute / met à jour par id
+    python -m services.fact_index remove fleming-1928
+    python -m services.fact_index search "Fleming a découvert la pénicilline"
+"""
+import argparse
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Any, Dict, Iterable, List, Optional
+
+# Fichier de l'index (vide = recherche locale désactivée)
+FACT_INDEX_PATH = os.getenv("FACT_INDEX_PATH", "")
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "3"))
+# Part des mots de l'affirmation présents dans un passage pour répondre sans LLM
+RETRIEVAL_LOCAL_THRESHOLD = float(os.getenv("RETRIEVAL_LOCAL_THRESHOLD", "0.9"))
+# Part minimale pour transmettre un passage au LLM comme contexte
+RETRIEVAL_CONTEXT_THRESHOLD = float(os.getenv("RETRIEVAL_CONTEXT_THRESHOLD", "0.3"))
+# Délai max (secondes) avant qu'une modification du corpus par la CLI invalide les verdicts en cache
+FACT_INDEX_REFRESH_SECONDS = float(os.getenv("FACT_INDEX_REFRESH_SECONDS", "1"))
+
+_MOT = re.compile(r"\w+")
+MOTS_VIDES = set("""
+a à au aux avec ce ces dans de des du elle en est et il ils la le les leur lui ma mais me même mes moi
+mon nos notre nous on ou par pour qu que qui sa se ses son sont sur ta te tes toi ton tu un une
+vos votre vous été être a été the of and to in is was were are be by for on at as with an it its that this from
+""".split())
+# Gardés dans les termes (jamais des mots vides) : une négation inverse le sens de l'affirmation
+NEGATIONS = set("""
+ne n pas plus jamais rien aucun aucune ni nul nulle non personne guere
+not no never none nor neither t
+""".split())
+
+
+def termes(text: str) -> List[str]:
+    """Mots significatifs, en minuscules et sans accents"""
+    sans_accents = "".join(
+        c for c in unicodedata.normalize("NFKD", text.lower()) if not unicodedata.combining(c)
+    )
+    return [
+        m for m in _MOT.findall(sans_accents)
+        if m not in MOTS_VIDES and (len(m) > 1 or m.isdigit() or m in NEGATIONS)
+    ]
+
+
+def couverture(claim: str, passage: str) -> float:
+    """Part des termes de l'affirmation présents dans le passage"""
+    claim_termes = set(termes(claim))
+    if not claim_termes:
+        return 0.0
+    return len(claim_termes & set(termes(passage))) / len(claim_termes)
+
+
+def nombres_concordants(claim: str, passage: str) -> bool:
+    """
+    Vrai si chaque nombre de l'affirmation (date, quantité) figure dans le passage.
+    Un nombre différent est le cas typique d'une affirmation qui contredit la référence.
+    """
+    passage_termes = set(termes(passage))
+    return all(t in passage_termes for t in termes(claim) if t.isdigit())
+
+
+def contient_negation(text: str) -> bool:
+    return any(t in NEGATIONS for t in termes(text))
+
+
+def ordre_concordant(claim: str, passage: str) -> bool:
+    """
+    Vrai si les termes de l'affirmation apparaissent dans le passage d'un seul
+    tenant et dans le même ordre : « A a précédé B » n'est pas confirmé par
+    « B a précédé A », ni « X se trouve à Y » par « X ne se trouve pas à Y ».
+    """
+    sequence = termes(claim)
+    if not sequence:
+        return False
+    passage_termes = termes(passage)
+    n = len(sequence)
+    return any(passage_termes[i:i + n] == sequence for i in range(len(passage_termes) - n + 1))
+
+
+class FactIndex:
+    """Index BM25 persistant (table virtuelle FTS5), mis à jour document par document"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS facts USING fts5("
+            "doc_id UNINDEXED, title, text, source UNINDEXED, "
+            "tokenize='unicode61 remove_diacritics 2')"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._conn.commit()
+        # Gardée en mémoire : la clé de cache des verdicts la lit sans requête SQLite
+        self._revision = self._lire_revision()
+        # PRAGMA data_version change quand une autre connexion (CLI) a modifié la base
+        self._data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        self._revision_lue_a = time.monotonic()
+        self.stats = {
+            "queries": 0,
+            "answered_locally": 0,
+            "forwarded_with_context": 0,
+            "no_match": 0
+        }
+
+    @property
+    def revision(self) -> int:
+        """Incrémentée à chaque modification du corpus (invalide les verdicts en cache)"""
+        return self._revision
+
+    def revision_perimee(self) -> bool:
+        """Vrai si la révision n'a pas été relue depuis FACT_INDEX_REFRESH_SECONDS"""
+        return time.monotonic() - self._revision_lue_a >= FACT_INDEX_REFRESH_SECONDS
+
+    def rafraichir_revision(self) -> int:
+        """
+        Relit la révision si un autre processus a modifié la base.
+        Bloquant (SQLite) : à appeler hors de la boucle asyncio.
+        """
+        with self._lock:
+            data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if data_version != self._data_version:
+                self._data_version = data_version
+                self._revision = self._lire_revision()
+            self._revision_lue_a = time.monotonic()
+        return self._revision
+
+    def _lire_revision(self) -> int:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'revision'").fetchone()
+        return int(row[0]) if row else 0
+
+    def _bump_revision(self):
+        self._conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('revision', '1') "
+            "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1"
+        )
+        self._revision = self._lire_revision()
+
+    def add_documents(self, documents: Iterable[Dict[str, Any]]) -> int:
+        """Ajoute ou remplace (même `id`) des documents ; retourne le nombre traité"""
+        count = 0
+        with self._lock:
+            for doc in documents:
+                doc_id = str(doc["id"])
+                self._conn.execute("DELETE FROM facts WHERE doc_id = ?", (doc_id,))
+                self._conn.execute(
+                    "INSERT INTO facts (doc_id, title, text, source) VALUES (?, ?, ?, ?)",
+                    (doc_id, doc.get("title", ""), doc["text"], doc.get("source", ""))
+                )
+                count += 1
+            self._bump_revision()
+            self._conn.commit()
+        return count
+
+    def remove(self, ids: Iterable[str]) -> int:
+        with self._lock:
+            removed = sum(
+                self._conn.execute("DELETE FROM facts WHERE doc_id = ?", (str(i),)).rowcount for i in ids
+            )
+            self._bump_revision()
+            self._conn.commit()
+        return removed
+
+    def rebuild(self, documents: Iterable[Dict[str, Any]]) -> int:
+        with self._lock:
+            self._conn.execute("DELETE FROM facts")
+            self._conn.commit()
+        return self.add_documents(documents)
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM facts").fetchone()[0]
+
+    def search(self, query: str, limit: int = RETRIEVAL_TOP_K) -> List[Dict[str, Any]]:
+        """Passages les plus pertinents (BM25), avec leur couverture de la requête"""
+        mots = termes(query)
+        if not mots:
+            return []
+        # Chaque terme entre guillemets : pas d'interprétation de la syntaxe FTS5
+        expression = " OR ".join(f'"{m}"' for m in dict.fromkeys(mots))
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT doc_id, title, text, source, bm25(facts) FROM facts WHERE facts MATCH ? "
+                "ORDER BY bm25(facts) LIMIT ?",
+                (expression, limit)
+            ).fetchall()
+        return [
+            {
+                "id": doc_id,
+                "title": title,
+                "text": text,
+                "source": source,
+                # bm25() est négatif dans FTS5 : plus petit = plus pertinent
+                "score": round(-score, 4),
+                "coverage": round(couverture(query, f"{title} {text}"), 3),
+                "numbers_match": nombres_concordants(query, text),
+                "order_match": ordre_concordant(query, text)
+            }
+            for doc_id, title, text, source, score in rows
+        ]
+
+    def lookup(self, claim: str) -> Dict[str, Any]:
+        """
+        Recherche pour une affirmation : `local` contient le passage qui la
+        confirme (réponse sans LLM), sinon `context` les passages à fournir au LLM.
+        Une affirmation avec une négation n'est jamais confirmée localement : le
+        sac de mots ne distingue pas « X est Y » de « X n'est pas Y ».
+        Bloquant (SQLite) : à appeler hors de la boucle asyncio.
+        """
+        self.stats["queries"] += 1
+        self.rafraichir_revision()
+        passages = self.search(claim)
+        local = None
+        if not contient_negation(claim):
+            local = next(
+                (
+                    p for p in passages
+                    if p["coverage"] >= RETRIEVAL_LOCAL_THRESHOLD and p["numbers_match"] and p["order_match"]
+                ),
+                None
+            )
+        if local is not None:
+            self.stats["answered_locally"] += 1
+            return {"local": local, "context": []}
+
+        context = [p for p in passages if p["coverage"] >= RETRIEVAL_CONTEXT_THRESHOLD]
+        self.stats["forwarded_with_context" if context else "no_match"] += 1
+        return {"local": None, "context": context}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "documents": self.count(),
+            "revision": self.revision,
+            "path": self.path
+        }
+
+
+def charger_corpus(path: str) -> List[Dict[str, Any]]:
+    """Lit un corpus JSONL (une ligne = un document avec au moins `id` et `text`)"""
+    documents = []
+    with open(path, encoding="utf-8") as f:
+        for numero, ligne in enumerate(f, 1):
+            if not ligne.strip():
+                continue
+            doc = json.loads(ligne)
+            if "id" not in doc or "text" not in doc:
+                raise ValueError(f"{path}:{numero} : champs 'id' et 'text' obligatoires")
+            documents.append(doc)
+    return documents
+
+
+def get_fact_index() -> Optional[FactIndex]:
+    return FactIndex(FACT_INDEX_PATH) if FACT_INDEX_PATH else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index local de faits de référence (BM25)")
+    parser.add_argument("--index", default=FACT_INDEX_PATH or "facts.sqlite3", help="Fichier de l'index")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("build", help="Reconstruit l'index à partir d'un corpus JSONL").add_argument("corpus")
+    sub.add_parser("add", help="Ajoute ou met à jour des documents (par id)").add_argument("corpus")
+    sub.add_parser("remove", help="Supprime des documents").add_argument("ids", nargs="+")
+    sub.add_parser("search", help="Teste une recherche").add_argument("query")
+    args = parser.parse_args()
+
+    index = FactIndex(args.index)
+    debut = time.perf_counter()
+    if args.command == "build":
+        count = index.rebuild(charger_corpus(args.corpus))
+        print(f"✅ Index reconstruit : {count} documents ({time.perf_counter() - debut:.2f}s)")
+    elif args.command == "add":
+        count = index.add_documents(charger_corpus(args.corpus))
+        print(f"✅ {count} documents ajoutés/mis à jour ({index.count()} au total)")
+    elif args.command == "remove":
+        print(f"🗑️ {index.remove(args.ids)} documents supprimés ({index.count()} au total)")
+    else:
+        for passage in index.search(args.query):
+            print(json.dumps(passage, ensure_ascii=False))
+    index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,223 +1,512 @@
+import asyncio
 import re
+import time
 import httpx
 import os
 import json
-from typing import Dict, List, Any
+from typing import AsyncIterator, Callable, Dict, List, Any, Optional, Tuple
 from datetime import datetime
 from dotenv import load_dotenv
 
+from services.cache_service import LRUCache, SQLiteCache, cle_contenu, normaliser_texte
+from services.fact_index import RETRIEVAL_CONTEXT_THRESHOLD, get_fact_index
+from services.http_client import http_client
+from services.llm_backends import GROQ_API_KEY, LLM_BACKENDS, LLMBackend, charger_backends
+from services.logging_service import champs_erreur, get_logger, span
+from services.metrics import STAGE_JSON_PARSE, Compteurs, mesurer
+from services.text_diff import diff_segments
+
 load_dotenv()
 
-# ✅ Clé API Groq (gratuit, 14,400 requêtes/jour)
-GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
+logger = get_logger("hallucination")
+
+# Échéance par défaut d'une vérification, attente du quota et nouvelles tentatives comprises
+LLM_DEADLINE_SECONDS = float(os.getenv("LLM_DEADLINE_SECONDS", "30"))
+
+# Cache des verdicts (les mêmes phrases sont renvoyées en boucle par l'extension)
+HALLUCINATION_CACHE_MAX_ITEMS = int(os.getenv("HALLUCINATION_CACHE_MAX_ITEMS", "10000"))
+HALLUCINATION_CACHE_MAX_MB = int(os.getenv("HALLUCINATION_CACHE_MAX_MB", "32"))
+HALLUCINATION_CACHE_TTL = float(os.getenv("HALLUCINATION_CACHE_TTL", "86400"))
+# Fichier SQLite pour conserver les verdicts entre redémarrages (vide = désactivé)
+HALLUCINATION_CACHE_DB = os.getenv("HALLUCINATION_CACHE_DB", "")
+
+# Prompt structuré pour obtenir un JSON
+SYSTEM_PROMPT = """You are a fact-checking AI. Analyze statements for factual accuracy.
+
+Respond ONLY with a JSON object in this exact format:
+{
+  "is_correct": true or false,
+  "confidence": 0.XX (between 0 and 1),
+  "explanation": "Brief explanation of why it's correct or incorrect",
+  "corrected_version": "If incorrect, provide the correct information. If correct, repeat the original statement."
+}
+
+Do not include any other text, markdown formatting, or code blocks. Only the raw JSON."""
+# Change dès que le prompt système change : les anciens verdicts ne sont plus servis
+SYSTEM_PROMPT_VERSION = cle_contenu(SYSTEM_PROMPT)[:12]
+
+# Variante pour vérifier plusieurs affirmations courtes en un seul appel. Les verdicts
+# obtenus ont le même format et sont mis en cache sous la clé de chaque affirmation.
+PACKED_SYSTEM_PROMPT = """You are a fact-checking AI. Analyze each numbered statement independently for factual accuracy.
+
+Respond ONLY with a JSON object in this exact format:
+{
+  "results": [
+    {
+      "index": <statement number>,
+      "is_correct": true or false,
+      "confidence": 0.XX (between 0 and 1),
+      "explanation": "Brief explanation of why it's correct or incorrect",
+      "corrected_version": "If incorrect, provide the correct information. If correct, repeat the original statement."
+    }
+  ]
+}
+
+Return exactly one result per statement. Do not include any other text, markdown formatting, or code blocks. Only the raw JSON."""
+
+# Endpoint batch : appels Groq simultanés max et regroupement des textes courts
+HALLUCINATION_BATCH_CONCURRENCY = int(os.getenv("HALLUCINATION_BATCH_CONCURRENCY", "8"))
+HALLUCINATION_BATCH_MAX_ITEMS = int(os.getenv("HALLUCINATION_BATCH_MAX_ITEMS", "100"))
+HALLUCINATION_PACK_SIZE = int(os.getenv("HALLUCINATION_PACK_SIZE", "8"))
+HALLUCINATION_PACK_MAX_CHARS = int(os.getenv("HALLUCINATION_PACK_MAX_CHARS", "200"))
+# Découpage en affirmations pour le flux SSE : fin de phrase suivie d'un espace, ou saut de ligne
+_FIN_PHRASE = re.compile(r"(?<=[.!?…])\s+|\n+")
+# En dessous, un fragment ("Oui.", "Etc.") est rattaché à l'affirmation suivante
+CLAIM_MIN_CHARS = 10
+
+
+def decouper_affirmations(text: str) -> List[Tuple[int, int, str]]:
+    """Découpe un texte en affirmations (phrases) avec leurs positions de caractères"""
+    claims = []
+    debut = None
+    position = 0
+    for separateur in list(_FIN_PHRASE.finditer(text)) + [None]:
+        fin = separateur.start() if separateur else len(text)
+        if debut is None:
+            # Ignore les espaces en tête de fragment
+            debut = position + len(text[position:fin]) - len(text[position:fin].lstrip())
+        if fin - debut >= CLAIM_MIN_CHARS:
+            claims.append((debut, fin, text[debut:fin]))
+            debut = None
+        elif separateur is None and fin > debut:
+            # Fragment final trop court : rattaché à la dernière affirmation s'il y en a une
+            if claims:
+                debut = claims.pop()[0]
+            claims.append((debut, fin, text[debut:fin]))
+        position = separateur.end() if separateur else len(text)
+    return claims
+
 
 class HallucinationDetector:
     def __init__(self):
-        if not GROQ_API_KEY:
-            print("GROQ_API_KEY manquante dans .env")
-            print("Obtenez une clé gratuite sur: https://console.groq.com")
-        
-        self.groq_url = "https://api.groq.com/openai/v1/chat/completions"
-        self.headers = {
-            "Authorization": f"Bearer {GROQ_API_KEY}",
-            "Content-Type": "application/json"
-        }
+        if not GROQ_API_KEY and not LLM_BACKENDS:
+            logger.warning("GROQ_API_KEY manquante dans .env (clé gratuite sur https://console.groq.com)")
         
-        # Modèles disponibles (gratuits) - MISE À JOUR 2024
-        self.model = "llama-3.3-70b-versatile"
+        # Groq par défaut, ou les backends de LLM_BACKENDS (routage, couverture, disjoncteurs)
+        self.backends = charger_backends()
+        self.model = self.backends.signature
         
-        self.stats = {
-            "total_analyses": 0,
-            "hallucinations_detected": 0,
-            "corrections_made": 0,
-            "api_successes": 0,
-            "api_failures": 0
-        }
+        self.stats = Compteurs("hallucination", [
+            "total_analyses",
+            "hallucinations_detected",
+            "corrections_made",
+            "api_successes",
+            "api_failures",
+            "cache_hits",
+            "coalesced_requests",
+            "packed_calls"
+        ])
+
+        self.cache = LRUCache(
+            max_items=HALLUCINATION_CACHE_MAX_ITEMS,
+            max_bytes=HALLUCINATION_CACHE_MAX_MB * 1024 * 1024,
+            ttl_seconds=HALLUCINATION_CACHE_TTL
+        )
+        self.disk_cache = (
+            SQLiteCache(HALLUCINATION_CACHE_DB, ttl_seconds=HALLUCINATION_CACHE_TTL)
+            if HALLUCINATION_CACHE_DB else None
+        )
+        # Vérifications en cours, par clé : les appels identiques simultanés attendent la même
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        # Index local de faits de référence (FACT_INDEX_PATH), consulté avant le LLM
+        self.fact_index = get_fact_index()
+        # Appels Groq simultanés max pour /detect-hallucination/batch
+        self._batch_semaphore = asyncio.Semaphore(HALLUCINATION_BATCH_CONCURRENCY)
         
-        print(f"✅ HallucinationDetector initialized")
-        print(f"🚀 Provider: Groq AI (Ultra rapide)")
-        print(f"🤖 Model: {self.model}")
+        logger.info("✅ HallucinationDetector initialized", extra={
+            "backends": [f"{backend.name} ({backend.model})" for backend in self.backends.backends]
+        })
 
-    async def detect_hallucination(self, prompt: str) -> Dict[str, Any]:
+    async def detect_hallucination(self, prompt: str, deadline: Optional[float] = None) -> Dict[str, Any]:
         """Point d'entrée principal"""
-        self.stats["total_analyses"] += 1
+        self.stats.incr("total_analyses")
         
         try:
-            verification_results = await self._verify_with_groq(prompt)
-            
-            is_hallucination = verification_results["is_hallucination"]
-            confidence_score = verification_results["confidence"]
-
-            if is_hallucination:
-                self.stats["hallucinations_detected"] += 1
-                self.stats["corrections_made"] += 1
-            
-            corrected_text = verification_results.get("corrected_text", prompt)
-            correction_segments = self._generate_segments(prompt, corrected_text, verification_results)
-            rag_sources = verification_results.get("sources", [])
-
-            return {
-                "original_prompt": prompt,
-                "ai_analysis": {
-                    "is_hallucination": is_hallucination,
-                    "confidence_score": confidence_score,
-                    "corrected_text": corrected_text,
-                    "correction_segments": correction_segments,
-                    "rag_sources": rag_sources,
-                    "facts_checked": len(verification_results.get("facts", [])),
-                    "timestamp": datetime.now().isoformat()
-                }
-            }
+            verification_results = await self._verify_cached(prompt, deadline)
+            return self._build_analysis(prompt, verification_results)
         
         except Exception as e:
-            print(f"❌ Erreur détection: {str(e)}")
-            raise Exception(f"Erreur d'analyse: {str(e)}")
+            # Jamais le message : il peut citer le texte analysé
+            logger.error("❌ Erreur détection", extra=champs_erreur(e))
+            raise Exception(f"Erreur d'analyse: {str(e)}") from e
 
-    async def _verify_with_groq(self, prompt: str) -> Dict[str, Any]:
-        """Appel à l'API Groq (ultra rapide, <1s)"""
+    def _build_analysis(self, prompt: str, verification_results: Dict[str, Any]) -> Dict[str, Any]:
+        """Réponse `ai_analysis` à partir d'un verdict"""
+        is_hallucination = verification_results["is_hallucination"]
+        confidence_score = verification_results["confidence"]
+
+        if is_hallucination:
+            self.stats.incr("hallucinations_detected")
+            self.stats.incr("corrections_made")
         
+        corrected_text = verification_results.get("corrected_text", prompt)
+        correction_segments = self._generate_segments(prompt, corrected_text, verification_results)
+        rag_sources = verification_results.get("sources", [])
+
+        return {
+            "original_prompt": prompt,
+            "ai_analysis": {
+                "is_hallucination": is_hallucination,
+                "confidence_score": confidence_score,
+                "corrected_text": corrected_text,
+                "correction_segments": correction_segments,
+                "rag_sources": rag_sources,
+                "facts_checked": len(verification_results.get("facts", [])),
+                "answered_locally": verification_results.get("answered_locally", False),
+                "timestamp": datetime.now().isoformat()
+            }
+        }
+
+    async def stream_claims(self, text: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Découpe le texte en affirmations, les vérifie en parallèle (même sémaphore
+        que le batch) et produit un événement par verdict dès qu'il est prêt, puis
+        un résumé. Les vérifications restantes sont annulées si le client se déconnecte.
+        """
+        debut = time.monotonic()
+        deadline = debut + LLM_DEADLINE_SECONDS
+        claims = decouper_affirmations(text)
+        yield {"event": "claims", "data": {
+            "total": len(claims),
+            "claims": [{"index": i, "start": s, "end": e, "text": c} for i, (s, e, c) in enumerate(claims)]
+        }}
+
+        async def verifier(index: int, claim: str) -> Dict[str, Any]:
+            try:
+                async with self._batch_semaphore:
+                    analysis = await self.detect_hallucination(claim, deadline)
+                return {"index": index, "status": "ok", **analysis}
+            except Exception as e:
+                return {"index": index, "status": "error", "original_prompt": claim, "error": str(e)}
+
+        tasks = [asyncio.ensure_future(verifier(i, c)) for i, (_, _, c) in enumerate(claims)]
+        hallucinations = failed = 0
         try:
-            print(f"\n{'='*60}")
-            print(f"🚀 Appel Groq API")
-            print(f"📝 Prompt: {prompt}")
-            print(f"{'='*60}\n")
-            
-            # Prompt structuré pour obtenir un JSON
-            system_prompt = """You are a fact-checking AI. Analyze statements for factual accuracy.
+            for prochain in asyncio.as_completed(tasks):
+                result = await prochain
+                start, end, _ = claims[result["index"]]
+                if result["status"] == "error":
+                    failed += 1
+                elif result["ai_analysis"]["is_hallucination"]:
+                    hallucinations += 1
+                yield {"event": "claim", "data": {**result, "start": start, "end": end}}
+        finally:
+            for task in tasks:
+                task.cancel()
 
-Respond ONLY with a JSON object in this exact format:
-{
-  "is_correct": true or false,
-  "confidence": 0.XX (between 0 and 1),
-  "explanation": "Brief explanation of why it's correct or incorrect",
-  "corrected_version": "If incorrect, provide the correct information. If correct, repeat the original statement."
-}
+        yield {"event": "summary", "data": {
+            "total": len(claims),
+            "succeeded": len(claims) - failed,
+            "failed": failed,
+            "hallucinations": hallucinations,
+            "is_hallucination": hallucinations > 0,
+            "elapsed_ms": round((time.monotonic() - debut) * 1000, 1)
+        }}
 
-Do not include any other text, markdown formatting, or code blocks. Only the raw JSON."""
+    async def detect_hallucination_batch(self, prompts: List[str], pack: bool = False) -> List[Dict[str, Any]]:
+        """
+        Vérifie plusieurs textes en parallèle (au plus HALLUCINATION_BATCH_CONCURRENCY
+        appels Groq simultanés). Avec `pack`, les textes courts absents du cache sont
+        regroupés par HALLUCINATION_PACK_SIZE dans un seul appel. Chaque élément a son
+        propre statut : une erreur n'empêche pas les autres d'aboutir.
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(prompts)
+        # Une échéance commune : l'attente du sémaphore et du quota en fait partie
+        deadline = time.monotonic() + LLM_DEADLINE_SECONDS
+
+        async def verifier_un(index: int):
+            prompt = prompts[index]
+            try:
+                async with self._batch_semaphore:
+                    analysis = await self.detect_hallucination(prompt, deadline)
+                results[index] = {"index": index, "status": "ok", **analysis}
+            except Exception as e:
+                results[index] = {"index": index, "status": "error", "original_prompt": prompt, "error": str(e)}
+
+        # Textes identiques (après normalisation) : une seule affirmation dans le paquet,
+        # son verdict est recopié pour chaque index
+        copies: Dict[int, List[int]] = {}
+
+        async def verifier_paquet(indices: List[int]):
+            try:
+                async with self._batch_semaphore:
+                    verdicts = await self._verify_packed([prompts[i] for i in indices], deadline)
+            except Exception as e:
+                # Repli : chaque texte du paquet est vérifié séparément (les copies partagent l'appel)
+                logger.warning(f"⚠️ Paquet de {len(indices)} textes en échec, vérification unitaire", extra=champs_erreur(e))
+                await asyncio.gather(*(verifier_un(i) for indice in indices for i in copies[indice]))
+                return
+            for indice, verdict in zip(indices, verdicts):
+                self._cache_set(self._cache_key(prompts[indice]), verdict)
+                for index in copies[indice]:
+                    self.stats.incr("total_analyses")
+                    results[index] = {"index": index, "status": "ok", **self._build_analysis(prompts[index], verdict)}
+
+        a_grouper = []
+        if pack:
+            await self._rafraichir_revision_index()
+            par_cle: Dict[str, int] = {}
+            for i, prompt in enumerate(prompts):
+                if len(prompt) > HALLUCINATION_PACK_MAX_CHARS:
+                    continue
+                key = self._cache_key(prompt)
+                if key in par_cle:
+                    copies[par_cle[key]].append(i)
+                    self.stats.incr("coalesced_requests")
+                elif self._cache_get(key) is None:
+                    par_cle[key] = i
+                    copies[i] = [i]
+            candidats = list(copies)
+            locaux = await asyncio.gather(*(self._has_local_match(prompts[i]) for i in candidats))
+            a_grouper = [i for i, local in zip(candidats, locaux) if not local]
+        paquets = [a_grouper[i:i + HALLUCINATION_PACK_SIZE] for i in range(0, len(a_grouper), HALLUCINATION_PACK_SIZE)]
+        groupes = {index for indice in a_grouper for index in copies[indice]}
+
+        await asyncio.gather(
+            *(verifier_paquet(paquet) for paquet in paquets),
+            *(verifier_un(i) for i in range(len(prompts)) if i not in groupes)
+        )
+        return results
+
+    async def _rafraichir_revision_index(self):
+        """Relit la révision du corpus local (au plus toutes les FACT_INDEX_REFRESH_SECONDS) avant de calculer une clé"""
+        if self.fact_index is not None and self.fact_index.revision_perimee():
+            await asyncio.to_thread(self.fact_index.rafraichir_revision)
+
+    def _cache_key(self, prompt: str) -> str:
+        # La révision du corpus local en fait partie : un corpus modifié invalide les verdicts
+        revision = str(self.fact_index.revision) if self.fact_index is not None else ""
+        return cle_contenu(normaliser_texte(prompt), self.model, SYSTEM_PROMPT_VERSION, revision)
+
+    def _cache_get(self, key: str) -> Optional[Dict[str, Any]]:
+        verdict = self.cache.get(key)
+        if verdict is None and self.disk_cache is not None:
+            verdict = self.disk_cache.get(key)
+            if verdict is not None:
+                self.cache.set(key, verdict)
+        return verdict
+
+    def _cache_set(self, key: str, verdict: Dict[str, Any]):
+        self.cache.set(key, verdict)
+        if self.disk_cache is not None:
+            self.disk_cache.set(key, verdict)
+
+    async def _verify_and_store(self, key: str, prompt: str, deadline: Optional[float] = None) -> Dict[str, Any]:
+        verdict = await self._verify(prompt, deadline)
+        self._cache_set(key, verdict)
+        return verdict
+
+    async def _verify(self, prompt: str, deadline: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Consulte d'abord l'index local : une affirmation confirmée par un passage
+        de référence est validée sans appel au LLM ; sinon les passages proches
+        sont transmis au LLM comme contexte.
+        """
+        if self.fact_index is None:
+            return await self._verify_with_groq(prompt, deadline)
+
+        # Requête SQLite hors de la boucle asyncio
+        recherche = await asyncio.to_thread(self.fact_index.lookup, prompt)
+        if recherche["local"] is not None:
+            return self._local_verdict(prompt, recherche["local"])
+        return await self._verify_with_groq(prompt, deadline, recherche["context"])
+
+    @staticmethod
+    def _source_locale(index: int, passage: Dict[str, Any], validity: str) -> Dict[str, Any]:
+        return {
+            "id": index,
+            "title": passage["title"] or passage["id"],
+            "validity": validity,
+            "snippet": passage["text"][:500],
+            "url": passage["source"] or None
+        }
+
+    def _local_verdict(self, prompt: str, passage: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "is_hallucination": False,
+            "confidence": passage["coverage"],
+            "corrected_text": prompt,
+            "facts": [prompt],
+            "sources": [self._source_locale(1, passage, "correct")],
+            "ai_explanation": "Confirmé par le corpus de référence local",
+            "answered_locally": True
+        }
 
+    async def _verify_cached(self, prompt: str, deadline: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Verdict depuis le cache si possible ; sinon un seul appel Groq par clé,
+        partagé par toutes les requêtes identiques arrivées entre-temps.
+        Les erreurs ne sont pas mises en cache.
+        """
+        await self._rafraichir_revision_index()
+        key = self._cache_key(prompt)
+        verdict = self._cache_get(key)
+        if verdict is not None:
+            self.stats.incr("cache_hits")
+            return verdict
+
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.stats.incr("coalesced_requests")
+        else:
+            task = asyncio.ensure_future(self._verify_and_store(key, prompt, deadline))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        # shield : un appelant qui abandonne n'annule pas l'appel des autres
+        return await asyncio.shield(task)
+
+    async def _call_llm(self, system_prompt: str, user_prompt: str, parse: Callable[[str], Any],
+                        max_tokens: int = 500, deadline: Optional[float] = None) -> Tuple[Any, LLMBackend]:
+        """
+        Envoie une requête de chat aux backends LLM et retourne `(parse(réponse), backend)`
+        pour la première réponse valide (voir BackendPool.complete).
+        """
+        deadline = deadline or time.monotonic() + LLM_DEADLINE_SECONDS
+        return await self.backends.complete(system_prompt, user_prompt, max_tokens, deadline, parse)
+
+    @staticmethod
+    def _parse_json(ai_response: str) -> Dict[str, Any]:
+        with mesurer(STAGE_JSON_PARSE):
+            try:
+                return json.loads(ai_response)
+            except json.JSONDecodeError:
+                # Si le JSON est mal formé, essaye de l'extraire
+                json_match = re.search(r'\{.*\}', ai_response, re.DOTALL)
+                if json_match:
+                    return json.loads(json_match.group(0))
+                raise Exception("Réponse IA invalide (pas de JSON)")
+
+    def _build_verdict(self, parsed: Dict[str, Any], prompt: str, backend: LLMBackend) -> Dict[str, Any]:
+        """Verdict normalisé à partir de la réponse JSON du modèle"""
+        is_incorrect = not parsed.get("is_correct", True)
+        confidence = float(parsed.get("confidence", 0.8))
+        explanation = parsed.get("explanation", "")
+        corrected = parsed.get("corrected_version", prompt)
+        
+        return {
+            "is_hallucination": is_incorrect,
+            "confidence": confidence,
+            "corrected_text": corrected,
+            "facts": [prompt],
+            "sources": [{
+                "id": 1,
+                "title": f"{backend.name} ({backend.model})",
+                "validity": "hallucination" if is_incorrect else "correct",
+                "snippet": explanation
+            }],
+            "ai_explanation": explanation
+        }
+
+    async def _verify_with_groq(self, prompt: str, deadline: Optional[float] = None,
+                                context: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """Appel à l'API Groq (ultra rapide, <1s)"""
+        
+        try:
+            # Ni le prompt ni la réponse ne sont journalisés (données personnelles possibles)
             user_prompt = f'Analyze this statement: "{prompt}"'
+            if context:
+                # Passages du corpus local : le modèle s'appuie sur des sources réelles
+                passages = "\n".join(f"[{i}] {p['title']}: {p['text'][:1000]}" for i, p in enumerate(context, 1))
+                user_prompt += f"\n\nReference passages (may be relevant):\n{passages}"
+            with span(logger, "🚀 Appel LLM", prompt_chars=len(prompt), context_passages=len(context or [])) as champs:
+                parsed, backend = await self._call_llm(SYSTEM_PROMPT, user_prompt, self._parse_json, deadline=deadline)
+                champs["backend"] = backend.name
             
-            payload = {
-                "model": self.model,
-                "messages": [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                "temperature": 0.1,
-                "max_tokens": 500,
-                "response_format": {"type": "json_object"}  # Force JSON
-            }
+            verdict = self._build_verdict(parsed, prompt, backend)
+            for passage in context or []:
+                verdict["sources"].append(self._source_locale(len(verdict["sources"]) + 1, passage, "reference"))
+            self.stats.incr("api_successes")
+            return verdict
             
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    self.groq_url,
-                    json=payload,
-                    headers=self.headers
-                )
-                
-                print(f"📥 Status: {response.status_code}")
-                
-                if response.status_code == 401:
-                    raise Exception("❌ Clé API Groq invalide. Vérifiez votre .env")
-                
-                if response.status_code == 429:
-                    raise Exception("⏳ Limite de requêtes atteinte. Réessayez dans 1 minute.")
-                
-                if response.status_code != 200:
-                    error_text = response.text[:300]
-                    raise Exception(f"Erreur API Groq ({response.status_code}): {error_text}")
-                
-                result = response.json()
-                
-                # Extraction de la réponse
-                ai_response = result["choices"][0]["message"]["content"]
-                
-                print(f"✅ Réponse reçue:\n{ai_response}\n")
-                
-                # Parse le JSON
-                try:
-                    parsed = json.loads(ai_response)
-                except json.JSONDecodeError:
-                    # Si le JSON est mal formé, essaye de l'extraire
-                    json_match = re.search(r'\{.*\}', ai_response, re.DOTALL)
-                    if json_match:
-                        parsed = json.loads(json_match.group(0))
-                    else:
-                        raise Exception("Réponse IA invalide (pas de JSON)")
-                
-                # Construction de la réponse
-                is_incorrect = not parsed.get("is_correct", True)
-                confidence = float(parsed.get("confidence", 0.8))
-                explanation = parsed.get("explanation", "")
-                corrected = parsed.get("corrected_version", prompt)
-                
-                self.stats["api_successes"] += 1
-                
-                return {
-                    "is_hallucination": is_incorrect,
-                    "confidence": confidence,
-                    "corrected_text": corrected,
-                    "facts": [prompt],
-                    "sources": [{
-                        "id": 1,
-                        "title": f"Groq AI ({self.model})",
-                        "validity": "hallucination" if is_incorrect else "correct",
-                        "snippet": explanation
-                    }],
-                    "ai_explanation": explanation
-                }
-                
-        except httpx.TimeoutException:
-            self.stats["api_failures"] += 1
-            raise Exception("⏱️ Timeout de l'API Groq")
-        except httpx.ConnectError:
-            self.stats["api_failures"] += 1
-            raise Exception("🔌 Impossible de se connecter à Groq")
+        except httpx.TimeoutException as e:
+            self.stats.incr("api_failures")
+            raise Exception("⏱️ Timeout de l'API Groq") from e
+        except httpx.ConnectError as e:
+            self.stats.incr("api_failures")
+            raise Exception("🔌 Impossible de se connecter à Groq") from e
         except Exception as e:
-            self.stats["api_failures"] += 1
-            raise Exception(f"Erreur Groq API: {str(e)}")
+            self.stats.incr("api_failures")
+            raise Exception(f"Erreur Groq API: {str(e)}") from e
+
+    async def _has_local_match(self, prompt: str) -> bool:
+        """Vrai si l'index local a un passage utile : ces textes ne sont pas regroupés"""
+        if self.fact_index is None:
+            return False
+        passages = await asyncio.to_thread(self.fact_index.search, prompt)
+        return any(p["coverage"] >= RETRIEVAL_CONTEXT_THRESHOLD for p in passages)
+
+    async def _verify_packed(self, prompts: List[str], deadline: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Vérifie plusieurs textes courts en un seul appel (réponse : tableau JSON)"""
+        try:
+            claims = "\n".join(f"{i}. {json.dumps(p, ensure_ascii=False)}" for i, p in enumerate(prompts))
+
+            def lire_resultats(ai_response: str) -> Dict[int, Dict[str, Any]]:
+                # Une réponse incomplète est rejetée : un autre backend peut répondre à la place
+                items = self._parse_json(ai_response).get("results", [])
+                par_index = {int(item.get("index", -1)): item for item in items if isinstance(item, dict)}
+                if sorted(par_index) != list(range(len(prompts))):
+                    raise Exception(f"Réponse incomplète ({len(par_index)}/{len(prompts)} verdicts)")
+                return par_index
+
+            par_index, backend = await self._call_llm(
+                PACKED_SYSTEM_PROMPT,
+                f"Analyze these statements:\n{claims}",
+                lire_resultats,
+                max_tokens=300 * len(prompts),
+                deadline=deadline
+            )
+
+            verdicts = [self._build_verdict(par_index[i], prompt, backend) for i, prompt in enumerate(prompts)]
+            self.stats.incr("api_successes")
+            self.stats.incr("packed_calls")
+            return verdicts
+        
+        except httpx.TimeoutException as e:
+            self.stats.incr("api_failures")
+            raise Exception("⏱️ Timeout de l'API Groq") from e
+        except httpx.ConnectError as e:
+            self.stats.incr("api_failures")
+            raise Exception("🔌 Impossible de se connecter à Groq") from e
+        except Exception as e:
+            self.stats.incr("api_failures")
+            raise Exception(f"Erreur Groq API: {str(e)}") from e
 
     def _generate_segments(self, original: str, corrected: str, verification: Dict) -> List[Dict]:
-        """Génère les segments de différence"""
+        """Génère les segments de différence (diff de Myers au niveau des mots)"""
         if not verification["is_hallucination"]:
             return [{"text": original, "type": "neutral"}]
 
-        # Si trop différent, retourne juste la correction
-        if abs(len(corrected) - len(original)) > len(original) * 1.5:
-            return [{
-                "text": corrected, 
-                "type": "correct", 
-                "explanation": "Correction complète"
-            }]
-
-        # Comparaison mot par mot
-        segments = []
-        o_words = original.split()
-        c_words = corrected.split()
-
-        for i in range(max(len(o_words), len(c_words))):
-            if i < len(o_words) and i < len(c_words):
-                if o_words[i].lower() == c_words[i].lower():
-                    segments.append({"text": o_words[i] + " ", "type": "neutral"})
-                else:
-                    segments.append({
-                        "text": c_words[i] + " ",
-                        "type": "correct",
-                        "explanation": f"'{o_words[i]}' → '{c_words[i]}'"
-                    })
-            elif i < len(c_words):
-                segments.append({
-                    "text": c_words[i] + " ", 
-                    "type": "correct",
-                    "explanation": "Ajout"
-                })
-
+        segments = diff_segments(original, corrected)
         return segments if segments else [{"text": corrected, "type": "correct"}]
 
     def get_statistics(self) -> Dict[str, Any]:
         """Statistiques d'utilisation"""
         total_calls = self.stats["api_successes"] + self.stats["api_failures"]
         success_rate = (self.stats["api_successes"] / max(total_calls, 1)) * 100
+
+        cache = {"memory": self.cache.get_stats(), "in_flight": len(self._in_flight)}
+        if self.disk_cache is not None:
+            cache["disk"] = self.disk_cache.get_stats()
         
         return {
             "stats": self.stats,
@@ -226,7 +515,11 @@ Do not include any other text, markdown formatting, or code blocks. Only the raw
                 (self.stats["hallucinations_detected"] / max(self.stats["total_analyses"], 1)) * 100, 
                 2
             ),
-            "model": self.model
+            "model": self.model,
+            "cache": cache,
+            "llm_backends": self.backends.get_stats(),
+            "retrieval": self.fact_index.get_stats() if self.fact_index is not None else None,
+            "http_client": http_client.get_stats()
         }
 
 
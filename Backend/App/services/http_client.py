@@ -0,0 +1,90 @@
+import importlib.util
+import os
+from typing import Any, Dict, Optional
+
+import httpx
+
+from services.logging_service import get_logger
+
+logger = get_logger("http")
+
+# Pool de connexions partagé pour les appels sortants (Groq...)
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "true").lower() in ("1", "true", "yes")
+# Délais séparés : une connexion qui n'aboutit pas échoue vite, une réponse lente a plus de marge
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "30"))
+HTTP_WRITE_TIMEOUT = float(os.getenv("HTTP_WRITE_TIMEOUT", "10"))
+HTTP_POOL_TIMEOUT = float(os.getenv("HTTP_POOL_TIMEOUT", "5"))
+
+
+class SharedHttpClient:
+    """
+    Client httpx unique, ouvert au démarrage de l'application et fermé à
+    l'arrêt : les connexions (TCP + TLS) sont réutilisées d'un appel à l'autre
+    au lieu d'être renégociées à chaque requête.
+    """
+
+    def __init__(self):
+        # HTTP/2 nécessite le paquet h2 (httpx[http2])
+        self.http2 = HTTP2_ENABLED and importlib.util.find_spec("h2") is not None
+        if HTTP2_ENABLED and not self.http2:
+            logger.warning("⚠️ HTTP/2 désactivé : paquet 'h2' introuvable (pip install h2)")
+        self.limits = httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+        )
+        self.timeout = httpx.Timeout(
+            connect=HTTP_CONNECT_TIMEOUT,
+            read=HTTP_READ_TIMEOUT,
+            write=HTTP_WRITE_TIMEOUT,
+            pool=HTTP_POOL_TIMEOUT
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def start(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(http2=self.http2, limits=self.limits, timeout=self.timeout)
+        return self._client
+
+    def timeout_borne(self, restant: float) -> httpx.Timeout:
+        """Délais du client plafonnés à `restant` secondes (échéance de l'appelant)"""
+        restant = max(restant, 0.001)
+        return httpx.Timeout(
+            connect=min(HTTP_CONNECT_TIMEOUT, restant),
+            read=min(HTTP_READ_TIMEOUT, restant),
+            write=min(HTTP_WRITE_TIMEOUT, restant),
+            pool=min(HTTP_POOL_TIMEOUT, restant)
+        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Client partagé (créé à la demande si utilisé hors du cycle de vie de l'app)"""
+        return self.start()
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "open": self._client is not None and not self._client.is_closed,
+            "http2": self.http2,
+            "max_connections": HTTP_MAX_CONNECTIONS,
+            "max_keepalive_connections": HTTP_MAX_KEEPALIVE,
+            "keepalive_expiry": HTTP_KEEPALIVE_EXPIRY,
+            "timeouts": {
+                "connect": HTTP_CONNECT_TIMEOUT,
+                "read": HTTP_READ_TIMEOUT,
+                "write": HTTP_WRITE_TIMEOUT,
+                "pool": HTTP_POOL_TIMEOUT
+            }
+        }
+
+
+# Instance globale (ouverte/fermée par le lifespan de main.py)
+http_client = SharedHttpClient()
@@ -0,0 +1,463 @@
+"""
+Backends LLM compatibles OpenAI (/v1/chat/completions) pour la vérification
+des faits : Groq par défaut, ou une liste configurable (autre fournisseur,
+serveur local...). Chaque appel part vers le backend le plus sain ; s'il n'a
+pas répondu après un délai calé sur ses percentiles de latence, un second
+backend est interrogé en parallèle et la première réponse valide l'emporte.
+Un backend qui échoue en boucle est écarté un temps (disjoncteur).
+
+    LLM_BACKENDS='[
+      {"name": "groq", "url": "https://api.groq.com/openai/v1/chat/completions",
+       "model": "llama-3.3-70b-versatile", "api_key_env": "GROQ_API_KEY", "rpm": 30, "tpm": 12000},
+      {"name": "local", "url": "http://127.0.0.1:8099/v1/chat/completions", "model": "mock"}
+    ]'
+"""
+import asyncio
+import json
+import math
+import os
+import random
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+from dotenv import load_dotenv
+
+from services.http_client import http_client
+from services.logging_service import get_logger
+from services.metrics import STAGE_LLM_CALL, mesurer
+from services.rate_limiter import RateLimiter, RateLimitTimeout, backoff
+
+load_dotenv()
+
+logger = get_logger("llm")
+
+# Backend par défaut (si LLM_BACKENDS est vide) : Groq
+GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
+# Endpoint compatible OpenAI (surchargeable pour pointer vers un serveur de test local)
+GROQ_API_URL = os.getenv("GROQ_API_URL", "https://api.groq.com/openai/v1/chat/completions")
+GROQ_MODEL = "llama-3.3-70b-versatile"
+# Quota du fournisseur (limite gratuite Groq pour llama-3.3-70b)
+GROQ_RPM = int(os.getenv("GROQ_RPM", "30"))
+GROQ_TPM = int(os.getenv("GROQ_TPM", "12000"))
+# Liste JSON de backends (name, url, model, api_key_env, rpm, tpm, weight)
+LLM_BACKENDS = os.getenv("LLM_BACKENDS", "")
+
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+RETRYABLE_STATUS = {500, 502, 503, 504}
+
+# Requêtes de couverture : délai = percentile de latence du backend principal
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "true").lower() in ("1", "true", "yes")
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+LLM_HEDGE_MIN_MS = float(os.getenv("LLM_HEDGE_MIN_MS", "200"))
+# Délai utilisé tant que le backend n'a pas assez de mesures
+LLM_HEDGE_DEFAULT_MS = float(os.getenv("LLM_HEDGE_DEFAULT_MS", "2000"))
+LLM_HEDGE_MAX_PARALLEL = int(os.getenv("LLM_HEDGE_MAX_PARALLEL", "2"))
+HEDGE_MIN_SAMPLES = 20
+LATENCY_WINDOW = 200
+
+# Disjoncteur : ouvert après N échecs consécutifs, nouvel essai après le délai
+LLM_CIRCUIT_FAILURES = int(os.getenv("LLM_CIRCUIT_FAILURES", "5"))
+LLM_CIRCUIT_RESET_SECONDS = float(os.getenv("LLM_CIRCUIT_RESET_SECONDS", "30"))
+
+
+class LLMHTTPError(Exception):
+    """Réponse HTTP en erreur d'un backend (statut conservé pour le disjoncteur)"""
+
+    def __init__(self, backend: str, status: int, message: str):
+        self.backend = backend
+        self.status = status
+        super().__init__(message)
+
+
+class ReponseIllisible(Exception):
+    """Réponse reçue mais rejetée par `parse` (JSON mal formé, tronqué ou incomplet)"""
+
+
+def panne_backend(e: Exception) -> bool:
+    """
+    Vrai pour les erreurs qui signalent un backend en panne (réseau, délai, 5xx) :
+    seules celles-ci comptent pour le disjoncteur. Un quota épuisé (429), une
+    réponse illisible ou une erreur 4xx ne disent rien de sa disponibilité.
+    """
+    if isinstance(e, httpx.TransportError):
+        return True
+    return isinstance(e, LLMHTTPError) and e.status >= 500
+
+
+class CircuitBreaker:
+    """
+    closed : appels normaux ; open : backend écarté pendant `reset_seconds` ;
+    half_open : un seul appel d'essai, qui referme ou rouvre le circuit.
+    Désactivé (enabled=False) quand aucun autre backend ne peut prendre le
+    relais : l'ouvrir ne ferait que refuser des appels qui pourraient aboutir.
+    """
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.enabled = True
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._trial = False
+
+    def available(self) -> bool:
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_seconds:
+            self.state = "half_open"
+            self._trial = False
+        if self.state == "half_open":
+            return not self._trial
+        return self.state == "closed"
+
+    def begin(self):
+        if self.state == "half_open":
+            self._trial = True
+
+    def release(self):
+        """Appel abandonné (annulé) : l'essai en half_open reste disponible"""
+        self._trial = False
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+        self._trial = False
+
+    def record_failure(self):
+        self.failures += 1
+        if not self.enabled:
+            return
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                self.times_opened += 1
+            self.state = "open"
+            self.opened_at = time.monotonic()
+        self._trial = False
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = {
+            "enabled": self.enabled,
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "times_opened": self.times_opened
+        }
+        if self.state == "open":
+            stats["retry_in_seconds"] = round(max(self.reset_seconds - (time.monotonic() - self.opened_at), 0), 1)
+        return stats
+
+
+class LLMBackend:
+    """Un endpoint compatible OpenAI, avec son quota, ses latences et son disjoncteur"""
+
+    def __init__(self, name: str, url: str, model: str, api_key: str = "",
+                 rpm: int = GROQ_RPM, tpm: int = GROQ_TPM, weight: float = 1.0):
+        self.name = name
+        self.url = url
+        self.model = model
+        self.weight = weight
+        self.headers = {"Content-Type": "application/json"}
+        if api_key:
+            self.headers["Authorization"] = f"Bearer {api_key}"
+        self.limiter = RateLimiter(rpm, tpm, name)
+        self.breaker = CircuitBreaker(LLM_CIRCUIT_FAILURES, LLM_CIRCUIT_RESET_SECONDS)
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        # Moyennes mobiles pour le routage : taux de succès et latence (s)
+        self.success_rate = 1.0
+        self.latency_ewma: Optional[float] = None
+        self.stats = {"calls": 0, "successes": 0, "failures": 0, "cancelled": 0}
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Latence (s) au percentile `p` sur les derniers appels réussis"""
+        if not self.latencies:
+            return None
+        ordonnees = sorted(self.latencies)
+        return ordonnees[max(math.ceil(p / 100 * len(ordonnees)) - 1, 0)]
+
+    def hedge_delay(self) -> float:
+        """Attente (s) avant d'interroger un second backend"""
+        if len(self.latencies) < HEDGE_MIN_SAMPLES:
+            return LLM_HEDGE_DEFAULT_MS / 1000
+        return max(self.percentile(LLM_HEDGE_PERCENTILE), LLM_HEDGE_MIN_MS / 1000)
+
+    def health(self) -> float:
+        """Poids de routage : taux de succès récent rapporté à la latence habituelle"""
+        latence = self.latency_ewma if self.latency_ewma is not None else LLM_HEDGE_DEFAULT_MS / 1000
+        return self.weight * max(self.success_rate, 0.01) / max(latence, 0.01)
+
+    def record(self, success: bool, latency: Optional[float] = None, panne: bool = True):
+        """`panne` : l'échec compte pour le disjoncteur (sinon il ne pèse que sur le routage)"""
+        self.success_rate = 0.8 * self.success_rate + 0.2 * (1.0 if success else 0.0)
+        if success:
+            self.stats["successes"] += 1
+            self.latencies.append(latency)
+            self.latency_ewma = latency if self.latency_ewma is None else 0.8 * self.latency_ewma + 0.2 * latency
+            self.breaker.record_success()
+        else:
+            self.stats["failures"] += 1
+            if panne:
+                self.breaker.record_failure()
+            else:
+                self.breaker.release()
+
+    def record_cancelled(self, elapsed: float):
+        """
+        Appel annulé (battu par un autre backend) : il aurait duré au moins `elapsed`,
+        ce qui compte dans la latence de routage pour qu'un backend lent perde la main.
+        """
+        self.stats["cancelled"] += 1
+        self.breaker.release()
+        if self.latency_ewma is None or elapsed > self.latency_ewma:
+            self.latency_ewma = elapsed if self.latency_ewma is None else 0.8 * self.latency_ewma + 0.2 * elapsed
+
+    async def chat(self, system_prompt: str, user_prompt: str, max_tokens: int, deadline: float) -> str:
+        """
+        Envoie une requête de chat et retourne le contenu de la réponse.
+        L'appel attend son tour dans le limiteur de quota ; les 429, erreurs 5xx et
+        erreurs réseau sont réessayés (backoff avec jitter) tant que l'échéance
+        `deadline` (time.monotonic()) le permet.
+        """
+        payload = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            "temperature": 0.1,
+            "max_tokens": max_tokens,
+            "response_format": {"type": "json_object"}  # Force JSON
+        }
+        # Estimation prudente (~4 caractères par token) + la réponse max, corrigée avec `usage`
+        reserved = (len(system_prompt) + len(user_prompt)) / 4 + max_tokens
+
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            derniere = attempt == LLM_MAX_RETRIES
+            await self.limiter.acquire(reserved, deadline)
+
+            restant = deadline - time.monotonic()
+            try:
+                if restant <= 0:
+                    raise httpx.TimeoutException("⏱️ Échéance atteinte avant l'appel")
+                # Client partagé : connexions TCP/TLS réutilisées entre les appels.
+                # Les délais httpx s'appliquent par opération (une lecture lente mais
+                # continue les dépasse) : wait_for borne l'appel entier à l'échéance.
+                with mesurer(STAGE_LLM_CALL):
+                    response = await asyncio.wait_for(
+                        http_client.client.post(
+                            self.url, json=payload, headers=self.headers, timeout=http_client.timeout_borne(restant)
+                        ),
+                        restant
+                    )
+            except asyncio.TimeoutError:
+                raise httpx.TimeoutException(f"⏱️ {self.name} n'a pas répondu avant l'échéance")
+            except (httpx.TimeoutException, httpx.ConnectError):
+                delai = backoff(attempt)
+                if derniere or time.monotonic() + delai > deadline:
+                    raise
+                self.limiter.stats.incr("retries")
+                await asyncio.sleep(delai)
+                continue
+
+            logger.debug(f"📥 {self.name} status: {response.status_code}", extra={"backend": self.name, "status": response.status_code})
+
+            if response.status_code == 401:
+                raise Exception(f"❌ Clé API invalide pour {self.name}. Vérifiez votre .env")
+
+            if response.status_code == 429:
+                # Pause du limiteur (Retry-After) : les appels en file attendent aussi
+                delai = self.limiter.on_throttled(response.headers, attempt)
+                if derniere or time.monotonic() + delai > deadline:
+                    raise LLMHTTPError(self.name, 429, "⏳ Limite de requêtes atteinte. Réessayez dans 1 minute.")
+                self.limiter.stats.incr("retries")
+                continue
+
+            if response.status_code in RETRYABLE_STATUS and not derniere:
+                delai = backoff(attempt)
+                if time.monotonic() + delai <= deadline:
+                    self.limiter.stats.incr("retries")
+                    await asyncio.sleep(delai)
+                    continue
+
+            if response.status_code != 200:
+                # Le corps peut citer le prompt : seulement en DEBUG, jamais dans le message d'erreur
+                logger.debug(f"Réponse en erreur de {self.name}", extra={
+                    "backend": self.name, "status": response.status_code, "body": response.text[:300]
+                })
+                raise LLMHTTPError(self.name, response.status_code, f"Erreur API {self.name} ({response.status_code})")
+
+            result = response.json()
+            used = result.get("usage", {}).get("total_tokens")
+            if used:
+                self.limiter.settle(reserved, used)
+            # Le reste annoncé par le fournisseur fait foi s'il est plus bas que notre estimation
+            self.limiter.update_from_headers(response.headers)
+
+            # Extraction de la réponse
+            return result["choices"][0]["message"]["content"]
+
+    def get_stats(self) -> Dict[str, Any]:
+        p50, p95, p99 = (self.percentile(p) for p in (50, 95, 99))
+        return {
+            "name": self.name,
+            "model": self.model,
+            **self.stats,
+            "success_rate": round(self.success_rate, 3),
+            "latency_ms": {
+                "p50": round(p50 * 1000, 1) if p50 is not None else None,
+                "p95": round(p95 * 1000, 1) if p95 is not None else None,
+                "p99": round(p99 * 1000, 1) if p99 is not None else None
+            },
+            "hedge_delay_ms": round(self.hedge_delay() * 1000, 1),
+            "health": round(self.health(), 3),
+            "circuit": self.breaker.get_stats(),
+            "rate_limiter": self.limiter.get_stats()
+        }
+
+
+class BackendPool:
+    """Routage pondéré par la santé, requêtes de couverture et bascule entre backends"""
+
+    def __init__(self, backends: List[LLMBackend]):
+        if not backends:
+            raise ValueError("Au moins un backend LLM est requis")
+        self.backends = backends
+        if len(backends) == 1:
+            # Backend unique (Groq par défaut) : pas de relais, le disjoncteur créerait une panne
+            backends[0].breaker.enabled = False
+        self.stats = {"requests": 0, "hedged_requests": 0, "hedge_wins": 0, "failovers": 0, "rejected": 0, "parse_retries": 0}
+
+    @property
+    def signature(self) -> str:
+        """Modèles utilisables (fait partie de la clé de cache des verdicts)"""
+        return ",".join(sorted(f"{b.name}:{b.model}" for b in self.backends))
+
+    def _ordonner(self) -> List[LLMBackend]:
+        """Backends disponibles : le premier tiré au sort selon sa santé, les autres par santé décroissante"""
+        disponibles = [b for b in self.backends if b.breaker.available()]
+        if len(disponibles) <= 1:
+            return disponibles
+        premier = random.choices(disponibles, weights=[b.health() for b in disponibles])[0]
+        autres = sorted((b for b in disponibles if b is not premier), key=lambda b: b.health(), reverse=True)
+        return [premier] + autres
+
+    async def _appel(self, backend: LLMBackend, system_prompt: str, user_prompt: str, max_tokens: int,
+                     deadline: float, parse: Callable[[str], Any]) -> Any:
+        backend.breaker.begin()
+        backend.stats["calls"] += 1
+        debut = time.monotonic()
+        try:
+            contenu = await backend.chat(system_prompt, user_prompt, max_tokens, deadline)
+            try:
+                result = parse(contenu)
+            except Exception as e:
+                # Une réponse illisible compte comme un échec : un autre backend peut prendre le relais
+                raise ReponseIllisible(str(e)) from e
+        except asyncio.CancelledError:
+            backend.record_cancelled(time.monotonic() - debut)
+            raise
+        except RateLimitTimeout as e:
+            # Quota local épuisé : le backend n'est pas en cause
+            backend.breaker.release()
+            raise Exception(f"⏳ Limite de requêtes atteinte: {str(e)}")
+        except Exception as e:
+            # Une réponse illisible reste un échec (bascule sur un autre backend) sans ouvrir le circuit
+            backend.record(False, panne=panne_backend(e))
+            raise
+        backend.record(True, time.monotonic() - debut)
+        return result
+
+    async def complete(self, system_prompt: str, user_prompt: str, max_tokens: int, deadline: float,
+                       parse: Callable[[str], Any]) -> Tuple[Any, LLMBackend]:
+        """
+        Retourne `(parse(contenu), backend)` pour la première réponse valide.
+        Si le backend principal n'a pas répondu après son délai de couverture, le
+        suivant est interrogé en parallèle (au plus LLM_HEDGE_MAX_PARALLEL) ; un
+        échec bascule aussitôt sur le suivant. Les appels perdants sont annulés.
+        Une réponse illisible sans autre backend à essayer (Groq seul) est
+        redemandée au même backend, comme une 5xx, tant que l'échéance le permet.
+        """
+        self.stats["requests"] += 1
+        candidats = self._ordonner()
+        if not candidats:
+            self.stats["rejected"] += 1
+            raise Exception("🔌 Aucun backend LLM disponible (circuits ouverts)")
+
+        principal = candidats[0]
+        en_cours: Dict[asyncio.Task, LLMBackend] = {}
+        erreurs: List[Tuple[LLMBackend, Exception]] = []
+        relances = 0
+
+        def lancer():
+            backend = candidats.pop(0)
+            task = asyncio.ensure_future(
+                self._appel(backend, system_prompt, user_prompt, max_tokens, deadline, parse)
+            )
+            en_cours[task] = backend
+
+        lancer()
+        try:
+            while en_cours:
+                couverture = LLM_HEDGE_ENABLED and candidats and len(en_cours) < LLM_HEDGE_MAX_PARALLEL
+                done, _ = await asyncio.wait(
+                    en_cours,
+                    timeout=principal.hedge_delay() if couverture else None,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    self.stats["hedged_requests"] += 1
+                    lancer()
+                    continue
+
+                for task in done:
+                    backend = en_cours.pop(task)
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        erreurs.append((backend, e))
+                        continue
+                    if backend is not principal:
+                        self.stats["hedge_wins"] += 1
+                    return result, backend
+
+                if candidats and len(en_cours) < LLM_HEDGE_MAX_PARALLEL:
+                    self.stats["failovers"] += 1
+                    lancer()
+                elif not en_cours and relances < LLM_MAX_RETRIES and isinstance(erreurs[-1][1], ReponseIllisible):
+                    delai = backoff(relances)
+                    if time.monotonic() + delai >= deadline:
+                        break
+                    relances += 1
+                    self.stats["parse_retries"] += 1
+                    await asyncio.sleep(delai)
+                    candidats.append(erreurs[-1][0])
+                    lancer()
+        finally:
+            for task in en_cours:
+                task.cancel()
+
+        if len({b for b, _ in erreurs}) == 1:
+            raise erreurs[-1][1]
+        raise Exception("Tous les backends LLM ont échoué: " + "; ".join(f"{b.name}: {e}" for b, e in erreurs))
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "backends": [b.get_stats() for b in self.backends]}
+
+
+def charger_backends() -> BackendPool:
+    """Backends depuis LLM_BACKENDS (JSON), sinon Groq seul"""
+    if not LLM_BACKENDS.strip():
+        return BackendPool([LLMBackend("Groq AI", GROQ_API_URL, GROQ_MODEL, GROQ_API_KEY, GROQ_RPM, GROQ_TPM)])
+
+    backends = []
+    for config in json.loads(LLM_BACKENDS):
+        backends.append(LLMBackend(
+            name=config.get("name", config["model"]),
+            url=config["url"],
+            model=config["model"],
+            api_key=os.getenv(config["api_key_env"], "") if config.get("api_key_env") else "",
+            rpm=int(config.get("rpm", GROQ_RPM)),
+            tpm=int(config.get("tpm", GROQ_TPM)),
+            weight=float(config.get("weight", 1.0))
+        ))
+    return BackendPool(backends)
@@ -0,0 +1,175 @@
+"""
+Journalisation non bloquante : les appels logger.* déposent l'enregistrement
+dans une file (QueueHandler) et un thread dédié (QueueListener) l'écrit, hors
+de la boucle asyncio et des threads d'inférence.
+
+Chaque requête HTTP reçoit un identifiant (en-tête X-Request-ID, repris s'il
+est fourni) ajouté à toutes ses lignes de log, y compris depuis les
+exécuteurs. Avec LOG_SAMPLE_RATE < 1, seule une partie des requêtes garde
+ses logs DEBUG/INFO (accès, spans) ; les WARNING et ERROR sont toujours écrits.
+
+Aucun texte utilisateur (prompt, CSV, réponse du modèle) ne doit être
+journalisé : seulement des longueurs, des empreintes et des durées.
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Optional
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# json : une ligne JSON par événement (collecte) ; text : lisible en développement
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+# Part des requêtes dont les logs DEBUG/INFO sont conservés
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+
+LOGGER_NAME = "safeai"
+
+request_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+_echantillonne: contextvars.ContextVar[bool] = contextvars.ContextVar("log_sampled", default=True)
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+# Attributs standard d'un LogRecord : le reste vient de `extra` et devient un champ JSON
+_ATTRIBUTS_STANDARD = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "request_id"}
+
+
+def get_logger(nom: str) -> logging.Logger:
+    """Logger enfant de `safeai` (ex. get_logger("hallucination") -> safeai.hallucination)"""
+    return logging.getLogger(f"{LOGGER_NAME}.{nom}")
+
+
+def nouvelle_requete(request_id: Optional[str] = None) -> str:
+    """Ouvre le contexte de log d'une requête : identifiant et tirage d'échantillonnage"""
+    request_id = request_id or uuid.uuid4().hex[:16]
+    request_id_var.set(request_id)
+    _echantillonne.set(random.random() < LOG_SAMPLE_RATE)
+    return request_id
+
+
+class _FiltreContexte(logging.Filter):
+    """Ajoute l'identifiant de requête et applique l'échantillonnage (dans le thread appelant)"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return record.levelno >= logging.WARNING or _echantillonne.get()
+
+
+class FormatJSON(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        ligne = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage()
+        }
+        if getattr(record, "request_id", None):
+            ligne["request_id"] = record.request_id
+        ligne.update({k: v for k, v in vars(record).items() if k not in _ATTRIBUTS_STANDARD})
+        if record.exc_info:
+            ligne["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(ligne, ensure_ascii=False, default=str)
+
+
+class FormatTexte(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        champs = " ".join(f"{k}={v}" for k, v in vars(record).items() if k not in _ATTRIBUTS_STANDARD)
+        request_id = getattr(record, "request_id", None)
+        prefixe = f"{self.formatTime(record, '%H:%M:%S')} {record.levelname:<7} {record.name}"
+        if request_id:
+            prefixe += f" [{request_id}]"
+        ligne = f"{prefixe} {record.getMessage()}" + (f" {champs}" if champs else "")
+        if record.exc_info:
+            ligne += "\n" + self.formatException(record.exc_info)
+        return ligne
+
+
+def configurer_logs():
+    """Installe la file et démarre le thread d'écriture (idempotent)"""
+    global _listener
+    if _listener is not None:
+        return
+
+    sortie = logging.StreamHandler(sys.stdout)
+    sortie.setFormatter(FormatJSON() if LOG_FORMAT == "json" else FormatTexte())
+
+    file_logs = queue.SimpleQueue()
+    handler = logging.handlers.QueueHandler(file_logs)
+    handler.addFilter(_FiltreContexte())
+
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.setLevel(LOG_LEVEL)
+    logger.handlers = [handler]
+    logger.propagate = False
+
+    _listener = logging.handlers.QueueListener(file_logs, sortie, respect_handler_level=True)
+    _listener.start()
+
+
+def arreter_logs():
+    """Vide la file puis arrête le thread d'écriture"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def champs_erreur(e: BaseException) -> dict:
+    """
+    Champs de log d'une exception sans son message : celui-ci peut reprendre un
+    texte utilisateur (corps de réponse d'un fournisseur qui cite le prompt).
+    Le statut HTTP est cherché dans toute la chaîne (`raise ... from e`).
+    """
+    champs = {"error_type": type(e).__name__}
+    cause = e.__cause__
+    while cause is not None:
+        # Type de l'erreur d'origine (ex. TimeoutException sous une Exception générique)
+        champs["cause_type"] = type(cause).__name__
+        cause = cause.__cause__
+    cause = e
+    while cause is not None and "status" not in champs:
+        status = getattr(cause, "status", None)
+        if status is None and getattr(cause, "response", None) is not None:
+            status = getattr(cause.response, "status_code", None)
+        if status is not None:
+            champs["status"] = status
+        cause = cause.__cause__
+    return champs
+
+
+@contextmanager
+def span(logger: logging.Logger, nom: str, level: int = logging.DEBUG, **champs):
+    """
+    Mesure un bloc et journalise sa durée (`duration_ms`) à la sortie, avec
+    `champs` et le statut (`ok` ou le type d'exception).
+    """
+    debut = time.perf_counter()
+    statut = "ok"
+    try:
+        yield champs
+    except BaseException as e:
+        statut = type(e).__name__
+        raise
+    finally:
+        if logger.isEnabledFor(level):
+            logger.log(level, nom, extra={
+                "span": nom,
+                "duration_ms": round((time.perf_counter() - debut) * 1000, 2),
+                "status": statut,
+                **champs
+            })
+
+
+# Import du module = configuration : les logs des modules chargés au démarrage passent déjà par la file
+configurer_logs()
+# Workers du pool, scripts : les derniers logs en file sont écrits avant la sortie
+atexit.register(arreter_logs)
@@ -0,0 +1,126 @@
+"""
+Métriques Prometheus : durée de chaque étape (histogrammes) et compteurs des
+services, exposés en texte par GET /metrics.
+
+Avec plusieurs processus (uvicorn --workers N, pool d'anonymisation), définir
+PROMETHEUS_MULTIPROC_DIR vers un dossier vide avant le démarrage : chaque
+processus y écrit ses valeurs et /metrics les agrège.
+
+prometheus_client est optionnel : sans lui, les mesures ne coûtent rien et
+/metrics répond 503.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Iterable, Optional, Tuple
+
+try:
+    from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest
+    from prometheus_client import multiprocess
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+    PROMETHEUS_AVAILABLE = False
+
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR", "")
+
+# Étapes mesurées
+STAGE_TOKENIZATION = "tokenization"
+STAGE_MODEL_FORWARD = "model_forward"
+STAGE_PRESIDIO_ANALYZE = "presidio_analyze"
+STAGE_PRESIDIO_ANONYMIZE = "presidio_anonymize"
+STAGE_CSV_PARSE = "csv_parse"
+STAGE_LLM_CALL = "llm_call"
+STAGE_JSON_PARSE = "json_parse"
+
+# De 0,5 ms (regex, petit lot) à 30 s (appel LLM avec nouvelles tentatives)
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+if PROMETHEUS_AVAILABLE:
+    STAGE_SECONDS = Histogram(
+        "safeai_stage_duration_seconds",
+        "Durée de chaque étape de traitement",
+        ["stage"],
+        buckets=BUCKETS
+    )
+    EVENTS = Counter(
+        "safeai_events",
+        "Compteurs des services (analyses, détections, cache, appels API...)",
+        ["service", "event"]
+    )
+else:
+    STAGE_SECONDS = None
+    EVENTS = None
+
+
+@contextmanager
+def mesurer(stage: str):
+    """Chronomètre le bloc et l'ajoute à l'histogramme de l'étape (même en cas d'erreur)"""
+    if STAGE_SECONDS is None:
+        yield
+        return
+    debut = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(stage=stage).observe(time.perf_counter() - debut)
+
+
+class _Chronometre:
+    """Enveloppe un objet appelable (tokenizer, modèle) : chaque appel est mesuré, le reste est délégué"""
+
+    def __init__(self, cible: Any, stage: str):
+        self._cible = cible
+        self._stage = stage
+
+    def __call__(self, *args, **kwargs):
+        with mesurer(self._stage):
+            return self._cible(*args, **kwargs)
+
+    def __getattr__(self, nom: str):
+        return getattr(self._cible, nom)
+
+
+def chronometrer(cible: Any, stage: str) -> Any:
+    """Retourne `cible` dont les appels sont mesurés comme l'étape `stage`"""
+    return cible if STAGE_SECONDS is None else _Chronometre(cible, stage)
+
+
+class Compteurs(dict):
+    """
+    Compteurs d'un service : un dict lisible tel quel dans les réponses JSON,
+    incrémenté sous verrou (les requêtes arrivent de plusieurs threads) et
+    recopié dans le compteur Prometheus `safeai_events_total`.
+    """
+
+    def __init__(self, service: str, noms: Iterable[str]):
+        super().__init__((nom, 0) for nom in noms)
+        self.service = service
+        self._lock = threading.Lock()
+
+    def incr(self, nom: str, n: int = 1):
+        with self._lock:
+            self[nom] = self.get(nom, 0) + n
+        if EVENTS is not None and n > 0:
+            EVENTS.labels(service=self.service, event=nom).inc(n)
+
+
+def processus_termine(pid: int):
+    """
+    À appeler par le parent quand un worker (pool d'anonymisation) s'arrête :
+    en mode multiprocess, ses fichiers de jauges « live » sont retirés.
+    """
+    if PROMETHEUS_AVAILABLE and PROMETHEUS_MULTIPROC_DIR:
+        multiprocess.mark_process_dead(pid)
+
+
+def exporter() -> Tuple[Optional[bytes], str]:
+    """Texte au format Prometheus (agrégé sur tous les processus en mode multiprocess)"""
+    if not PROMETHEUS_AVAILABLE:
+        return None, CONTENT_TYPE_LATEST
+    if PROMETHEUS_MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
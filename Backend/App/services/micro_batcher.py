@@ -0,0 +1,127 @@
+import asyncio
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from services.metrics import Compteurs
+
+
+class QueueFullError(Exception):
+    """Levée quand la file d'attente du micro-batcher est pleine"""
+
+
+class MicroBatcher:
+    """
+    Regroupe les requêtes unitaires concurrentes en un seul lot : le premier
+    élément arrivé attend au plus `max_wait_ms` que d'autres le rejoignent
+    (jusqu'à `max_batch_size`), puis `process_batch` est appelé une seule fois
+    dans un thread (ou dans `executor` s'il est fourni) et chaque appelant
+    reçoit son propre résultat.
+    """
+
+    def __init__(
+        self,
+        process_batch: Callable[[List[Any]], List[Any]],
+        max_wait_ms: float = 5.0,
+        max_batch_size: int = 32,
+        max_queue_size: int = 1000,
+        executor=None,
+        name: str = "batcher"
+    ):
+        self.process_batch = process_batch
+        self.executor = executor
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.max_queue_size = max_queue_size
+        self._pending: Deque[Tuple[Any, asyncio.Future]] = deque()
+        self._new_item = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.stats = Compteurs(f"batcher:{name}", ["batches", "items", "max_batch_size_seen", "rejected"])
+        self.stats["batch_size_histogram"] = {}
+
+    async def submit(self, item: Any) -> Any:
+        """Ajoute un élément au prochain lot et attend son résultat"""
+        if len(self._pending) >= self.max_queue_size:
+            self.stats.incr("rejected")
+            raise QueueFullError(f"File d'attente pleine ({self.max_queue_size} éléments)")
+
+        if self._task is None or self._task.done():
+            # L'Event est lié à la boucle qui l'utilise : on le recrée avec la tâche
+            self._new_item = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((item, future))
+        self._new_item.set()
+        return await future
+
+    async def _collect(self) -> List[Tuple[Any, asyncio.Future]]:
+        """Attend un premier élément puis complète le lot jusqu'à la taille ou au délai max"""
+        while not self._pending:
+            self._new_item.clear()
+            await self._new_item.wait()
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+        batch = []
+        while True:
+            while self._pending and len(batch) < self.max_batch_size:
+                batch.append(self._pending.popleft())
+
+            remaining = deadline - loop.time()
+            if len(batch) >= self.max_batch_size or remaining <= 0:
+                return batch
+
+            self._new_item.clear()
+            try:
+                await asyncio.wait_for(self._new_item.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            # Les appelants partis entre-temps (timeout, déconnexion) sont ignorés
+            batch = [(item, future) for item, future in batch if not future.done()]
+            if not batch:
+                continue
+
+            items = [item for item, _ in batch]
+            try:
+                if self.executor is not None:
+                    # L'admission est déjà bornée par la file du batcher
+                    results = await self.executor.run(self.process_batch, items, reject=False)
+                else:
+                    results = await asyncio.to_thread(self.process_batch, items)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+            self._record(len(batch))
+
+    def _record(self, size: int):
+        self.stats.incr("batches")
+        self.stats.incr("items", size)
+        self.stats["max_batch_size_seen"] = max(self.stats["max_batch_size_seen"], size)
+        histogram = self.stats["batch_size_histogram"]
+        histogram[size] = histogram.get(size, 0) + 1
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Statistiques de regroupement (taille moyenne des lots obtenus...)"""
+        return {
+            **self.stats,
+            "avg_batch_size": round(self.stats["items"] / max(self.stats["batches"], 1), 2),
+            "queue_depth": len(self._pending),
+            "max_wait_ms": self.max_wait * 1000,
+            "max_batch_size": self.max_batch_size,
+            "max_queue_size": self.max_queue_size
+        }
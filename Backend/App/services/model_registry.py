@@ -0,0 +1,106 @@
+import asyncio
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from services.logging_service import get_logger
+
+logger = get_logger("models")
+
+STATUS_IDLE = "idle"
+STATUS_LOADING = "loading"
+STATUS_READY = "ready"
+STATUS_FAILED = "failed"
+
+
+class ModelNotReady(Exception):
+    """Levée quand un modèle est demandé avant la fin de son chargement"""
+
+    def __init__(self, name: str, status: str):
+        self.name = name
+        self.status = status
+        super().__init__(f"Modèle '{name}' en cours de chargement ({status}), réessayez plus tard")
+
+
+class ModelRegistry:
+    """
+    Registre des modèles lourds (spaCy, Detoxify...) : chaque modèle est chargé
+    une seule fois, en arrière-plan, et son état de préparation est consultable.
+    """
+
+    def __init__(self):
+        self._models: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, loader: Callable[[], Any]):
+        """Déclare un modèle et la fonction (synchrone) qui le construit"""
+        self._models[name] = {
+            "loader": loader,
+            "status": STATUS_IDLE,
+            "instance": None,
+            "error": None,
+            "load_seconds": None
+        }
+
+    def _load(self, name: str):
+        model = self._models[name]
+        debut = time.perf_counter()
+        try:
+            instance = model["loader"]()
+        except Exception as e:
+            logger.error(f"❌ Échec du chargement du modèle '{name}': {str(e)}", extra={"model": name})
+            model.update(status=STATUS_FAILED, error=str(e))
+            return
+        model.update(
+            instance=instance,
+            status=STATUS_READY,
+            error=None,
+            load_seconds=round(time.perf_counter() - debut, 2)
+        )
+        logger.info(f"✅ Modèle '{name}' prêt ({model['load_seconds']}s)", extra={"model": name, "load_seconds": model["load_seconds"]})
+
+    def _start_loading(self, name: str) -> bool:
+        """Passe le modèle en 'loading' ; False s'il est déjà chargé ou en cours"""
+        with self._lock:
+            if self._models[name]["status"] in (STATUS_LOADING, STATUS_READY):
+                return False
+            self._models[name]["status"] = STATUS_LOADING
+            return True
+
+    async def warm_up(self, names: Optional[List[str]] = None):
+        """Charge les modèles en parallèle dans des threads, sans bloquer la boucle"""
+        names = [n for n in (names or list(self._models)) if self._start_loading(n)]
+        await asyncio.gather(*(asyncio.to_thread(self._load, n) for n in names))
+
+    def get(self, name: str) -> Any:
+        """
+        Retourne l'instance du modèle s'il est prêt. Sinon, lance son chargement
+        en arrière-plan (si ce n'est pas déjà fait) et lève ModelNotReady.
+        """
+        model = self._models[name]
+        if model["status"] == STATUS_READY:
+            return model["instance"]
+
+        if self._start_loading(name):
+            threading.Thread(target=self._load, args=(name,), daemon=True).start()
+        raise ModelNotReady(name, model["status"])
+
+    def is_ready(self, name: str) -> bool:
+        return name in self._models and self._models[name]["status"] == STATUS_READY
+
+    def all_ready(self) -> bool:
+        return all(m["status"] == STATUS_READY for m in self._models.values())
+
+    def get_status(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            name: {
+                "status": m["status"],
+                "load_seconds": m["load_seconds"],
+                "error": m["error"]
+            }
+            for name, m in self._models.items()
+        }
+
+
+# Instance globale
+registry = ModelRegistry()
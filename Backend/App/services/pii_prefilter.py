@@ -0,0 +1,91 @@
+import re
+from typing import Dict
+
+import pandas as pd
+
+# Niveaux de traitement, du moins cher au plus cher
+TIER_NOOP = "noop"        # aucune entité possible : la valeur est renvoyée telle quelle
+TIER_PATTERN = "pattern"  # uniquement les reconnaisseurs à base de regex (email, tél, IBAN...)
+TIER_NER = "ner"          # pipeline spaCy complet (PERSON, LOCATION, NRP)
+
+TIERS = [TIER_NOOP, TIER_PATTERN, TIER_NER]
+_RANG = {tier: rang for rang, tier in enumerate(TIERS)}
+
+# Nombre de valeurs examinées par colonne pour la profiler
+PROFILE_SAMPLE_SIZE = 200
+
+_RE_LETTRE = re.compile(r"[^\W\d_]")
+# Email, lien, nom de domaine nu (site2.com), ou suite d'au moins 6 chiffres (téléphone, CB, IBAN)
+_RE_MOTIF = re.compile(r"@|://|www\.|\w\.[a-z]{2,}\b|\d(?:[\s.\-]?\d){5,}")
+# Jeton unique de type code : lettres + chiffres / tirets bas (ST_01, A12, v2.1),
+# sauf s'il se termine comme un nom de domaine (site2.com reste un lien à masquer)
+_RE_CODE = re.compile(r"^(?=.*[\d_])(?!.*\.[a-zA-Z]{2,}$)[^\W][\w.\-]*$")
+
+
+def plus_cher(tier_a: str, tier_b: str) -> str:
+    """Retourne le niveau le plus coûteux des deux"""
+    return tier_a if _RANG[tier_a] >= _RANG[tier_b] else tier_b
+
+
+def classer_valeur(valeur) -> str:
+    """
+    Choisit le niveau de traitement d'une valeur à partir de regex peu coûteuses.
+    Dans le doute, le niveau le plus complet (NER) est retenu : même un mot
+    isolé en minuscules ('paris') peut être reconnu comme un lieu par spaCy.
+    """
+    if not isinstance(valeur, str) or len(valeur) < 2:
+        return TIER_NOOP
+
+    valeur = valeur.strip()
+    motif = bool(_RE_MOTIF.search(valeur))
+
+    if not _RE_LETTRE.search(valeur):
+        # Nombres, dates, montants, ou numéro de téléphone / carte
+        return TIER_PATTERN if motif else TIER_NOOP
+
+    if not any(c.isspace() for c in valeur):
+        if motif:
+            return TIER_PATTERN
+        if _RE_CODE.match(valeur):
+            return TIER_NOOP
+
+    return TIER_NER
+
+
+def profiler_colonnes(df: pd.DataFrame, taille_echantillon: int = PROFILE_SAMPLE_SIZE) -> Dict[int, str]:
+    """
+    Profile chaque colonne texte sur un échantillon de ses valeurs uniques et
+    renvoie, par position de colonne, le niveau le plus coûteux rencontré.
+    """
+    profil = {}
+    for position in range(df.shape[1]):
+        serie = df.iloc[:, position]
+        if not pd.api.types.is_string_dtype(serie.dtype):
+            profil[position] = TIER_NOOP
+            continue
+
+        tier = TIER_NOOP
+        for valeur in serie.dropna().unique()[:taille_echantillon]:
+            tier = plus_cher(tier, classer_valeur(valeur))
+            if tier == TIER_NER:
+                break
+        profil[position] = tier
+
+    return profil
+
+
+def tier_effectif(valeur, tier_colonne: str) -> str:
+    """
+    Niveau final d'une valeur : un code (ex. 'Lyon2') est ignoré dans une
+    colonne d'identifiants, mais analysé dans une colonne de noms/lieux.
+    """
+    tier = classer_valeur(valeur)
+    if (
+        tier == TIER_NOOP
+        and tier_colonne == TIER_NER
+        and isinstance(valeur, str)
+        and len(valeur) >= 2
+        and _RE_LETTRE.search(valeur)
+    ):
+        return TIER_NER
+    return tier
@@ -0,0 +1,143 @@
+"""
+Profileur CPU par échantillonnage, à la demande sur un worker en production :
+un thread relève la pile de chaque autre thread (sys._current_frames) à
+intervalle fixe pendant N secondes, sans instrumenter le code. Le coût reste
+négligeable (quelques dizaines d'échantillons par seconde) et disparaît à la
+fin de la capture.
+
+Désactivé par défaut (PROFILING_ENABLED) ; avec PROFILING_TOKEN, l'en-tête
+X-Profiling-Token doit le fournir. Seul le processus qui reçoit la requête
+est profilé (pas les workers du pool d'anonymisation).
+
+Sorties :
+    folded  une ligne `fonction;fonction;... N` par pile (flamegraph.pl, speedscope)
+    json    fonctions les plus présentes, en propre (self) et en cumulé (total)
+"""
+import hmac
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Optional
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes")
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN", "")
+PROFILING_MAX_SECONDS = float(os.getenv("PROFILING_MAX_SECONDS", "60"))
+# Intervalle min entre deux échantillons : en dessous, le profileur coûte plus qu'il ne mesure
+PROFILING_MIN_INTERVAL_MS = 1.0
+
+
+class ProfilingBusy(Exception):
+    """Levée quand une capture est déjà en cours dans ce processus"""
+
+
+def _cadre(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Une seule capture à la fois par processus"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def profile(self, seconds: float, interval_ms: float = 10.0, idle: bool = False) -> Dict[str, Any]:
+        """
+        Échantillonne pendant `seconds` (bloquant : à lancer hors de la boucle
+        asyncio). Avec idle=False, les threads en attente (select, verrou,
+        file vide) sont écartés pour ne garder que le temps CPU utile.
+        """
+        seconds = min(max(seconds, 0.1), PROFILING_MAX_SECONDS)
+        intervalle = max(interval_ms, PROFILING_MIN_INTERVAL_MS) / 1000
+        if not self._lock.acquire(blocking=False):
+            raise ProfilingBusy("Un profilage est déjà en cours sur ce worker")
+        try:
+            return self._capturer(seconds, intervalle, idle)
+        finally:
+            self._lock.release()
+
+    def _capturer(self, seconds: float, intervalle: float, idle: bool) -> Dict[str, Any]:
+        piles: Counter = Counter()
+        moi = threading.get_ident()
+        noms = {}
+        echantillons = 0
+        debut = time.perf_counter()
+        fin = debut + seconds
+
+        while time.perf_counter() < fin:
+            noms.update((t.ident, t.name) for t in threading.enumerate())
+            for ident, frame in sys._current_frames().items():
+                if ident == moi:
+                    continue
+                pile = []
+                while frame is not None:
+                    pile.append(_cadre(frame))
+                    frame = frame.f_back
+                if not idle and pile and _en_attente(pile[0]):
+                    continue
+                pile.append(noms.get(ident, str(ident)))
+                piles[tuple(reversed(pile))] += 1
+            echantillons += 1
+            time.sleep(intervalle)
+
+        return {
+            "seconds": round(time.perf_counter() - debut, 3),
+            "interval_ms": round(intervalle * 1000, 3),
+            "samples": echantillons,
+            "stacks": piles
+        }
+
+
+# Fonctions où un thread attend sans consommer de CPU
+_ATTENTES = ("wait (threading.py", "select (selectors.py", "_worker (thread.py", "get (queue.py",
+             "_monitor (handlers.py", "dequeue (handlers.py", "run_forever (base_events.py", "_run_once (base_events.py")
+
+
+def _en_attente(cadre: str) -> bool:
+    return cadre.startswith(_ATTENTES)
+
+
+def en_folded(resultat: Dict[str, Any]) -> str:
+    """Format « folded » : une pile par ligne, cadres séparés par ';', suivie du nombre d'échantillons"""
+    return "".join(
+        ";".join(cadre.replace(";", ",") for cadre in pile) + f" {n}\n"
+        for pile, n in resultat["stacks"].most_common()
+    )
+
+
+def en_resume(resultat: Dict[str, Any], top: int = 30) -> Dict[str, Any]:
+    """Fonctions les plus échantillonnées : en haut de pile (self) et n'importe où dans la pile (total)"""
+    propre: Counter = Counter()
+    cumule: Counter = Counter()
+    total = sum(resultat["stacks"].values())
+    for pile, n in resultat["stacks"].items():
+        propre[pile[-1]] += n
+        for cadre in set(pile[1:]):
+            cumule[cadre] += n
+
+    def classement(compteur: Counter):
+        return [
+            {"function": cadre, "samples": n, "percent": round(100 * n / total, 1)}
+            for cadre, n in compteur.most_common(top)
+        ]
+
+    return {
+        "seconds": resultat["seconds"],
+        "interval_ms": resultat["interval_ms"],
+        "samples": resultat["samples"],
+        "stack_samples": total,
+        "top_self": classement(propre),
+        "top_total": classement(cumule)
+    }
+
+
+def autorise(token: Optional[str]) -> bool:
+    """Profilage activé et, si PROFILING_TOKEN est défini, jeton correct"""
+    if not PROFILING_ENABLED:
+        return False
+    return not PROFILING_TOKEN or hmac.compare_digest(token or "", PROFILING_TOKEN)
+
+
+profiler = SamplingProfiler()
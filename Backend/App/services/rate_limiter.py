@@ -0,0 +1,174 @@
+import asyncio
+import random
+import re
+import time
+from typing import Any, Dict, Mapping, Optional
+
+from services.metrics import Compteurs
+
+
+class RateLimitTimeout(Exception):
+    """Levée quand le quota ne permet pas de faire l'appel avant l'échéance de l'appelant"""
+
+
+def parse_duree(valeur: Optional[str]) -> Optional[float]:
+    """
+    Convertit une durée d'en-tête HTTP en secondes : "12", "7.66s", "150ms",
+    "2m59.56s" (format des en-têtes x-ratelimit-reset-* de Groq/OpenAI).
+    """
+    if valeur is None:
+        return None
+    valeur = valeur.strip()
+    try:
+        return max(float(valeur), 0.0)
+    except ValueError:
+        pass
+    parties = re.findall(r"(\d+(?:\.\d+)?)(ms|h|m|s)", valeur)
+    if not parties:
+        return None
+    unites = {"h": 3600, "m": 60, "s": 1, "ms": 0.001}
+    return sum(float(nombre) * unites[unite] for nombre, unite in parties)
+
+
+class TokenBucket:
+    """Seau à jetons : `capacity` jetons max, rechargés de `rate` jetons par seconde"""
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.level = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Secondes à attendre avant de pouvoir prendre `amount` jetons"""
+        self._refill()
+        # Une demande plus grosse que le seau attend qu'il soit plein
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def consume(self, amount: float):
+        self._refill()
+        # Le niveau peut devenir négatif (consommation réelle > estimation) : la dette est rattrapée
+        self.level -= amount
+
+    def cap(self, remaining: float):
+        """Aligne le niveau sur le reste annoncé par le fournisseur s'il est plus bas"""
+        self._refill()
+        self.level = min(self.level, remaining)
+
+
+class RateLimiter:
+    """
+    Limiteur côté client pour un fournisseur LLM : deux seaux (requêtes et
+    tokens par minute), ajustés par les en-têtes de quota des réponses et mis
+    en pause après un 429. Les appels en attente sont servis dans l'ordre
+    d'arrivée, au rythme du quota, pour rester juste sous le plafond.
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int, name: str = "llm"):
+        self.requests = TokenBucket(requests_per_minute, requests_per_minute / 60)
+        self.tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60)
+        self._pause_until = 0.0
+        self._lock = asyncio.Lock()
+        self._waiting = 0
+        self.stats = Compteurs(f"rate_limiter:{name}", [
+            "acquired",
+            "throttled",
+            "retries",
+            "deadline_exceeded",
+            "total_wait_seconds"
+        ])
+
+    async def acquire(self, tokens: float, deadline: float):
+        """
+        Attend que le quota permette un appel de `tokens` tokens, puis le réserve.
+        `deadline` est une échéance time.monotonic() : RateLimitTimeout si elle serait dépassée.
+        """
+        self._waiting += 1
+        debut = time.monotonic()
+        try:
+            # Verrou FIFO : un seul appel planifié à la fois, dans l'ordre d'arrivée
+            async with self._lock:
+                while True:
+                    now = time.monotonic()
+                    attente = max(
+                        self._pause_until - now,
+                        self.requests.wait_time(1),
+                        self.tokens.wait_time(tokens)
+                    )
+                    if attente <= 0:
+                        break
+                    if now + attente > deadline:
+                        self.stats.incr("deadline_exceeded")
+                        raise RateLimitTimeout(f"Quota insuffisant avant l'échéance (attente estimée {attente:.1f}s)")
+                    await asyncio.sleep(attente)
+
+                self.requests.consume(1)
+                self.tokens.consume(tokens)
+                self.stats.incr("acquired")
+        finally:
+            self._waiting -= 1
+            self.stats.incr("total_wait_seconds", time.monotonic() - debut)
+
+    def settle(self, reserved: float, used: float):
+        """Corrige le seau de tokens avec la consommation réelle (rend ou reprend l'écart)"""
+        self.tokens.consume(used - reserved)
+
+    def update_from_headers(self, headers: Mapping[str, str]):
+        """Prend en compte les en-têtes x-ratelimit-* (reste et remise à zéro)"""
+        for bucket, suffixe in ((self.requests, "requests"), (self.tokens, "tokens")):
+            remaining = headers.get(f"x-ratelimit-remaining-{suffixe}")
+            if remaining is None:
+                continue
+            try:
+                remaining = float(remaining)
+            except ValueError:
+                continue
+            bucket.cap(remaining)
+            reset = parse_duree(headers.get(f"x-ratelimit-reset-{suffixe}"))
+            if remaining <= 0 and reset:
+                self.pause(reset)
+
+    def pause(self, seconds: float):
+        """Suspend tous les appels pendant `seconds` (Retry-After, quota épuisé)"""
+        self._pause_until = max(self._pause_until, time.monotonic() + seconds)
+
+    def on_throttled(self, headers: Mapping[str, str], attempt: int,
+                     base: float = 1.0, maximum: float = 30.0) -> float:
+        """
+        Après un 429 : pause selon Retry-After (ou backoff exponentiel avec jitter
+        s'il est absent) et retourne le délai appliqué.
+        """
+        self.stats.incr("throttled")
+        self.update_from_headers(headers)
+        retry_after = parse_duree(headers.get("retry-after"))
+        delai = retry_after if retry_after is not None else backoff(attempt, base, maximum)
+        # Petit jitter pour que les appels en attente ne repartent pas tous au même instant
+        delai += random.uniform(0, base / 2)
+        self.pause(delai)
+        return delai
+
+    def get_stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            **self.stats,
+            "total_wait_seconds": round(self.stats["total_wait_seconds"], 2),
+            "waiting": self._waiting,
+            "paused_for_seconds": round(max(self._pause_until - now, 0), 2),
+            "requests_per_minute": self.requests.capacity,
+            "requests_available": round(self.requests.level, 2),
+            "tokens_per_minute": self.tokens.capacity,
+            "tokens_available": round(self.tokens.level, 1)
+        }
+
+
+def backoff(attempt: int, base: float = 1.0, maximum: float = 30.0) -> float:
+    """Backoff exponentiel avec jitter complet : aléatoire entre 0 et base * 2^attempt (plafonné)"""
+    return random.uniform(0, min(maximum, base * (2 ** attempt)))
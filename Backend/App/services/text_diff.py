@@ -0,0 +1,173 @@
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+# Au-delà de ce nombre de modifications (tokens insérés/supprimés), le diff
+# s'arrête et la partie qui diffère est rendue comme un seul remplacement
+DIFF_MAX_EDITS = int(os.getenv("DIFF_MAX_EDITS", "400"))
+
+# Mots et signes de ponctuation : "1928," donne deux tokens
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+# (op, début, fin dans a, début, fin dans b) avec op = equal | insert | delete | replace
+Operation = Tuple[str, int, int, int, int]
+
+
+def tokeniser(text: str) -> List[re.Match]:
+    return list(_TOKEN.finditer(text))
+
+
+def myers(a: List[str], b: List[str], max_edits: int = DIFF_MAX_EDITS) -> Optional[List[Operation]]:
+    """
+    Diff de Myers en O((N+M)·D) : plus courte suite d'insertions/suppressions
+    pour passer de `a` à `b`, regroupée en opérations. None si plus de
+    `max_edits` modifications sont nécessaires.
+    """
+    n, m = len(a), len(b)
+    # Préfixe et suffixe communs : hors de la recherche (cas courant d'une petite correction)
+    debut = 0
+    while debut < n and debut < m and a[debut] == b[debut]:
+        debut += 1
+    fin = 0
+    while fin < n - debut and fin < m - debut and a[n - 1 - fin] == b[m - 1 - fin]:
+        fin += 1
+    a_mid, b_mid = a[debut:n - fin], b[debut:m - fin]
+    n_mid, m_mid = len(a_mid), len(b_mid)
+
+    v = {1: 0}
+    trace = []
+    for d in range(min(max_edits, n_mid + m_mid) + 1):
+        trace.append(dict(v))
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[k - 1] < v[k + 1]):
+                x = v[k + 1]
+            else:
+                x = v[k - 1] + 1
+            y = x - k
+            while x < n_mid and y < m_mid and a_mid[x] == b_mid[y]:
+                x += 1
+                y += 1
+            v[k] = x
+            if x >= n_mid and y >= m_mid:
+                editions = _remonter(trace, n_mid, m_mid)
+                return _regrouper(editions, debut, n, m, fin)
+    return None
+
+
+def _remonter(trace: List[Dict[int, int]], x: int, y: int) -> List[Tuple[str, int, int]]:
+    """Retrouve le chemin d'édition (=, -, +) à partir des fronts mémorisés"""
+    editions = []
+    for d in range(len(trace) - 1, -1, -1):
+        v = trace[d]
+        k = x - y
+        if k == -d or (k != d and v[k - 1] < v[k + 1]):
+            k_prec = k + 1
+        else:
+            k_prec = k - 1
+        x_prec = v[k_prec]
+        y_prec = x_prec - k_prec
+        while x > x_prec and y > y_prec:
+            editions.append(("=", x - 1, y - 1))
+            x -= 1
+            y -= 1
+        if d > 0:
+            editions.append(("+", x_prec, y_prec) if x == x_prec else ("-", x_prec, y_prec))
+        x, y = x_prec, y_prec
+    editions.reverse()
+    return editions
+
+
+def _regrouper(editions, debut: int, n: int, m: int, fin: int) -> List[Operation]:
+    """Fusionne les éditions unitaires en plages equal/insert/delete/replace"""
+    operations: List[Operation] = []
+    if debut:
+        operations.append(("equal", 0, debut, 0, debut))
+
+    i = j = debut
+    index = 0
+    while index < len(editions):
+        if editions[index][0] == "=":
+            i0, j0 = i, j
+            while index < len(editions) and editions[index][0] == "=":
+                i += 1
+                j += 1
+                index += 1
+            operations.append(("equal", i0, i, j0, j))
+            continue
+        i0, j0 = i, j
+        while index < len(editions) and editions[index][0] != "=":
+            if editions[index][0] == "-":
+                i += 1
+            else:
+                j += 1
+            index += 1
+        op = "replace" if i > i0 and j > j0 else ("delete" if i > i0 else "insert")
+        operations.append((op, i0, i, j0, j))
+
+    if fin:
+        operations.append(("equal", n - fin, n, m - fin, m))
+    return operations
+
+
+def _bornes(tokens: List[re.Match], text: str):
+    """Position de début du token i ; les espaces qui suivent un token lui sont rattachés"""
+    def borne(i: int) -> int:
+        if i == 0:
+            return 0
+        return tokens[i].start() if i < len(tokens) else len(text)
+    return borne
+
+
+def diff_segments(original: str, corrected: str, max_edits: int = DIFF_MAX_EDITS) -> List[Dict]:
+    """
+    Segments minimaux entre le texte original et sa correction, au niveau des
+    mots (comparaison insensible à la casse). Les segments `neutral` et `correct`
+    mis bout à bout redonnent le texte corrigé ; les segments `incorrect` sont les
+    passages supprimés ou remplacés de l'original. Chaque segment porte ses
+    positions dans le texte corrigé (`start`, `end`) et dans l'original
+    (`original_start`, `original_end`).
+    """
+    tokens_o, tokens_c = tokeniser(original), tokeniser(corrected)
+    a = [t.group().lower() for t in tokens_o]
+    b = [t.group().lower() for t in tokens_c]
+    borne_o, borne_c = _bornes(tokens_o, original), _bornes(tokens_c, corrected)
+
+    operations = myers(a, b, max_edits)
+    explication_globale = None
+    if operations is None:
+        # Textes trop différents : préfixe/suffixe communs + un seul remplacement
+        debut = 0
+        while debut < len(a) and debut < len(b) and a[debut] == b[debut]:
+            debut += 1
+        fin = 0
+        while fin < len(a) - debut and fin < len(b) - debut and a[-1 - fin] == b[-1 - fin]:
+            fin += 1
+        operations = [("equal", 0, debut, 0, debut)] if debut else []
+        operations.append(("replace", debut, len(a) - fin, debut, len(b) - fin))
+        if fin:
+            operations.append(("equal", len(a) - fin, len(a), len(b) - fin, len(b)))
+        explication_globale = "Correction complète"
+
+    segments = []
+    for op, i1, i2, j1, j2 in operations:
+        o_start, o_end = borne_o(i1), borne_o(i2)
+        c_start, c_end = borne_c(j1), borne_c(j2)
+        positions = {"start": c_start, "end": c_end, "original_start": o_start, "original_end": o_end}
+        ancien, nouveau = original[o_start:o_end], corrected[c_start:c_end]
+
+        if op == "equal":
+            segments.append({"text": nouveau, "type": "neutral", "op": op, **positions})
+        elif op == "insert":
+            segments.append({"text": nouveau, "type": "correct", "op": op, "explanation": "Ajout", **positions})
+        elif op == "delete":
+            segments.append({"text": ancien, "type": "incorrect", "op": op, "explanation": "Suppression", **positions})
+        else:
+            segments.append({"text": ancien, "type": "incorrect", "op": op, **positions})
+            segments.append({
+                "text": nouveau,
+                "type": "correct",
+                "op": op,
+                "explanation": explication_globale or f"'{ancien.strip()}' → '{nouveau.strip()}'",
+                **positions
+            })
+    return segments
@@ -0,0 +1,151 @@
+"""
+Corpus synthétiques en français, reproductibles (graine fixe), pour les
+mesures de débit : CSV à anonymiser et flux de commentaires pour Detoxify.
+
+    python benchmarks/corpus.py csv clients.csv --rows 10000 --pii-density 0.3 --text-words 25
+    python benchmarks/corpus.py comments commentaires.jsonl --count 2000 --toxic-rate 0.2
+
+Même graine et mêmes paramètres = mêmes fichiers, octet pour octet.
+"""
+import argparse
+import csv
+import io
+import json
+import random
+import unicodedata
+from typing import List
+
+PRENOMS = (
+    "Camille Léa Manon Chloé Inès Jade Louise Emma Alice Lina Hugo Lucas Louis Gabriel Arthur "
+    "Jules Nathan Raphaël Adam Théo Mathis Sacha Noé Élodie Sébastien François Hélène Zoé"
+).split()
+NOMS = (
+    "Martin Bernard Dubois Thomas Robert Richard Petit Durand Leroy Moreau Simon Laurent Lefèvre "
+    "Michel Garcia David Bertrand Roux Vincent Fournier Morel Girard André Mercier Dupont Lambert"
+).split()
+VILLES = (
+    "Paris Marseille Lyon Toulouse Nice Nantes Strasbourg Montpellier Bordeaux Lille Rennes Reims "
+    "Grenoble Dijon Angers Nîmes Clermont-Ferrand Brest Limoges Tours Amiens Perpignan Metz"
+).split()
+MOTS = (
+    "le la les un une des de du et à au pour avec sans dans sur par client commande livraison "
+    "colis produit service retour remboursement facture délai rapide lent qualité prix magasin "
+    "équipe conseiller appel message réponse problème solution satisfait déçu excellent correct "
+    "semaine mois jour matin soir rendez-vous dossier demande contrat abonnement option carte"
+).split()
+DOMAINES = ("gmail.com", "orange.fr", "free.fr", "laposte.net", "outlook.fr", "exemple.org")
+
+COMMENTAIRES_NEUTRES = [
+    "Merci pour la livraison rapide, le produit correspond à la description.",
+    "Je ne suis pas d'accord avec cette analyse mais l'article est intéressant.",
+    "Le service client m'a rappelé dans la journée, problème réglé.",
+    "Quelqu'un sait si la boutique de {ville} est ouverte le dimanche ?",
+    "Bonne idée, il faudrait aussi prévoir une option pour les familles.",
+    "Franchement déçu par la qualité, je vais demander un remboursement.",
+    "Très bon accueil, {prenom} a pris le temps de tout nous expliquer.",
+]
+COMMENTAIRES_TOXIQUES = [
+    "Tu es vraiment un idiot, personne ne veut lire tes commentaires.",
+    "Ferme-la, espèce d'abruti, tu ne sais même pas de quoi tu parles.",
+    "Ce service est une arnaque, bande d'incapables et de menteurs.",
+    "You are a complete moron and everybody here hates you.",
+    "Dégage, {prenom}, tes avis débiles n'intéressent personne.",
+]
+
+
+def _personne(rng: random.Random) -> str:
+    return f"{rng.choice(PRENOMS)} {rng.choice(NOMS)}"
+
+
+def _email(rng: random.Random) -> str:
+    local = f"{rng.choice(PRENOMS)}.{rng.choice(NOMS)}".lower()
+    local = unicodedata.normalize("NFKD", local).encode("ascii", "ignore").decode()
+    return f"{local}{rng.randint(1, 99)}@{rng.choice(DOMAINES)}"
+
+
+def _telephone(rng: random.Random) -> str:
+    return "0" + str(rng.randint(6, 7)) + " " + " ".join(f"{rng.randint(0, 99):02d}" for _ in range(4))
+
+
+def _phrase(rng: random.Random, nb_mots: int, pii_density: float) -> str:
+    """Texte libre de `nb_mots` mots ; avec la probabilité `pii_density`, une donnée personnelle y est glissée"""
+    mots = [rng.choice(MOTS) for _ in range(max(nb_mots, 1))]
+    if rng.random() < pii_density:
+        pii = rng.choice((
+            lambda: f"selon {_personne(rng)}",
+            lambda: f"à {rng.choice(VILLES)}",
+            lambda: f"contactez {_email(rng)}",
+            lambda: f"rappeler au {_telephone(rng)}"
+        ))()
+        mots.insert(rng.randrange(len(mots) + 1), pii)
+    texte = " ".join(mots)
+    return texte[0].upper() + texte[1:] + "."
+
+
+def generer_csv(rows: int, pii_density: float = 0.3, text_words: int = 20, seed: int = 42) -> str:
+    """
+    CSV de `rows` lignes : identifiant, colonnes de données personnelles (remplies
+    avec la probabilité `pii_density`), texte libre de ~`text_words` mots, montant et code.
+    """
+    rng = random.Random(seed)
+    sortie = io.StringIO()
+    writer = csv.writer(sortie, lineterminator="\n")
+    writer.writerow(["id", "client", "email", "telephone", "ville", "commentaire", "montant", "reference"])
+    for i in range(rows):
+        pii = rng.random() < pii_density
+        writer.writerow([
+            i + 1,
+            _personne(rng) if pii else "",
+            _email(rng) if pii else "",
+            _telephone(rng) if pii else "",
+            rng.choice(VILLES),
+            _phrase(rng, max(1, int(rng.gauss(text_words, text_words / 4))), pii_density),
+            f"{rng.uniform(5, 500):.2f}",
+            f"REF-{rng.randint(10000, 99999)}"
+        ])
+    return sortie.getvalue()
+
+
+def generer_commentaires(count: int, toxic_rate: float = 0.2, max_sentences: int = 3, seed: int = 42) -> List[str]:
+    """Flux de commentaires (1 à `max_sentences` phrases), dont une part `toxic_rate` toxiques"""
+    rng = random.Random(seed)
+    commentaires = []
+    for i in range(count):
+        modeles = COMMENTAIRES_TOXIQUES if rng.random() < toxic_rate else COMMENTAIRES_NEUTRES
+        phrases = [
+            rng.choice(modeles).format(prenom=rng.choice(PRENOMS), ville=rng.choice(VILLES))
+            for _ in range(rng.randint(1, max_sentences))
+        ]
+        # Un suffixe unique : chaque commentaire est distinct (pas de cache qui fausse la mesure)
+        commentaires.append(" ".join(phrases) + f" (#{i})")
+    return commentaires
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_csv = sub.add_parser("csv", help="CSV à anonymiser")
+    p_csv.add_argument("output")
+    p_csv.add_argument("--rows", type=int, default=10000)
+    p_csv.add_argument("--pii-density", type=float, default=0.3)
+    p_csv.add_argument("--text-words", type=int, default=20)
+    p_csv.add_argument("--seed", type=int, default=42)
+    p_com = sub.add_parser("comments", help="Commentaires pour Detoxify (JSONL)")
+    p_com.add_argument("output")
+    p_com.add_argument("--count", type=int, default=2000)
+    p_com.add_argument("--toxic-rate", type=float, default=0.2)
+    p_com.add_argument("--max-sentences", type=int, default=3)
+    p_com.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    with open(args.output, "w", encoding="utf-8", newline="") as f:
+        if args.command == "csv":
+            f.write(generer_csv(args.rows, args.pii_density, args.text_words, args.seed))
+        else:
+            for commentaire in generer_commentaires(args.count, args.toxic_rate, args.max_sentences, args.seed):
+                f.write(json.dumps({"text": commentaire}, ensure_ascii=False) + "\n")
+    print(f"✅ Corpus écrit dans {args.output}")
+
+
+if __name__ == "__main__":
+    main()
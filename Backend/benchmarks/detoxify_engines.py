@@ -0,0 +1,113 @@
+"""
+Compare les moteurs Detoxify (PyTorch, ONNX fp32, ONNX int8) : temps de
+chargement, latence unitaire et par lot, mémoire max, parité des scores.
+
+    python benchmarks/detoxify_engines.py --runs 50 --batch-size 32
+
+Chaque moteur tourne dans un processus séparé pour que la mémoire max
+(ru_maxrss) mesurée soit la sienne. L'export ONNX est fait au préalable
+s'il n'existe pas encore.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "App"))
+
+from services.detoxify_onnx import DETOXIFY_ONNX_DIR, TEXTES_PARITE, charger_onnx, verifier_parite  # noqa: E402
+from stats import peak_rss_mb, percentile  # noqa: E402
+
+TEXTES = [
+    "Merci beaucoup pour votre retour, c'était très clair.",
+    "You are an absolute idiot and nobody likes you.",
+    "Le rendez-vous est décalé à jeudi 14h, salle B.",
+    "I disagree with your point but I respect your opinion.",
+    "Get lost, you worthless piece of garbage.",
+    "La livraison est arrivée en retard et le colis était abîmé, je demande un remboursement.",
+]
+
+
+def _charger(engine: str):
+    if engine == "torch":
+        from detoxify import Detoxify
+        return Detoxify("original")
+    from services.detoxify_onnx import OnnxDetoxify
+    return OnnxDetoxify(quantize=(engine == "onnx-int8"))
+
+
+def _mesurer(engine: str, runs: int, batch_size: int, queue):
+    debut = time.perf_counter()
+    modele = _charger(engine)
+    chargement = time.perf_counter() - debut
+
+    modele.predict(TEXTES[0])  # échauffement
+    unitaires = []
+    for i in range(runs):
+        debut = time.perf_counter()
+        modele.predict(TEXTES[i % len(TEXTES)])
+        unitaires.append((time.perf_counter() - debut) * 1000)
+
+    lot = [TEXTES[i % len(TEXTES)] for i in range(batch_size)]
+    lots = []
+    for _ in range(max(runs // 5, 1)):
+        debut = time.perf_counter()
+        modele.predict(lot)
+        lots.append((time.perf_counter() - debut) * 1000)
+
+    queue.put({
+        "engine": engine,
+        "load_seconds": round(chargement, 2),
+        "single_p50_ms": round(statistics.median(unitaires), 2),
+        "single_p95_ms": round(percentile(unitaires, 95), 2),
+        "batch_p50_ms": round(statistics.median(lots), 2),
+        "batch_texts_per_second": round(batch_size / (statistics.median(lots) / 1000), 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1)
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--engines", default="torch,onnx,onnx-int8")
+    parser.add_argument("--output", help="Fichier JSON où écrire les résultats")
+    args = parser.parse_args()
+
+    # Export unique (et vérification de parité int8) si nécessaire
+    charger_onnx("original", DETOXIFY_ONNX_DIR)
+
+    ctx = multiprocessing.get_context("spawn")
+    resultats = []
+    for engine in args.engines.split(","):
+        queue = ctx.Queue()
+        process = ctx.Process(target=_mesurer, args=(engine, args.runs, args.batch_size, queue))
+        process.start()
+        resultats.append(queue.get())
+        process.join()
+        print(json.dumps(resultats[-1]))
+
+    from detoxify import Detoxify
+    from services.detoxify_onnx import OnnxDetoxify
+    reference = Detoxify("original")
+    parite = {
+        "onnx": verifier_parite(OnnxDetoxify(quantize=False), reference, TEXTES_PARITE + TEXTES),
+        "onnx-int8": verifier_parite(OnnxDetoxify(quantize=True), reference, TEXTES_PARITE + TEXTES)
+    }
+    for engine, resultat in parite.items():
+        statut = "✅" if resultat["ok"] else "❌"
+        print(f"{statut} Parité {engine}: écart max {resultat['max_abs_diff']} (tolérance {resultat['tolerance']})")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"results": resultats, "parity": parite}, f, indent=2)
+
+    if not all(r["ok"] for r in parite.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
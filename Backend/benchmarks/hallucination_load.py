@@ -0,0 +1,176 @@
+"""
+Charge sur POST /api/v1/detect-hallucination contre le serveur simulé
+(mock_llm.py) : latence p50/p95/p99, débit, codes de réponse et appels
+au fournisseur par requête.
+
+    python benchmarks/hallucination_load.py --requests 500 --concurrency 32
+    python benchmarks/hallucination_load.py --latency-dist lognormal --latency-ms 300 --spread 0.8 \\
+        --error-rate 0.05 --rate-429 0.02 --malformed-rate 0.02 --distinct 100
+
+Par défaut le simulateur et une application réduite aux routes d'hallucination
+sont lancés dans ce processus (aucun modèle local n'est chargé). Avec `--url`,
+la charge vise un serveur déjà lancé, qui doit pointer vers le simulateur
+`--mock-url` (GROQ_API_URL ou LLM_BACKENDS).
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+
+import httpx
+import uvicorn
+
+ICI = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ICI)
+sys.path.insert(0, os.path.join(ICI, "..", "App"))
+
+from stats import resume  # noqa: E402
+
+
+def _demarrer(app, port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def _application_locale(mock_port: int):
+    """Routes d'hallucination seules, branchées sur le simulateur"""
+    os.environ["GROQ_API_URL"] = f"http://127.0.0.1:{mock_port}/v1/chat/completions"
+    os.environ["LLM_BACKENDS"] = ""
+    # Le quota gratuit de Groq (30 req/min) fausserait la mesure du serveur lui-même
+    os.environ.setdefault("GROQ_RPM", "1000000")
+    os.environ.setdefault("GROQ_TPM", "1000000000")
+
+    from fastapi import FastAPI
+    from routes import hallucination_router
+    from services.http_client import http_client
+    from services.model_registry import registry
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        http_client.start()
+        await registry.warm_up(["hallucination"])
+        yield
+        await http_client.close()
+
+    app = FastAPI(lifespan=lifespan)
+    app.include_router(hallucination_router)
+    return app
+
+
+async def _charger(args, url: str, mock_url: str):
+    prompts = [f"Affirmation de test numéro {i} : la Seine traverse Paris." for i in range(args.distinct)]
+    reglages = {
+        "latency_dist": args.latency_dist,
+        "latency_ms": args.latency_ms,
+        "latency_spread": args.spread,
+        "tail_rate": args.tail_rate,
+        "tail_ms": args.tail_ms,
+        "error_rate": args.error_rate,
+        "429_rate": args.rate_429,
+        "retry_after": args.retry_after,
+        "malformed_rate": args.malformed_rate,
+        "seed": args.seed
+    }
+
+    async with httpx.AsyncClient(timeout=httpx.Timeout(120.0), limits=httpx.Limits(max_connections=args.concurrency)) as client:
+        (await client.post(f"{mock_url}/mock/config", json=reglages)).raise_for_status()
+        (await client.post(f"{mock_url}/mock/reset")).raise_for_status()
+        stats_avant = (await client.get(f"{url}/api/v1/hallucination/stats")).json()["stats"]
+
+        durees, codes = [], Counter()
+        suivant = iter(range(args.requests))
+
+        async def client_virtuel():
+            for i in suivant:
+                debut = time.perf_counter()
+                try:
+                    response = await client.post(
+                        f"{url}/api/v1/detect-hallucination",
+                        json={"prompt": prompts[i % len(prompts)]}
+                    )
+                    codes[response.status_code] += 1
+                except httpx.HTTPError as e:
+                    codes[type(e).__name__] += 1
+                durees.append((time.perf_counter() - debut) * 1000)
+
+        debut = time.perf_counter()
+        await asyncio.gather(*(client_virtuel() for _ in range(args.concurrency)))
+        total = time.perf_counter() - debut
+
+        upstream = (await client.get(f"{mock_url}/mock/stats")).json()
+        stats_apres = (await client.get(f"{url}/api/v1/hallucination/stats")).json()["stats"]
+
+    return {
+        "config": {**reglages, "requests": args.requests, "concurrency": args.concurrency, "distinct": args.distinct},
+        "latency_ms": resume(durees),
+        "throughput_rps": round(args.requests / total, 1),
+        "status_codes": {str(code): n for code, n in sorted(codes.items(), key=str)},
+        "upstream": upstream,
+        "upstream_calls_per_request": round(upstream["calls"] / args.requests, 3),
+        "cache_hits": stats_apres["cache_hits"] - stats_avant["cache_hits"],
+        "coalesced_requests": stats_apres["coalesced_requests"] - stats_avant["coalesced_requests"]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--distinct", type=int, default=500, help="Textes différents (moins = plus de cache)")
+    parser.add_argument("--latency-dist", choices=("fixed", "uniform", "normal", "lognormal"), default="fixed")
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--spread", type=float, default=0, help="ms (uniform/normal) ou sigma (lognormal)")
+    parser.add_argument("--tail-rate", type=float, default=0)
+    parser.add_argument("--tail-ms", type=float, default=2000)
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument("--rate-429", type=float, default=0)
+    parser.add_argument("--retry-after", type=float, default=1)
+    parser.add_argument("--malformed-rate", type=float, default=0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--url", help="Serveur déjà lancé (sinon application locale)")
+    parser.add_argument("--mock-url", help="Simulateur déjà lancé (sinon lancé ici)")
+    parser.add_argument("--mock-port", type=int, default=8099)
+    parser.add_argument("--port", type=int, default=8098)
+    parser.add_argument("--output", help="Fichier JSON pour les résultats")
+    args = parser.parse_args()
+
+    serveurs = []
+    mock_url = args.mock_url
+    if mock_url is None:
+        from mock_llm import app as mock_app
+        serveurs.append(_demarrer(mock_app, args.mock_port))
+        mock_url = f"http://127.0.0.1:{args.mock_port}"
+    url = args.url
+    if url is None:
+        serveurs.append(_demarrer(_application_locale(args.mock_port), args.port))
+        url = f"http://127.0.0.1:{args.port}"
+
+    try:
+        resultats = asyncio.run(_charger(args, url.rstrip("/"), mock_url.rstrip("/")))
+    finally:
+        for server in serveurs:
+            server.should_exit = True
+
+    latence = resultats["latency_ms"]
+    print(f"\n{args.requests} requêtes, {args.concurrency} en parallèle, {args.distinct} textes différents")
+    print(f"latence    p50={latence['p50']:.1f} ms   p95={latence['p95']:.1f} ms   p99={latence['p99']:.1f} ms")
+    print(f"débit      {resultats['throughput_rps']} req/s")
+    print(f"réponses   {resultats['status_codes']}")
+    print(f"fournisseur {resultats['upstream_calls_per_request']} appel(s)/requête {resultats['upstream']}")
+    print(f"cache      {resultats['cache_hits']} hits, {resultats['coalesced_requests']} requêtes regroupées")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(resultats, f, indent=2, ensure_ascii=False)
+        print(f"📄 Résultats écrits dans {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Compare la latence d'un appel de vérification avec un client httpx créé à
+chaque requête (ancien comportement) et avec le client partagé du serveur.
+
+    python benchmarks/http_client.py --requests 200
+
+Le serveur simulé (mock_llm.py) est lancé localement en HTTP simple : le gain
+mesuré est celui de la réutilisation des connexions TCP. Contre Groq (HTTPS),
+la négociation TLS évitée et HTTP/2 s'y ajoutent.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+
+import httpx
+import uvicorn
+
+ICI = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ICI)
+sys.path.insert(0, os.path.join(ICI, "..", "App"))
+
+from mock_llm import app as mock_app  # noqa: E402
+from services.http_client import SharedHttpClient  # noqa: E402
+from stats import resume  # noqa: E402
+
+PAYLOAD = {
+    "model": "mock",
+    "messages": [{"role": "user", "content": 'Analyze this statement: "Paris est la capitale de la France"'}]
+}
+
+
+def _demarrer_mock(port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(mock_app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def _afficher(nom: str, durees):
+    latences = resume(durees, (50, 95))
+    print(f"{nom:<22} p50={latences['p50']:7.2f} ms   p95={latences['p95']:7.2f} ms")
+
+
+async def _mesurer(url: str, n: int):
+    par_requete = []
+    for _ in range(n):
+        debut = time.perf_counter()
+        async with httpx.AsyncClient(timeout=30.0) as client:
+            (await client.post(url, json=PAYLOAD)).raise_for_status()
+        par_requete.append((time.perf_counter() - debut) * 1000)
+
+    partage = SharedHttpClient()
+    client = partage.start()
+    await client.post(url, json=PAYLOAD)  # ouverture de la connexion
+    reutilise = []
+    for _ in range(n):
+        debut = time.perf_counter()
+        (await client.post(url, json=PAYLOAD)).raise_for_status()
+        reutilise.append((time.perf_counter() - debut) * 1000)
+    await partage.close()
+
+    _afficher("client par requête", par_requete)
+    _afficher("client partagé", reutilise)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--port", type=int, default=8099)
+    args = parser.parse_args()
+
+    server = _demarrer_mock(args.port)
+    try:
+        asyncio.run(_mesurer(f"http://127.0.0.1:{args.port}/v1/chat/completions", args.requests))
+    finally:
+        server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
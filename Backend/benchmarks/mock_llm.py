@@ -0,0 +1,160 @@
+"""
+Serveur local compatible OpenAI (/v1/chat/completions) qui imite Groq pour
+les mesures, sans clé API ni réseau :
+
+    uvicorn mock_llm:app --app-dir benchmarks --port 8099
+    GROQ_API_URL=http://127.0.0.1:8099/v1/chat/completions uvicorn main:app --app-dir App
+
+Latence et pannes simulées, réglables par variables d'environnement au
+démarrage ou à chaud avec POST /mock/config (mêmes clés, en minuscules) :
+
+    MOCK_LATENCY_DIST   fixed | uniform | normal | lognormal   (défaut fixed)
+    MOCK_LATENCY_MS     latence médiane                         (défaut 20)
+    MOCK_LATENCY_SPREAD dispersion : ms pour uniform/normal, sigma pour lognormal
+    MOCK_TAIL_RATE      part des réponses très lentes (queue de distribution)
+    MOCK_TAIL_MS        latence de ces réponses
+    MOCK_ERROR_RATE     part de réponses 500
+    MOCK_429_RATE       part de réponses 429 (avec Retry-After: MOCK_RETRY_AFTER)
+    MOCK_MALFORMED_RATE part de réponses 200 dont le contenu n'est pas du JSON valide
+
+GET /mock/stats donne le nombre d'appels reçus par issue (remis à zéro par POST /mock/reset).
+"""
+import asyncio
+import json
+import os
+import random
+import re
+from typing import Any, Dict
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+
+DISTRIBUTIONS = ("fixed", "uniform", "normal", "lognormal")
+
+REGLAGES: Dict[str, Any] = {
+    "latency_dist": os.getenv("MOCK_LATENCY_DIST", "fixed"),
+    # Latence simulée du modèle (ms)
+    "latency_ms": float(os.getenv("MOCK_LATENCY_MS", "20")),
+    "latency_spread": float(os.getenv("MOCK_LATENCY_SPREAD", "0")),
+    "tail_rate": float(os.getenv("MOCK_TAIL_RATE", "0")),
+    "tail_ms": float(os.getenv("MOCK_TAIL_MS", "1000")),
+    "error_rate": float(os.getenv("MOCK_ERROR_RATE", "0")),
+    "429_rate": float(os.getenv("MOCK_429_RATE", "0")),
+    "retry_after": float(os.getenv("MOCK_RETRY_AFTER", "1")),
+    "malformed_rate": float(os.getenv("MOCK_MALFORMED_RATE", "0")),
+    "seed": os.getenv("MOCK_SEED")
+}
+
+COMPTEURS = {"calls": 0, "ok": 0, "errors": 0, "throttled": 0, "malformed": 0}
+
+rng = random.Random(REGLAGES["seed"])
+app = FastAPI(title="Mock LLM")
+
+
+def tirer_latence() -> float:
+    """Latence (s) d'une réponse selon la distribution configurée"""
+    if rng.random() < REGLAGES["tail_rate"]:
+        return REGLAGES["tail_ms"] / 1000
+    mediane, spread = REGLAGES["latency_ms"], REGLAGES["latency_spread"]
+    dist = REGLAGES["latency_dist"]
+    if dist == "uniform":
+        ms = rng.uniform(mediane - spread, mediane + spread)
+    elif dist == "normal":
+        ms = rng.gauss(mediane, spread)
+    elif dist == "lognormal":
+        # Médiane `latency_ms`, sigma `latency_spread` : queue longue à droite
+        ms = mediane * rng.lognormvariate(0, spread)
+    else:
+        ms = mediane
+    return max(ms, 0) / 1000
+
+
+@app.get("/mock/config")
+async def lire_config():
+    return REGLAGES
+
+
+@app.post("/mock/config")
+async def modifier_config(payload: dict):
+    inconnues = set(payload) - set(REGLAGES)
+    if inconnues:
+        return JSONResponse(status_code=400, content={"error": f"Clés inconnues: {sorted(inconnues)}"})
+    if payload.get("latency_dist", REGLAGES["latency_dist"]) not in DISTRIBUTIONS:
+        return JSONResponse(status_code=400, content={"error": f"latency_dist parmi {DISTRIBUTIONS}"})
+    REGLAGES.update(payload)
+    if "seed" in payload:
+        rng.seed(payload["seed"])
+    return REGLAGES
+
+
+@app.get("/mock/stats")
+async def lire_stats():
+    return COMPTEURS
+
+
+@app.post("/mock/reset")
+async def remettre_a_zero():
+    for cle in COMPTEURS:
+        COMPTEURS[cle] = 0
+    return COMPTEURS
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(payload: dict):
+    COMPTEURS["calls"] += 1
+    await asyncio.sleep(tirer_latence())
+
+    tirage = rng.random()
+    if tirage < REGLAGES["429_rate"]:
+        COMPTEURS["throttled"] += 1
+        return JSONResponse(
+            status_code=429,
+            content={"error": {"message": "Rate limit reached", "type": "rate_limit_exceeded"}},
+            headers={"retry-after": str(REGLAGES["retry_after"])}
+        )
+    tirage -= REGLAGES["429_rate"]
+    if tirage < REGLAGES["error_rate"]:
+        COMPTEURS["errors"] += 1
+        return JSONResponse(status_code=500, content={"error": {"message": "Mock: internal error"}})
+    tirage -= REGLAGES["error_rate"]
+    malformed = tirage < REGLAGES["malformed_rate"]
+
+    system, user = payload["messages"][0]["content"], payload["messages"][-1]["content"]
+
+    def verdict(statement: str) -> dict:
+        return {
+            "is_correct": True,
+            "confidence": 0.9,
+            "explanation": "Mock: statement accepted",
+            "corrected_version": statement
+        }
+
+    if '"results"' in system:
+        # Plusieurs affirmations numérotées : « 0. "texte" » par ligne
+        claims = re.findall(r'^(\d+)\. (".*")$', user, re.MULTILINE)
+        content = json.dumps({"results": [{"index": int(i), **verdict(json.loads(c))} for i, c in claims]})
+    else:
+        content = json.dumps(verdict(user))
+    if malformed:
+        # Réponse tronquée, comme un modèle coupé par max_tokens
+        COMPTEURS["malformed"] += 1
+        content = "Here is the analysis: " + content[:len(content) // 2]
+    else:
+        COMPTEURS["ok"] += 1
+
+    prompt_tokens, completion_tokens = (len(system) + len(user)) // 4, len(content) // 4
+    return {
+        "id": "mock",
+        "object": "chat.completion",
+        "model": payload.get("model", "mock"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "length" if malformed else "stop"
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+    }
@@ -0,0 +1,91 @@
+"""
+Vérifie que le pré-filtre (services/pii_prefilter.py) ne laisse passer
+aucune donnée personnelle : pour chaque email, lien ou nom de domaine nu
+(site2.com), la sortie d'anonymiser_texte (pré-filtre actif) doit laisser en
+clair exactement le même texte que le pipeline spaCy complet.
+
+Seul le libellé peut différer : sur un domaine nu, spaCy l'emporte parfois
+sur le reconnaisseur de liens ([📍 LIEU] au lieu de [🔗 LIEN]) ; l'écart est
+affiché sans faire échouer le script.
+
+    python benchmarks/prefilter_parity.py --rows 500 --profiles fast,accurate
+"""
+import argparse
+import csv
+import io
+import os
+import random
+import re
+import sys
+
+ICI = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ICI)
+sys.path.insert(0, os.path.join(ICI, "..", "App"))
+
+from corpus import DOMAINES, generer_csv  # noqa: E402
+from services import anonymization_service  # noqa: E402
+from services.anonymization_service import anonymiser_texte_detail, resoudre_entites  # noqa: E402
+
+# Valeurs d'un seul jeton qu'une regex de « code » pourrait confondre avec un identifiant
+VALEURS_FIXES = [
+    "site2.com", "www2.exemple.fr", "exemple.fr", "contact.exemple.com", "Site2.COM",
+    "jean.dupont@mail.fr", "j.dupont2@orange.fr", "ST_01@exemple.org",
+    "https://exemple.fr/page?id=2", "http://site2.com", "www.exemple.org/contact"
+]
+
+# Remplacements des OPERATORS_CONFIG (ex. " [🔗 LIEN] ")
+_RE_REMPLACEMENT = re.compile(r" \[[^\[\]]+\] ")
+
+
+def en_clair(texte: str) -> str:
+    """Texte laissé visible une fois les remplacements retirés"""
+    return _RE_REMPLACEMENT.sub("\x00", texte)
+
+
+def valeurs_a_verifier(rows: int, seed: int):
+    rng = random.Random(seed)
+    valeurs = list(VALEURS_FIXES)
+    for domaine in DOMAINES:
+        nom, tld = domaine.rsplit(".", 1)
+        valeurs += [
+            domaine,
+            f"{nom}{rng.randint(1, 99)}.{tld}",
+            f"www{rng.randint(1, 9)}.{domaine}",
+            f"https://{domaine}/compte/{rng.randint(1, 999)}"
+        ]
+    # Colonne email du corpus synthétique
+    lecteur = csv.DictReader(io.StringIO(generer_csv(rows, pii_density=1.0, seed=seed)))
+    valeurs += [ligne["email"] for ligne in lecteur]
+    # Ordre stable, sans doublons
+    return list(dict.fromkeys(valeurs))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200, help="Emails tirés du corpus CSV synthétique")
+    parser.add_argument("--profiles", default="fast")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    valeurs = valeurs_a_verifier(args.rows, args.seed)
+    entites = resoudre_entites(None)
+    ecarts = 0
+    for profil in args.profiles.split(","):
+        for valeur in valeurs:
+            prefiltre, tier = anonymiser_texte_detail(valeur, profil)
+            complet = anonymization_service._anonymiser_sans_cache(valeur, profil, entites)
+            if en_clair(prefiltre) != en_clair(complet):
+                ecarts += 1
+                print(f"❌ [{profil}] {valeur!r} (niveau {tier}) : {prefiltre!r} au lieu de {complet!r}")
+            elif prefiltre != complet:
+                print(f"ℹ️ [{profil}] {valeur!r} (niveau {tier}) : libellé {prefiltre!r}, pipeline complet {complet!r}")
+        print(f"[{profil}] {len(valeurs)} valeurs vérifiées")
+
+    if ecarts:
+        print(f"❌ {ecarts} écart(s) entre le pré-filtre et le pipeline complet")
+        sys.exit(1)
+    print("✅ Pré-filtre identique au pipeline complet")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Compare l'ancienne comparaison mot à mot par position et le diff de Myers
+sur des paragraphes longs corrigés : temps par diff et nombre de segments
+marqués comme corrections.
+
+    python benchmarks/segments_diff.py --words 300 --edits 5 --runs 200
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "App"))
+
+from services.text_diff import diff_segments  # noqa: E402
+
+VOCABULAIRE = (
+    "la le les un une des de du en et à au aux par pour sur dans avec sans "
+    "pénicilline découverte Fleming Londres 1928 hôpital laboratoire culture "
+    "bactérie antibiotique médecine prix Nobel chercheur moisissure souche "
+    "Paris France capitale fleuve Seine population habitants siècle roi"
+).split()
+
+
+def ancien_diff(original: str, corrected: str):
+    """Comparaison position par position (implémentation précédente)"""
+    if abs(len(corrected) - len(original)) > len(original) * 1.5:
+        return [{"text": corrected, "type": "correct", "explanation": "Correction complète"}]
+    segments = []
+    o_words, c_words = original.split(), corrected.split()
+    for i in range(max(len(o_words), len(c_words))):
+        if i < len(o_words) and i < len(c_words):
+            if o_words[i].lower() == c_words[i].lower():
+                segments.append({"text": o_words[i] + " ", "type": "neutral"})
+            else:
+                segments.append({"text": c_words[i] + " ", "type": "correct"})
+        elif i < len(c_words):
+            segments.append({"text": c_words[i] + " ", "type": "correct"})
+    return segments
+
+
+def paragraphe_corrige(rng: random.Random, nb_mots: int, nb_editions: int):
+    mots = [rng.choice(VOCABULAIRE) for _ in range(nb_mots)]
+    corriges = list(mots)
+    for _ in range(nb_editions):
+        position = rng.randrange(len(corriges))
+        action = rng.choice(("insert", "delete", "replace"))
+        if action == "insert":
+            corriges.insert(position, rng.choice(VOCABULAIRE))
+        elif action == "delete" and len(corriges) > 1:
+            del corriges[position]
+        else:
+            corriges[position] = rng.choice(VOCABULAIRE)
+    return " ".join(mots), " ".join(corriges)
+
+
+def mesurer(fn, paires, runs):
+    durees, corrections = [], []
+    for i in range(runs):
+        original, corrected = paires[i % len(paires)]
+        debut = time.perf_counter()
+        segments = fn(original, corrected)
+        durees.append((time.perf_counter() - debut) * 1000)
+        corrections.append(sum(1 for s in segments if s["type"] != "neutral"))
+    return statistics.median(durees), max(durees), statistics.mean(corrections)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--words", type=int, default=300)
+    parser.add_argument("--edits", type=int, default=5)
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    paires = [paragraphe_corrige(rng, args.words, args.edits) for _ in range(20)]
+
+    print(f"{args.words} mots, {args.edits} modifications par paragraphe")
+    for nom, fn in (("position par position", ancien_diff), ("myers", diff_segments)):
+        p50, pmax, corrections = mesurer(fn, paires, args.runs)
+        print(f"{nom:<22} p50={p50:7.3f} ms   max={pmax:7.3f} ms   segments modifiés={corrections:6.1f}")
+
+    # Cas pathologique : textes sans rapport, arrêt du diff au-delà de DIFF_MAX_EDITS
+    original = " ".join(rng.choice(VOCABULAIRE) for _ in range(2000))
+    corrected = " ".join(rng.choice(VOCABULAIRE) for _ in range(2000))
+    debut = time.perf_counter()
+    segments = diff_segments(original, corrected)
+    print(f"pathologique (2000 mots sans rapport) {(time.perf_counter() - debut) * 1000:.1f} ms, {len(segments)} segments")
+
+
+if __name__ == "__main__":
+    main()
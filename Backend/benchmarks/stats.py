@@ -0,0 +1,30 @@
+"""
+Outils communs aux scripts de mesure : percentiles, résumé des latences et
+mémoire max du processus.
+"""
+import resource
+import statistics
+import sys
+from typing import Dict, Iterable, Sequence
+
+
+def percentile(valeurs: Iterable[float], p: float) -> float:
+    """Percentile `p` (0-100) au rang le plus proche"""
+    ordonnees = sorted(valeurs)
+    return ordonnees[min(len(ordonnees) - 1, int(round(p / 100 * (len(ordonnees) - 1))))]
+
+
+def resume(durees: Sequence[float], percentiles: Sequence[float] = (50, 95, 99), decimales: int = 2) -> Dict[str, float]:
+    """Latences résumées : {"p50": ..., "p95": ..., "p99": ..., "mean": ..., "max": ...}"""
+    resultat = {f"p{p:g}": round(percentile(durees, p), decimales) for p in percentiles}
+    resultat["mean"] = round(statistics.mean(durees), decimales)
+    resultat["max"] = round(max(durees), decimales)
+    return resultat
+
+
+def peak_rss_mb(enfants: bool = False) -> float:
+    """Mémoire max du processus, et de ses enfants terminés avec `enfants` (ru_maxrss : Ko sous Linux, octets sous macOS)"""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if enfants:
+        rss = max(rss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
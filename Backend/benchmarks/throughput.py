@@ -0,0 +1,293 @@
+"""
+Débit reproductible de l'anonymisation et de Detoxify sur des corpus
+synthétiques (benchmarks/corpus.py), pour chaque moteur / configuration :
+
+    python benchmarks/throughput.py --suites texte,csv,detoxify --output resultats.json
+    python benchmarks/throughput.py --profiles fast,accurate --prefilter on,off --rows 5000
+    python benchmarks/throughput.py --baseline reference.json --tolerance 0.10
+
+Suites :
+    texte     anonymiser_texte cellule par cellule (latence par cellule)
+    csv       lecture par blocs + generer_csv_anonymise (chemin de /clean-file?stream=true)
+    detoxify  DetoxifyService.predict_toxicity puis predict_batch
+
+Chaque configuration tourne dans un processus neuf : temps de chargement du
+modèle, cache vide et mémoire max (ru_maxrss) qui lui sont propres. Avec
+`--baseline`, chaque métrique est comparée au résultat de même suite et même
+configuration ; une dégradation au-delà de `--tolerance` est signalée et le
+script sort en erreur.
+"""
+import argparse
+import io
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List
+
+ICI = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ICI)
+
+from corpus import generer_commentaires, generer_csv  # noqa: E402
+from stats import peak_rss_mb, percentile  # noqa: E402
+
+# Sens de chaque métrique : True = plus haut est meilleur
+METRIQUES = {
+    "rows_per_second": True,
+    "cells_per_second": True,
+    "texts_per_second": True,
+    "batch_texts_per_second": True,
+    "cell_p50_ms": False,
+    "cell_p95_ms": False,
+    "cell_mean_ms": False,
+    "text_p50_ms": False,
+    "text_p95_ms": False,
+    "load_seconds": False,
+    "peak_rss_mb": False
+}
+
+
+def _cellules_texte(contenu: str) -> int:
+    """Cellules anonymisées par l'export : valeurs non vides des colonnes texte (lecture comme /clean-file)"""
+    import pandas as pd
+    from services.anonymization_service import lire_csv_par_blocs
+
+    return sum(
+        int(bloc[colonne].notna().sum())
+        for bloc in lire_csv_par_blocs(io.BytesIO(contenu.encode("utf-8")))
+        for colonne in bloc.columns
+        if pd.api.types.is_string_dtype(bloc[colonne].dtype)
+    )
+
+
+def _suite_anonymisation(suite: str, config: Dict[str, Any], corpus: Dict[str, Any]) -> Dict[str, Any]:
+    from services.anonymization_profiles import get_moteur
+    from services.anonymization_service import anonymiser_texte, generer_csv_anonymise, lire_csv_par_blocs, pool
+
+    debut = time.perf_counter()
+    get_moteur(config["profile"])
+    chargement = time.perf_counter() - debut
+    pool.start()
+
+    try:
+        contenu = generer_csv(corpus["rows"], corpus["pii_density"], corpus["text_words"], corpus["seed"])
+        if suite == "texte":
+            import csv
+            lignes = list(csv.DictReader(io.StringIO(contenu)))
+            cellules = [ligne[colonne] for ligne in lignes for colonne in ("client", "commentaire") if ligne[colonne]]
+            cellules = cellules[:corpus["cells"]]
+            anonymiser_texte("Initialisation", config["profile"])  # échauffement
+            durees = []
+            for cellule in cellules:
+                debut = time.perf_counter()
+                anonymiser_texte(cellule, config["profile"])
+                durees.append((time.perf_counter() - debut) * 1000)
+            return {
+                "cells": len(cellules),
+                "cells_per_second": round(len(cellules) / (sum(durees) / 1000), 1),
+                "cell_p50_ms": round(statistics.median(durees), 3),
+                "cell_p95_ms": round(percentile(durees, 95), 3),
+                "load_seconds": round(chargement, 2)
+            }
+
+        nb_cellules = _cellules_texte(contenu)
+        debut = time.perf_counter()
+        lecteur = lire_csv_par_blocs(io.BytesIO(contenu.encode("utf-8")))
+        taille_sortie = sum(len(bloc) for bloc in generer_csv_anonymise(lecteur, profil=config["profile"]))
+        duree = time.perf_counter() - debut
+        return {
+            "rows": corpus["rows"],
+            "cells": nb_cellules,
+            "rows_per_second": round(corpus["rows"] / duree, 1),
+            "cells_per_second": round(nb_cellules / duree, 1),
+            "cell_mean_ms": round(duree * 1000 / nb_cellules, 4),
+            "output_bytes": taille_sortie,
+            "load_seconds": round(chargement, 2)
+        }
+    finally:
+        pool.shutdown()
+
+
+def _suite_detoxify(config: Dict[str, Any], corpus: Dict[str, Any]) -> Dict[str, Any]:
+    from services.detoxify_service import DetoxifyService
+
+    debut = time.perf_counter()
+    service = DetoxifyService()
+    chargement = time.perf_counter() - debut
+
+    commentaires = generer_commentaires(corpus["comments"], corpus["toxic_rate"], seed=corpus["seed"])
+    service.predict_toxicity("Initialisation")  # échauffement
+    durees = []
+    for commentaire in commentaires:
+        debut = time.perf_counter()
+        service.predict_toxicity(commentaire)
+        durees.append((time.perf_counter() - debut) * 1000)
+
+    # Même flux avec un suffixe : aucun texte déjà en cache
+    lot = [f"{c} ·" for c in commentaires]
+    debut = time.perf_counter()
+    service.predict_batch(lot)
+    duree_lot = time.perf_counter() - debut
+    return {
+        "engine": service.engine,
+        "texts": len(commentaires),
+        "texts_per_second": round(len(commentaires) / (sum(durees) / 1000), 1),
+        "text_p50_ms": round(statistics.median(durees), 3),
+        "text_p95_ms": round(percentile(durees, 95), 3),
+        "batch_texts_per_second": round(len(lot) / duree_lot, 1),
+        "load_seconds": round(chargement, 2)
+    }
+
+
+def _executer(suite: str, config: Dict[str, Any], corpus: Dict[str, Any], queue):
+    """Processus enfant : les variables d'environnement sont fixées avant d'importer les services"""
+    for cle, valeur in config.get("env", {}).items():
+        os.environ[cle] = str(valeur)
+    sys.path.insert(0, os.path.join(ICI, "..", "App"))
+    try:
+        if suite == "detoxify":
+            metriques = _suite_detoxify(config, corpus)
+        else:
+            metriques = _suite_anonymisation(suite, config, corpus)
+        # Workers du pool d'anonymisation compris
+        metriques["peak_rss_mb"] = round(peak_rss_mb(enfants=True), 1)
+        queue.put({"suite": suite, "config": config, "metrics": metriques})
+    except Exception as e:
+        queue.put({"suite": suite, "config": config, "error": f"{type(e).__name__}: {e}"})
+
+
+def _configurations(args) -> List[Dict[str, Any]]:
+    configurations = []
+    for suite in args.suites.split(","):
+        if suite == "detoxify":
+            for engine in args.engines.split(","):
+                configurations.append((suite, {"engine": engine, "env": {"DETOXIFY_ENGINE": engine}}))
+            continue
+        for profil, prefiltre in itertools.product(args.profiles.split(","), args.prefilter.split(",")):
+            configurations.append((suite, {
+                "profile": profil,
+                "prefilter": prefiltre,
+                "workers": args.workers,
+                "env": {
+                    "PREFILTER_ENABLED": "true" if prefiltre == "on" else "false",
+                    "ANONYMIZATION_WORKERS": args.workers
+                }
+            }))
+    return configurations
+
+
+def _cle(resultat: Dict[str, Any]) -> str:
+    config = {k: v for k, v in resultat["config"].items() if k != "env"}
+    return resultat["suite"] + " " + json.dumps(config, sort_keys=True)
+
+
+def comparer(resultats: List[Dict[str, Any]], reference: Dict[str, Any], tolerance: float) -> List[str]:
+    """Métriques dégradées de plus de `tolerance` (fraction) par rapport à la référence"""
+    references = {_cle(r): r for r in reference.get("results", []) if "metrics" in r}
+    regressions = []
+    for resultat in resultats:
+        ancien = references.get(_cle(resultat))
+        if ancien is None or "metrics" not in resultat:
+            continue
+        for metrique, plus_haut_meilleur in METRIQUES.items():
+            avant, apres = ancien["metrics"].get(metrique), resultat["metrics"].get(metrique)
+            if not avant or apres is None:
+                continue
+            ecart = (apres - avant) / avant
+            degradation = -ecart if plus_haut_meilleur else ecart
+            statut = "❌" if degradation > tolerance else "✅"
+            print(f"{statut} {_cle(resultat)} {metrique}: {avant} → {apres} ({ecart:+.1%})")
+            if degradation > tolerance:
+                regressions.append(f"{_cle(resultat)} {metrique} ({ecart:+.1%})")
+    return regressions
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ICI, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--suites", default="texte,csv,detoxify")
+    parser.add_argument("--profiles", default="fast,accurate")
+    parser.add_argument("--prefilter", default="on,off")
+    parser.add_argument("--engines", default="torch,onnx")
+    parser.add_argument("--workers", type=int, default=0)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--cells", type=int, default=500, help="Cellules mesurées une à une (suite texte)")
+    parser.add_argument("--pii-density", type=float, default=0.3)
+    parser.add_argument("--text-words", type=int, default=20)
+    parser.add_argument("--comments", type=int, default=500)
+    parser.add_argument("--toxic-rate", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Fichier JSON pour les résultats")
+    parser.add_argument("--baseline", help="Résultats de référence (JSON d'une exécution précédente)")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    args = parser.parse_args()
+
+    corpus = {
+        "rows": args.rows,
+        "cells": args.cells,
+        "pii_density": args.pii_density,
+        "text_words": args.text_words,
+        "comments": args.comments,
+        "toxic_rate": args.toxic_rate,
+        "seed": args.seed
+    }
+
+    ctx = multiprocessing.get_context("spawn")
+    resultats = []
+    for suite, config in _configurations(args):
+        queue = ctx.Queue()
+        process = ctx.Process(target=_executer, args=(suite, config, corpus, queue))
+        process.start()
+        resultats.append(queue.get())
+        process.join()
+        print(f"{_cle(resultats[-1])} {json.dumps(resultats[-1].get('metrics', {}), ensure_ascii=False)}")
+
+    rapport = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "commit": _commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "corpus": corpus
+        },
+        "results": resultats
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(rapport, f, indent=2, ensure_ascii=False)
+        print(f"📄 Résultats écrits dans {args.output}")
+
+    echecs = [r for r in resultats if "error" in r]
+    for resultat in echecs:
+        print(f"❌ {_cle(resultat)} : {resultat['error']}")
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = comparer(resultats, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} régression(s) au-delà de {args.tolerance:.0%} :")
+            for regression in regressions:
+                print(f"   - {regression}")
+
+    if echecs or regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()